@@ -0,0 +1,169 @@
+import json
+import os
+
+from utilities import Utilities
+from benchmark.run_index import RunIndex
+from benchmark.snapshot import load_saved_systems
+
+
+# Progress of a campaign, saved next to results/ so that a restart continues where it
+# stopped. Changes to the streams are only saved together with the results they belong
+# to, when the results sink flushes.
+class CampaignState:
+    def __init__(self, path="campaign_state.json"):
+        self.path = path
+        self.seed = None
+        self.parameters = {}
+        self.num_tasks = None
+        self.streams = {}
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return False
+
+        with open(self.path) as file:
+            state = json.load(file)
+
+        self.seed = state["seed"]
+        self.parameters = state["parameters"]
+        self.num_tasks = state["num_tasks"]
+        self.streams = state["streams"]
+
+        return True
+
+    # Written to a temporary file first, so a crash never leaves a partial state
+    def save(self):
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as file:
+            json.dump(
+                {
+                    "seed": self.seed,
+                    "parameters": self.parameters,
+                    "num_tasks": self.num_tasks,
+                    "streams": self.streams,
+                },
+                file,
+                indent=4,
+            )
+            file.flush()
+            os.fsync(file.fileno())
+
+        os.replace(temp_path, self.path)
+
+    def start(self, seed, parameters, num_tasks):
+        self.seed = seed
+        self.parameters = parameters
+        self.num_tasks = num_tasks
+        self.streams = {}
+        self.save()
+
+    # The parameters that the corpus depends on must not change when resuming. Parameters
+    # that did not exist when the campaign started are not checked.
+    def check_parameters(self, parameters):
+        changed = [
+            name
+            for name, value in parameters.items()
+            if name in self.parameters and self.parameters[name] != value
+        ]
+        if len(changed) > 0:
+            raise ValueError(
+                f"The campaign in {self.path} was started with other values for: "
+                + ", ".join(changed)
+            )
+
+    # Streams are the attempts for one task count on one physical system, config is
+    # numbered from 1 like the results files
+    def get_stream(self, num_tasks, config):
+        key = f"{num_tasks}-{config}"
+        if key not in self.streams:
+            self.streams[key] = {
+                "num_tasks": num_tasks,
+                "config": config,
+                "solvable_count": 0,
+                "next_attempt": 1,
+                "next_run": 1,
+                "counter": 1,
+                "finished": False,
+            }
+
+        return self.streams[key]
+
+    def open_task_count(self, num_tasks, num_configs):
+        for config in range(1, num_configs + 1):
+            self.get_stream(num_tasks, config)
+
+        self.num_tasks = max(self.num_tasks, num_tasks + 1)
+
+    def update_stream(self, num_tasks, config, **values):
+        self.get_stream(num_tasks, config).update(values)
+
+    def get_unfinished_streams(self):
+        return sorted(
+            (stream for stream in self.streams.values() if not stream["finished"]),
+            key=lambda x: (x["num_tasks"], x["config"]),
+        )
+
+    # Task count to continue the serial loop from
+    def get_resume_num_tasks(self):
+        unfinished = self.get_unfinished_streams()
+        if len(unfinished) > 0:
+            return unfinished[0]["num_tasks"]
+
+        return self.num_tasks
+
+
+# Results already written, by seed. An attempt whose result was written just before
+# a crash is not solved again.
+def read_recorded_results(results_sink, config):
+    return {
+        row["seed"]: row
+        for row in results_sink.read_rows(config)
+        if row.get("seed", None) not in (None, "")
+    }
+
+
+def is_recorded_successful(row):
+    return row["e2e_status"] == "2" and row["mc_status"] == "2"
+
+
+def get_recorded_counter(row):
+    return int(row["index"].split("-")[0])
+
+
+# Runs in the index of a physical system without a matching row in the results
+def find_unrecorded_systems(results_sink, run_index):
+    indices = {row["index"] for row in results_sink.read_rows(run_index.config)}
+
+    return [
+        (counter, run)
+        for counter, run, _, _ in run_index.get_runs()
+        if f"{counter}-{run}" not in indices
+    ]
+
+
+# Unrecorded systems are removed when they are solved again, so that their attempts are
+# saved under the same counter and run. Skipped ones are recorded with the SKIPPED
+# status, which makes the continued campaign pass over their attempts like over the
+# ones that were recorded. Runs imported from the markers have no seed to match them
+# to an attempt, they are always solved again.
+def handle_unrecorded_systems(results_sink, num_configs, policy):
+    utilities = Utilities(results_sink)
+
+    for config in range(1, num_configs + 1):
+        run_index = RunIndex(config)
+        for counter, run in find_unrecorded_systems(results_sink, run_index):
+            name = f"{counter}-{run} of physical system {config}"
+            seed = run_index.get_seed(counter, run)
+            if policy == "resolve" or seed is None:
+                print("-> Solving again unrecorded system", name)
+                run_index.remove_run(counter, run)
+            else:
+                print("-> Skipping unrecorded system", name)
+                saved = load_saved_systems(config, counter, run)
+                num_tasks = None
+                if saved != None:
+                    num_tasks = len(saved["min_e2e"]["EntityStore"])
+                utilities.save_skipped_result(counter, run, config, seed, num_tasks)
+        run_index.close()
+
+    results_sink.flush()
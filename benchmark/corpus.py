@@ -0,0 +1,119 @@
+import hashlib
+import random
+
+from utilities import Utilities
+from random_generators.task_set_generator import TaskSetGenerator
+from random_generators.system_config_generator import SystemConfigGenerator
+from random_generators.dependency_set_generator import DependencySetGenerator, TOPOLOGIES
+
+
+# Seed of one job, from the campaign seed and the job's coordinates. It does not depend
+# on the order in which the jobs are run.
+def derive_seed(campaign_seed, *coordinates):
+    key = ":".join(str(x) for x in (campaign_seed,) + coordinates)
+    return int.from_bytes(hashlib.sha256(key.encode()).digest()[:8], "big")
+
+
+def new_campaign_seed():
+    return random.SystemRandom().randrange(2**32)
+
+
+def attempt_seed(campaign_seed, config, num_tasks, attempt):
+    return derive_seed(campaign_seed, "attempt", config, num_tasks, attempt)
+
+
+# Dependency topologies of the campaigns, "pairs" draws any pairs of tasks by rejection
+# like the first campaigns did
+DEPENDENCY_TOPOLOGIES = ["pairs"] + TOPOLOGIES
+
+
+# Generates the system of one attempt, or returns None if the utilisation of its tasks
+# is higher than the number of cores. With a target utilisation the task set is drawn
+# with exactly that utilisation instead.
+def generate_attempt(
+    sys_config,
+    num_tasks,
+    seed,
+    max_init_offset,
+    max_wcet,
+    max_duration,
+    utilisation=None,
+    num_dependencies=None,
+    dependency_topology="pairs",
+):
+    rng = random.Random(seed)
+    utilities = Utilities()
+
+    if utilisation is None:
+        task_set = TaskSetGenerator(rng).generate_with_task_limit(
+            num_tasks, max_init_offset, max_wcet, max_duration
+        )
+    elif utilisation > len(sys_config["CoreStore"]):
+        raise ValueError(
+            f"A utilisation of {utilisation} can not be scheduled on "
+            f"{len(sys_config['CoreStore'])} cores"
+        )
+    else:
+        task_set = TaskSetGenerator(rng).generate_with_utilisation_limit(
+            utilisation, num_tasks, max_init_offset, max_wcet, max_duration
+        )
+
+    utilisation = utilities.calculate_utilisation(task_set)
+    if utilisation > len(sys_config["CoreStore"]):
+        return None
+
+    dependency_generator = DependencySetGenerator(rng)
+    if dependency_topology == "pairs":
+        # num_dependencies = num_tasks * (num_tasks - 1) / 2
+        if num_dependencies is None:
+            num_dependencies = 2 * (num_tasks - 1)
+        dependencies = dependency_generator.generate_dependencies(
+            num_dependencies, task_set
+        )
+    else:
+        # By default as many as the topology has, up to two per task
+        if num_dependencies is None:
+            num_dependencies = min(
+                2 * (num_tasks - 1),
+                dependency_generator.get_max_dependencies(dependency_topology, num_tasks),
+            )
+        dependencies = dependency_generator.generate_topology(
+            num_dependencies, task_set, dependency_topology
+        )
+
+    # Only the task set and dependencies differ, the physical system is shared
+    system = utilities.prepare_system(dict(sys_config), task_set, dependencies)
+
+    return system, utilisation
+
+
+def generate_physical_systems(
+    campaign_seed, num_systems, num_cores, num_devs, max_prot, max_net
+):
+    return [
+        SystemConfigGenerator(
+            random.Random(derive_seed(campaign_seed, "physical_system", i))
+        ).generate_sys_config(num_cores, num_devs, max_prot, max_net)
+        for i in range(num_systems)
+    ]
+
+
+# Physical systems from the array generator, which also scales to large topologies
+def generate_physical_system_arrays(
+    campaign_seed,
+    num_systems,
+    num_cores,
+    num_devs,
+    max_prot,
+    max_net,
+    max_speedup=1,
+    link_probability=1.0,
+):
+    return [
+        SystemConfigGenerator(
+            random.Random(derive_seed(campaign_seed, "physical_system_arrays", i))
+        ).generate_physical_system(
+            num_cores, num_devs, max_prot, max_net, max_speedup, link_probability
+        )
+        for i in range(num_systems)
+    ]
@@ -0,0 +1,111 @@
+from ilp.instrumentation import PHASES, Recorder, recording
+from benchmark.corpus import generate_attempt
+from benchmark.runner import solve_attempt
+from benchmark.snapshot import load_saved_systems
+
+
+def find_result(results_sink, config, index):
+    for row in results_sink.read_rows(config):
+        if row["index"] == index:
+            return row
+
+    raise ValueError(f"No result with index {index} for physical system {config}")
+
+
+# Regenerates the system of a result from its seed and solves it again, without
+# saving anything. config is numbered from 1, like the results files.
+def replay_attempt(
+    results_sink,
+    sys_configs,
+    config,
+    index,
+    model_options,
+    max_init_offset,
+    max_wcet,
+    max_duration,
+    warm_start=False,
+    screening=True,
+    heuristic=False,
+    decomposition=False,
+    budget=None,
+    over_budget="skip",
+    utilisation=None,
+    num_dependencies=None,
+    dependency_topology="pairs",
+):
+    row = find_result(results_sink, config, index)
+    if row.get("seed", "") in ("", None):
+        raise ValueError(f"The result {index} was saved without a seed")
+
+    attempt = generate_attempt(
+        sys_configs[config - 1],
+        int(row["num_tasks"]),
+        int(row["seed"]),
+        max_init_offset,
+        max_wcet,
+        max_duration,
+        utilisation,
+        num_dependencies,
+        dependency_topology,
+    )
+    if attempt is None:
+        raise ValueError(f"The seed of {index} does not give a usable task set")
+    system, utilisation = attempt
+
+    # The same system is only generated with the generator parameters of the campaign
+    counter, run = index.split("-")
+    saved = load_saved_systems(config, int(counter), int(run))
+    if saved != None and saved["min_e2e"]["EntityStore"] != system["EntityStore"]:
+        print("-> The regenerated tasks differ from the saved system")
+
+    print("-> Replaying", index, "of physical system", config, "with seed", row["seed"])
+    recorder = Recorder()
+    with recording(recorder):
+        (
+            _,
+            min_e2e_result,
+            _,
+            min_core_result,
+            min_core_result_e2e,
+            heuristic_result,
+        ) = solve_attempt(
+            system,
+            model_options,
+            warm_start,
+            verbose=True,
+            screening=screening,
+            heuristic=heuristic,
+            decomposition=decomposition,
+            budget=budget,
+            over_budget=over_budget,
+        )
+
+    print("   -> Utilisation:", utilisation)
+    for name, result in (
+        ("E2E", min_e2e_result),
+        ("MC", min_core_result),
+        ("MC delays", min_core_result_e2e),
+    ):
+        print(
+            f"   -> {name}: status {result.stats.status},",
+            f"objective {result.objective.value()},",
+            f"runtime {result.stats.runtime}",
+        )
+
+    if heuristic_result != None:
+        print(
+            f"   -> Heuristic: E2E total delay {heuristic_result.min_e2e_summary.total_delay},",
+            f"MC cores {heuristic_result.min_core_summary.cores_used},",
+            f"runtime {heuristic_result.runtime}",
+        )
+
+    print(
+        "   -> Phases:",
+        ", ".join(
+            f"{name} {recorder.get_time(name):.3f}s"
+            for name in PHASES
+            if recorder.get_time(name) != None
+        ),
+    )
+
+    return min_e2e_result, min_core_result, min_core_result_e2e
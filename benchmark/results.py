@@ -0,0 +1,300 @@
+import csv
+import glob
+from abc import ABC, abstractmethod
+import os
+import sqlite3
+import time
+
+
+RESULTS_FORMATS = ["csv", "sqlite", "parquet"]
+
+
+# Writes the rows of the whole campaign in batches. Rows are written when flush_rows
+# rows are waiting or flush_interval seconds have passed, and on close. The flush
+# listeners are called after every flush, with all rows so far written.
+class ResultsSink(ABC):
+    def __init__(self, base_path="results", flush_rows=100, flush_interval=60):
+        self.base_path = base_path
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+
+        self.fieldnames = None
+        self.rows = {}
+        self.num_rows = 0
+        self.last_flush = time.monotonic()
+        self.flush_listeners = []
+
+    def add_flush_listener(self, listener):
+        self.flush_listeners.append(listener)
+
+    # config is the physical system, numbered from 1
+    def add_row(self, config, fieldnames, row):
+        self.fieldnames = fieldnames
+        self.rows.setdefault(config, []).append(row)
+        self.num_rows += 1
+
+        if (
+            self.num_rows >= self.flush_rows
+            or time.monotonic() - self.last_flush >= self.flush_interval
+        ):
+            self.flush()
+
+    def flush(self):
+        for config, rows in self.rows.items():
+            if len(rows) > 0:
+                self.write_rows(config, rows)
+
+        self.rows = {}
+        self.num_rows = 0
+        self.last_flush = time.monotonic()
+
+        for listener in self.flush_listeners:
+            listener()
+
+    def close(self):
+        self.flush()
+
+    @abstractmethod
+    def write_rows(self, config, rows):
+        pass
+
+    # Rows written so far, with the values as strings like in the CSV
+    @abstractmethod
+    def read_rows(self, config):
+        pass
+
+
+# The original layout, one CSV file per physical system
+class CsvResultsSink(ResultsSink):
+    def __init__(self, base_path="results", flush_rows=100, flush_interval=60):
+        super().__init__(base_path, flush_rows, flush_interval)
+        self.files = {}
+
+    def get_file_path(self, config):
+        return f"{self.base_path}/physical_system{config:02d}_results.csv"
+
+    def write_rows(self, config, rows):
+        if config not in self.files:
+            file_path = self.get_file_path(config)
+            write_header = not os.path.exists(file_path)
+            if not write_header:
+                self.upgrade_header(file_path)
+
+            csvfile = open(file_path, "a", newline="")
+            writer = csv.DictWriter(csvfile, fieldnames=self.fieldnames)
+            if write_header:
+                writer.writeheader()
+
+            self.files[config] = (csvfile, writer)
+
+        csvfile, writer = self.files[config]
+        writer.writerows(rows)
+        csvfile.flush()
+        os.fsync(csvfile.fileno())
+
+    # Files written before columns were added are rewritten once with the new header, the
+    # added columns are empty in the old rows
+    def upgrade_header(self, file_path):
+        with open(file_path, newline="") as csvfile:
+            reader = csv.DictReader(csvfile)
+            if reader.fieldnames == self.fieldnames:
+                return
+            rows = list(reader)
+            old_fieldnames = reader.fieldnames or []
+
+        self.fieldnames = self.fieldnames + [
+            name for name in old_fieldnames if name not in self.fieldnames
+        ]
+
+        with open(file_path + ".tmp", "w", newline="") as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=self.fieldnames, restval="")
+            writer.writeheader()
+            writer.writerows(rows)
+        os.replace(file_path + ".tmp", file_path)
+
+    def read_rows(self, config):
+        file_path = self.get_file_path(config)
+        if not os.path.exists(file_path):
+            return []
+
+        with open(file_path, newline="") as csvfile:
+            return list(csv.DictReader(csvfile))
+
+    def close(self):
+        super().close()
+
+        for csvfile, _ in self.files.values():
+            csvfile.close()
+        self.files = {}
+
+
+# One table for every physical system, indexed for the usual queries
+class SqliteResultsSink(ResultsSink):
+    def __init__(self, base_path="results", flush_rows=100, flush_interval=60):
+        super().__init__(base_path, flush_rows, flush_interval)
+        self.connection = sqlite3.connect(f"{base_path}/results.sqlite")
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.columns = None
+
+    def create_table(self):
+        self.columns = ["config"] + self.fieldnames
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            + ", ".join(f'"{column}"' for column in self.columns)
+            + ")"
+        )
+
+        # Columns added since the table was created
+        existing = {row[1] for row in self.connection.execute("PRAGMA table_info(results)")}
+        for column in self.columns:
+            if column not in existing:
+                self.connection.execute(f'ALTER TABLE results ADD COLUMN "{column}"')
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS results_config ON results (config, num_tasks)"
+        )
+        self.connection.execute(
+            'CREATE INDEX IF NOT EXISTS results_index ON results (config, "index")'
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS results_seed ON results (seed)"
+        )
+
+    def write_rows(self, config, rows):
+        if self.columns is None:
+            self.create_table()
+
+        # Seeds do not fit in an SQLite integer
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO results ("
+                + ", ".join(f'"{column}"' for column in self.columns)
+                + ") VALUES ("
+                + ", ".join("?" for _ in self.columns)
+                + ")",
+                [
+                    [config]
+                    + [
+                        str(row[name]) if name == "seed" and row[name] != None else row[name]
+                        for name in self.fieldnames
+                    ]
+                    for row in rows
+                ],
+            )
+
+    def read_rows(self, config):
+        if (
+            self.connection.execute(
+                "SELECT name FROM sqlite_master WHERE type='table' AND name='results'"
+            ).fetchone()
+            is None
+        ):
+            return []
+
+        cursor = self.connection.execute(
+            "SELECT * FROM results WHERE config = ?", (config,)
+        )
+        names = [description[0] for description in cursor.description]
+
+        return [
+            {
+                name: "" if value is None else str(value)
+                for name, value in zip(names, values)
+                if name != "config"
+            }
+            for values in cursor
+        ]
+
+    def close(self):
+        super().close()
+        self.connection.close()
+
+
+# A Parquet dataset per physical system. Parquet files can not be appended to and are
+# only readable once their footer is written, so every flush writes and closes a part
+# file of its own. A part is written under a temporary name first, a run killed while
+# writing it leaves no unreadable part behind.
+class ParquetResultsSink(ResultsSink):
+    string_fields = ["index", "solver", "seed"]
+
+    def __init__(self, base_path="results", flush_rows=100, flush_interval=60):
+        # Only needed for this format
+        import pyarrow
+        import pyarrow.parquet
+
+        super().__init__(base_path, flush_rows, flush_interval)
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        self.session = time.strftime("%Y%m%d-%H%M%S")
+        self.num_parts = {}
+
+    def get_directory(self, config):
+        return f"{self.base_path}/physical_system{config:02d}_results"
+
+    def get_schema(self):
+        return self.pa.schema(
+            [
+                (
+                    name,
+                    self.pa.string() if name in self.string_fields else self.pa.float64(),
+                )
+                for name in self.fieldnames
+            ]
+        )
+
+    def write_rows(self, config, rows):
+        schema = self.get_schema()
+
+        directory = self.get_directory(config)
+        os.makedirs(directory, exist_ok=True)
+        self.num_parts[config] = self.num_parts.get(config, 0) + 1
+        file_path = os.path.join(
+            directory,
+            f"part-{self.session}-{os.getpid()}-{self.num_parts[config]:05d}.parquet",
+        )
+
+        columns = {
+            name: [
+                None
+                if row[name] is None
+                else str(row[name]) if name in self.string_fields else float(row[name])
+                for row in rows
+            ]
+            for name in self.fieldnames
+        }
+        with open(file_path + ".tmp", "wb") as outfile:
+            self.pq.write_table(self.pa.table(columns, schema=schema), outfile)
+            outfile.flush()
+            os.fsync(outfile.fileno())
+        os.replace(file_path + ".tmp", file_path)
+
+    def read_rows(self, config):
+        parts = sorted(glob.glob(os.path.join(self.get_directory(config), "*.parquet")))
+
+        rows = []
+        for part in parts:
+            for row in self.pq.read_table(part).to_pylist():
+                rows.append(
+                    {
+                        name: "" if value is None else self.format_value(name, value)
+                        for name, value in row.items()
+                    }
+                )
+
+        return rows
+
+    def format_value(self, name, value):
+        # Whole numbers are written like the CSV does for the integer columns
+        if name not in self.string_fields and float(value).is_integer():
+            return str(int(value))
+        return str(value)
+
+
+def create_results_sink(results_format="csv", base_path="results", **kwargs):
+    if results_format == "csv":
+        return CsvResultsSink(base_path, **kwargs)
+    if results_format == "sqlite":
+        return SqliteResultsSink(base_path, **kwargs)
+    if results_format == "parquet":
+        return ParquetResultsSink(base_path, **kwargs)
+
+    raise ValueError(f"Unknown results format: {results_format}")
@@ -0,0 +1,130 @@
+import glob
+import json
+import os
+import re
+import sqlite3
+
+from benchmark.snapshot import find_saved_files
+
+
+# Index of the attempts saved for one physical system, in system_config/NN/index.sqlite.
+# Counters are given out in a write transaction, so several processes can save into the
+# same directory, and finding a free counter does not depend on the number of runs.
+class RunIndex:
+    def __init__(self, config, directory="system_config"):
+        self.config = config
+        self.directory = os.path.join(directory, f"{config:02d}")
+        os.makedirs(self.directory, exist_ok=True)
+
+        self.connection = sqlite3.connect(
+            os.path.join(self.directory, "index.sqlite"), timeout=60, isolation_level=None
+        )
+        self.connection.execute("PRAGMA journal_mode=WAL")
+
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            exists = self.connection.execute(
+                "SELECT name FROM sqlite_master WHERE type='table' AND name='runs'"
+            ).fetchone()
+            if exists is None:
+                self.connection.execute(
+                    "CREATE TABLE runs ("
+                    "counter INTEGER NOT NULL, "
+                    "run INTEGER NOT NULL, "
+                    "solved INTEGER NOT NULL, "
+                    "files TEXT NOT NULL, "
+                    "seed TEXT, "
+                    "PRIMARY KEY (run, counter))"
+                )
+                self.import_markers()
+            self.connection.execute("COMMIT")
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+
+    # Runs saved before there was an index have a systemXXX-run.txt marker
+    def import_markers(self):
+        for file_path in glob.glob(os.path.join(glob.escape(self.directory), "system*-*.txt")):
+            match = re.fullmatch(r"system(\d+)-(\d+)\.txt", os.path.basename(file_path))
+            if match is None:
+                continue
+
+            counter, run = int(match.group(1)), int(match.group(2))
+            with open(file_path) as infile:
+                solved = infile.read().strip() == "Solved"
+
+            self.connection.execute(
+                "INSERT OR IGNORE INTO runs (counter, run, solved, files) "
+                "VALUES (?, ?, ?, ?)",
+                (
+                    counter,
+                    run,
+                    int(solved),
+                    json.dumps(
+                        [file_path] + find_saved_files(self.config, counter, run)
+                    ),
+                ),
+            )
+
+    # Reserves the first free counter from counter on, for the given run. The seed of the
+    # attempt is kept, so that a run whose result was lost can be recorded as skipped.
+    def reserve_run(self, counter, run, solved, seed):
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            for (used,) in self.connection.execute(
+                "SELECT counter FROM runs WHERE run = ? AND counter >= ? ORDER BY counter",
+                (run, counter),
+            ):
+                if used != counter:
+                    break
+                counter += 1
+
+            self.connection.execute(
+                "INSERT INTO runs VALUES (?, ?, ?, ?, ?)",
+                (counter, run, int(solved), "[]", str(seed)),
+            )
+            self.connection.execute("COMMIT")
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+
+        return counter
+
+    def set_files(self, counter, run, files):
+        self.connection.execute(
+            "UPDATE runs SET files = ? WHERE counter = ? AND run = ?",
+            (json.dumps(files), counter, run),
+        )
+
+    # (counter, run, solved, files) of every saved run
+    def get_runs(self):
+        return [
+            (counter, run, bool(solved), json.loads(files))
+            for counter, run, solved, files in self.connection.execute(
+                "SELECT counter, run, solved, files FROM runs ORDER BY counter, run"
+            )
+        ]
+
+    # None for the runs imported from the markers
+    def get_seed(self, counter, run):
+        return self.connection.execute(
+            "SELECT seed FROM runs WHERE counter = ? AND run = ?", (counter, run)
+        ).fetchone()[0]
+
+    # Removes a run and its files, also the ones of a save that did not finish
+    def remove_run(self, counter, run):
+        row = self.connection.execute(
+            "SELECT files FROM runs WHERE counter = ? AND run = ?", (counter, run)
+        ).fetchone()
+        files = json.loads(row[0]) if row != None else []
+
+        for file_path in set(files + find_saved_files(self.config, counter, run)):
+            if os.path.exists(file_path):
+                os.remove(file_path)
+
+        self.connection.execute(
+            "DELETE FROM runs WHERE counter = ? AND run = ?", (counter, run)
+        )
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,522 @@
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from utilities import Utilities
+from ilp.benders import BendersScheduler
+from ilp.heuristic import HeuristicResult
+from ilp.instrumentation import Recorder, phase, recording
+from ilp.model_size import ModelSizeEstimate, create_over_budget_result
+from ilp.multicore import MultiCoreScheduler
+from ilp.screening import FeasibilityScreen
+from benchmark.corpus import attempt_seed, generate_attempt
+from benchmark.campaign import (
+    get_recorded_counter,
+    is_recorded_successful,
+    read_recorded_results,
+)
+
+
+# Schedules one system for E2E and MC, and calculates the delays of the MC schedule.
+# Solves that the screening proves infeasible are not run, their results have the
+# status SCREENED_INFEASIBLE. With heuristic, the heuristic schedules are returned as
+# well, and are the starts of the E2E and MC solves when warm starting. With
+# decomposition, the attempt is solved by BendersScheduler instead of the full model.
+def solve_attempt(
+    system,
+    model_options,
+    warm_start=False,
+    verbose=False,
+    screening=True,
+    heuristic=False,
+    decomposition=False,
+    budget=None,
+    over_budget="skip",
+):
+    # The number of workers is only an option of the decomposition
+    model_options = dict(model_options)
+    benders_workers = model_options.pop("benders_workers", 1)
+
+    screen = None
+    dependency_reason = None
+    if screening:
+        solver = model_options.get("solver", "gurobi")
+        with phase("screen"):
+            screen = FeasibilityScreen(system)
+            reason = screen.check_windows()
+            if reason == None:
+                dependency_reason = screen.check_dependencies()
+
+        if reason != None:
+            if verbose:
+                print("      -> Screened out:", reason)
+            screened_result = screen.create_result(solver)
+            return (
+                screen.get_unscheduled_instances(),
+                screened_result,
+                screen.get_unscheduled_instances(),
+                screened_result,
+                screened_result,
+                None,
+            )
+
+        if dependency_reason != None and verbose:
+            print("      -> E2E screened out:", dependency_reason)
+
+    heuristic_result = None
+    if heuristic:
+        if verbose:
+            print("      -> Scheduling with the heuristic")
+        with phase("heuristic"):
+            heuristic_result = HeuristicResult(system)
+
+    # The model is estimated before it is built, one over the budget is skipped or
+    # solved by the decomposition instead
+    if budget != None and not decomposition:
+        start_time = time.time()
+        with phase("estimate"):
+            estimate = ModelSizeEstimate(system, **model_options)
+            reason = budget.check(estimate)
+        if reason != None:
+            if verbose:
+                print("      -> Over the budget:", reason)
+
+            if over_budget == "benders":
+                decomposition = True
+            else:
+                skipped_result = create_over_budget_result(
+                    model_options.get("solver", "gurobi"), time.time() - start_time
+                )
+                return (
+                    estimate.get_unscheduled_instances(),
+                    skipped_result,
+                    estimate.get_unscheduled_instances(),
+                    skipped_result,
+                    skipped_result,
+                    heuristic_result,
+                )
+
+    if decomposition:
+        return solve_decomposed(
+            system, model_options, benders_workers, screen, dependency_reason, verbose
+        ) + (heuristic_result,)
+
+    scheduler = MultiCoreScheduler()
+
+    # The model is built once and then solved for each objective
+    with phase("build"):
+        scheduler.build_model(system, **model_options)
+
+    if dependency_reason != None:
+        min_e2e_tasks_instances = screen.get_unscheduled_instances()
+        min_e2e_result = screen.create_result(solver)
+    else:
+        if verbose:
+            print("      -> Scheduling for E2E")
+        if warm_start and heuristic_result != None:
+            if heuristic_result.min_e2e_tasks_instances != None:
+                scheduler.set_initial_schedule(heuristic_result.min_e2e_tasks_instances)
+        min_e2e_tasks_instances, min_e2e_result = scheduler.solve_model("e2e")
+
+    if verbose:
+        print("      -> Scheduling for MC")
+    if warm_start:
+        if (
+            heuristic_result != None
+            and heuristic_result.min_core_tasks_instances != None
+        ):
+            scheduler.set_initial_schedule(heuristic_result.min_core_tasks_instances)
+        else:
+            scheduler.set_initial_schedule(min_e2e_tasks_instances)
+
+    # For MC we first want to do the allocation
+    min_core_tasks_instances, min_core_result = scheduler.solve_model("c")
+
+    # And if it was successful, calculate the delays
+    min_core_result_e2e = min_core_result
+    if min_core_result.stats.is_optimal() and dependency_reason != None:
+        min_core_result_e2e = screen.create_result(solver)
+    elif min_core_result.stats.is_optimal():
+        # Then fix the cores and timings of this allocation
+        scheduler.fix_schedule(min_core_tasks_instances)
+        if warm_start:
+            scheduler.set_initial_schedule(min_core_tasks_instances)
+
+        # And then run for E2E to get delays
+        if verbose:
+            print("      -> Calculating MC delays")
+        _, min_core_result_e2e = scheduler.solve_model("e2e")
+        scheduler.unfix_schedule()
+
+    return (
+        min_e2e_tasks_instances,
+        min_e2e_result,
+        min_core_tasks_instances,
+        min_core_result,
+        min_core_result_e2e,
+        heuristic_result,
+    )
+
+
+# The delays of the MC schedule follow from its core assignment, which the MC result
+# already holds
+def solve_decomposed(
+    system, model_options, benders_workers, screen, dependency_reason, verbose
+):
+    solver = model_options.get("solver", "gurobi")
+    with phase("build"):
+        scheduler = BendersScheduler(
+            system,
+            solver,
+            model_options.get("builder", "pulp"),
+            model_options.get("threads", None),
+            workers=benders_workers,
+        )
+
+    if dependency_reason != None:
+        min_e2e_tasks_instances = screen.get_unscheduled_instances()
+        min_e2e_result = screen.create_result(solver)
+    else:
+        if verbose:
+            print("      -> Scheduling for E2E with the decomposition")
+        min_e2e_tasks_instances, min_e2e_result = scheduler.solve("e2e")
+
+    if verbose:
+        print("      -> Scheduling for MC with the decomposition")
+    min_core_tasks_instances, min_core_result = scheduler.solve("c")
+
+    min_core_result_e2e = min_core_result
+    if min_core_result.stats.is_optimal() and dependency_reason != None:
+        min_core_result_e2e = screen.create_result(solver)
+
+    return (
+        min_e2e_tasks_instances,
+        min_e2e_result,
+        min_core_tasks_instances,
+        min_core_result,
+        min_core_result_e2e,
+    )
+
+
+# Runs solve_attempt in a worker process with the recorder of the attempt, whose copy
+# is returned with the results
+def solve_recorded_attempt(recorder, *args, **kwargs):
+    with recording(recorder):
+        result = solve_attempt(*args, **kwargs)
+
+    return result, recorder
+
+
+# The attempts for one task count on one physical system
+class Stream:
+    def __init__(self, num_tasks, config, saved=None):
+        self.num_tasks = num_tasks
+        self.config = config
+
+        self.solvable_count = 0
+        self.in_flight = 0
+        self.finished = False
+
+        # Every generated task set is an attempt with its own seed, run numbers are
+        # only given to the ones that are scheduled. They are given out when an attempt is
+        # submitted, and the results are saved in the same order.
+        self.next_attempt = 1
+        self.next_run = 1
+        self.next_saved_run = 1
+        self.counter = 1
+        self.attempts = {}
+        self.results = {}
+
+        # Continue from the campaign state
+        if saved != None:
+            self.solvable_count = saved["solvable_count"]
+            self.next_attempt = saved["next_attempt"]
+            self.next_run = saved["next_run"]
+            self.next_saved_run = saved["next_run"]
+            self.counter = saved["counter"]
+
+    def needs_attempt(self, solvable_target):
+        return (
+            not self.finished
+            and self.solvable_count + self.in_flight < solvable_target
+        )
+
+
+# Solves the attempts of several physical systems and task counts in worker processes.
+# Systems are generated and results are saved by the parent only, in attempt order, so
+# the stopping rule and the counter/run numbering are the same as in the serial loop.
+class ParallelRunner:
+    def __init__(
+        self,
+        sys_configs,
+        model_options,
+        jobs,
+        max_init_offset,
+        max_wcet,
+        max_duration,
+        campaign_seed,
+        warm_start=False,
+        screening=True,
+        heuristic=False,
+        decomposition=False,
+        budget=None,
+        over_budget="skip",
+        utilisation=None,
+        num_dependencies=None,
+        dependency_topology="pairs",
+        instrumentation=True,
+        trace=None,
+        solvable_target=10,
+        state=None,
+        results_sink=None,
+        snapshot_format="json",
+    ):
+        self.utilities = Utilities(results_sink, snapshot_format)
+        self.state = state
+
+        self.sys_configs = sys_configs
+        self.campaign_seed = campaign_seed
+        self.jobs = jobs
+        self.max_init_offset = max_init_offset
+        self.max_wcet = max_wcet
+        self.max_duration = max_duration
+        self.warm_start = warm_start
+        self.screening = screening
+        self.heuristic = heuristic
+        self.decomposition = decomposition
+        self.budget = budget
+        self.over_budget = over_budget
+        self.utilisation = utilisation
+        self.num_dependencies = num_dependencies
+        self.dependency_topology = dependency_topology
+        self.instrumentation = instrumentation
+        self.trace = trace
+        self.solvable_target = solvable_target
+
+        # Share the cores between the workers unless a thread limit is given
+        self.model_options = dict(model_options)
+        if self.model_options.get("threads", None) is None:
+            self.model_options["threads"] = max(1, (os.cpu_count() or 1) // jobs)
+
+        self.streams = []
+        self.pending = {}
+        self.recorded = [
+            read_recorded_results(self.utilities.results_sink, config + 1)
+            for config in range(len(sys_configs))
+        ]
+
+    # Runs forever, like the serial loop, unless max_tasks is given
+    def run(self, num_tasks, max_tasks=None):
+        next_num_tasks = num_tasks
+
+        if self.state != None and len(self.state.streams) > 0:
+            for saved in self.state.get_unfinished_streams():
+                self.streams.append(
+                    Stream(saved["num_tasks"], saved["config"] - 1, saved)
+                )
+            next_num_tasks = self.state.num_tasks
+
+        with ProcessPoolExecutor(max_workers=self.jobs) as executor:
+            while True:
+                # Keep every worker busy, the earliest streams first
+                while len(self.pending) < self.jobs:
+                    stream = next(
+                        (
+                            stream
+                            for stream in self.streams
+                            if stream.needs_attempt(self.solvable_target)
+                        ),
+                        None,
+                    )
+                    if stream is None:
+                        if max_tasks != None and next_num_tasks > max_tasks:
+                            break
+
+                        print("Benchmarking for", next_num_tasks, "tasks")
+                        for i in range(len(self.sys_configs)):
+                            self.streams.append(Stream(next_num_tasks, i))
+                        if self.state != None:
+                            self.state.open_task_count(
+                                next_num_tasks, len(self.sys_configs)
+                            )
+                            self.utilities.results_sink.flush()
+                        next_num_tasks += 1
+                        continue
+
+                    self.submit_attempt(executor, stream)
+
+                if len(self.pending) == 0:
+                    break
+
+                done, _ = wait(self.pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stream, run = self.pending.pop(future)
+                    stream.in_flight -= 1
+                    if not stream.finished:
+                        stream.results[run] = future.result()
+                        self.save_results(stream)
+
+                self.streams = [stream for stream in self.streams if not stream.finished]
+
+    def submit_attempt(self, executor, stream):
+        # If the utilisation is gt number of cores, generate another task set
+        generated = None
+        while generated is None:
+            attempt = stream.next_attempt
+            seed = attempt_seed(
+                self.campaign_seed, stream.config + 1, stream.num_tasks, attempt
+            )
+            stream.next_attempt += 1
+
+            recorder = Recorder(self.instrumentation, self.trace != None)
+            with recorder.phase("generate"):
+                generated = generate_attempt(
+                    self.sys_configs[stream.config],
+                    stream.num_tasks,
+                    seed,
+                    self.max_init_offset,
+                    self.max_wcet,
+                    self.max_duration,
+                    self.utilisation,
+                    self.num_dependencies,
+                    self.dependency_topology,
+                )
+        system, utilisation = generated
+
+        run = stream.next_run
+        stream.next_run += 1
+        stream.attempts[run] = (system, utilisation, seed, attempt, recorder)
+
+        # Written just before the campaign stopped
+        recorded = self.recorded[stream.config].get(str(seed), None)
+        if recorded != None:
+            stream.results[run] = recorded
+            self.save_results(stream)
+            return
+
+        stream.in_flight += 1
+
+        future = executor.submit(
+            solve_recorded_attempt,
+            recorder,
+            system,
+            self.model_options,
+            self.warm_start,
+            screening=self.screening,
+            heuristic=self.heuristic,
+            decomposition=self.decomposition,
+            budget=self.budget,
+            over_budget=self.over_budget,
+        )
+        self.pending[future] = (stream, run)
+
+    def save_results(self, stream):
+        while not stream.finished and stream.next_saved_run in stream.results:
+            run = stream.next_saved_run
+            stream.next_saved_run += 1
+
+            system, utilisation, seed, attempt, recorder = stream.attempts.pop(run)
+            result = stream.results.pop(run)
+
+            if isinstance(result, dict):
+                print(
+                    f"-> {stream.num_tasks} tasks, physical system {stream.config},",
+                    f"attempt #{run}: already recorded as",
+                    result["index"],
+                )
+                stream.counter = get_recorded_counter(result)
+                if is_recorded_successful(result):
+                    stream.solvable_count += 1
+                self.finish_attempt(stream, run, attempt)
+                continue
+
+            # The copy of the recorder from the worker has the phases of the solve too
+            result, recorder = result
+            (
+                min_e2e_tasks_instances,
+                min_e2e_result,
+                min_core_tasks_instances,
+                min_core_result,
+                min_core_result_e2e,
+                heuristic_result,
+            ) = result
+
+            successful = False
+            if min_core_result.stats.is_optimal() and min_e2e_result.stats.is_optimal():
+                successful = True
+                stream.solvable_count += 1
+
+            print(
+                f"-> {stream.num_tasks} tasks, physical system {stream.config},",
+                f"attempt #{run}: statuses",
+                min_e2e_result.stats.status,
+                min_core_result.stats.status,
+                "solvable count",
+                stream.solvable_count,
+            )
+
+            with recorder.phase("save_system"):
+                stream.counter, min_e2e_system, _ = self.utilities.save_system(
+                    system,
+                    min_e2e_tasks_instances,
+                    min_core_tasks_instances,
+                    run,
+                    stream.config + 1,
+                    stream.counter,
+                    successful,
+                    seed,
+                )
+
+            self.utilities.save_result(
+                min_e2e_result,
+                min_e2e_system,
+                min_core_result,
+                min_core_result_e2e,
+                stream.counter,
+                utilisation,
+                run,
+                stream.config + 1,
+                seed,
+                heuristic_result,
+                recorder,
+            )
+
+            if self.trace != None:
+                self.trace.write(
+                    recorder,
+                    f"attempt {stream.counter}-{run}",
+                    {
+                        "config": stream.config + 1,
+                        "num_tasks": stream.num_tasks,
+                        "seed": seed,
+                    },
+                )
+
+            self.finish_attempt(stream, run, attempt)
+
+    def finish_attempt(self, stream, run, attempt):
+        if stream.solvable_count >= self.solvable_target:
+            self.finish_stream(stream)
+
+        if self.state != None:
+            self.state.update_stream(
+                stream.num_tasks,
+                stream.config + 1,
+                solvable_count=stream.solvable_count,
+                next_attempt=attempt + 1,
+                next_run=run + 1,
+                counter=stream.counter,
+                finished=stream.finished,
+            )
+
+    # Later attempts of a finished stream are not saved, the serial loop would not
+    # have run them
+    def finish_stream(self, stream):
+        stream.finished = True
+        stream.attempts = {}
+        stream.results = {}
+
+        for future, (pending_stream, _) in list(self.pending.items()):
+            if pending_stream is stream and future.cancel():
+                del self.pending[future]
+                stream.in_flight -= 1
@@ -0,0 +1,234 @@
+import argparse
+import gzip
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from ilp.multicore import MultiCoreScheduler
+
+
+SNAPSHOT_FORMATS = ["json", "compact", "binary"]
+SOLUTIONS = ["min_e2e", "min_core"]
+PHYSICAL_STORES = ["CoreStore", "DeviceStore", "NetworkDelayStore"]
+
+
+# The physical system is written once per system directory, named after its contents so
+# that snapshots of different campaigns never refer to the wrong one
+def save_physical_system(directory, system):
+    physical_system = {store: system[store] for store in PHYSICAL_STORES}
+    key = json.dumps(physical_system, sort_keys=True)
+    filename = f"physical_system-{hashlib.md5(key.encode()).hexdigest()[:12]}.json"
+
+    file_path = os.path.join(directory, filename)
+    if not os.path.exists(file_path):
+        os.makedirs(directory, exist_ok=True)
+        with open(file_path, "w") as outfile:
+            json.dump(physical_system, outfile)
+
+    return filename
+
+
+# One row of (task, instance, core, start, end) per instance, the core is an index into
+# the CoreStore and -1 if the task was not scheduled
+def get_solution_rows(system, tasks_instances):
+    core_indices = {core["name"]: i for i, core in enumerate(system["CoreStore"])}
+    task_indices = {task["name"]: i for i, task in enumerate(system["EntityStore"])}
+
+    rows = []
+    for task in tasks_instances:
+        for instance in task["value"]:
+            if "executionIntervals" in instance:
+                interval = instance["executionIntervals"][0]
+                rows.append(
+                    (
+                        task_indices[task["name"]],
+                        instance["instance"],
+                        core_indices[interval["core"]],
+                        interval["startTime"],
+                        interval["endTime"],
+                    )
+                )
+            else:
+                rows.append((task_indices[task["name"]], instance["instance"], -1, None, None))
+
+    return rows
+
+
+def get_snapshot_path(directory, counter, run, snapshot_format):
+    extension = ".npz" if snapshot_format == "binary" else ".json.gz"
+    return os.path.join(directory, f"snapshot{counter:03d}-{run}{extension}")
+
+
+# Writes the task set once and the solutions as rows, gzipped JSON for "compact" and
+# compressed numpy arrays for "binary"
+def save_snapshot(file_path, physical_system, system, solutions, snapshot_format):
+    metadata = {
+        "physical_system": physical_system,
+        "EntityStore": system["EntityStore"],
+        "DependencyStore": system["DependencyStore"],
+    }
+    rows = {
+        name: get_solution_rows(system, tasks_instances)
+        for name, tasks_instances in solutions.items()
+    }
+
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+    if snapshot_format == "compact":
+        with gzip.open(file_path, "wt") as outfile:
+            json.dump(dict(metadata, solutions=rows), outfile, separators=(",", ":"))
+        return
+
+    arrays = {
+        "metadata": np.frombuffer(json.dumps(metadata).encode(), dtype=np.uint8)
+    }
+    for name, solution_rows in rows.items():
+        arrays[f"{name}_task"] = np.array([row[0] for row in solution_rows], dtype=np.int32)
+        arrays[f"{name}_instance"] = np.array([row[1] for row in solution_rows], dtype=np.int32)
+        arrays[f"{name}_core"] = np.array([row[2] for row in solution_rows], dtype=np.int32)
+        arrays[f"{name}_start"] = np.array(
+            [np.nan if row[3] is None else row[3] for row in solution_rows], dtype=np.float64
+        )
+        arrays[f"{name}_end"] = np.array(
+            [np.nan if row[4] is None else row[4] for row in solution_rows], dtype=np.float64
+        )
+
+    with open(file_path, "wb") as outfile:
+        np.savez_compressed(outfile, **arrays)
+
+
+def read_snapshot(file_path):
+    if file_path.endswith(".json.gz"):
+        with gzip.open(file_path, "rt") as infile:
+            snapshot = json.load(infile)
+        return snapshot, snapshot["solutions"]
+
+    with np.load(file_path, allow_pickle=False) as arrays:
+        snapshot = json.loads(arrays["metadata"].tobytes().decode())
+        rows = {
+            name: list(
+                zip(
+                    arrays[f"{name}_task"].tolist(),
+                    arrays[f"{name}_instance"].tolist(),
+                    arrays[f"{name}_core"].tolist(),
+                    arrays[f"{name}_start"].tolist(),
+                    arrays[f"{name}_end"].tolist(),
+                )
+            )
+            for name in SOLUTIONS
+        }
+
+    return snapshot, rows
+
+
+# Rebuilds the LetSynchronise systems of a snapshot, the same as the JSON files that
+# save_system writes otherwise
+def load_snapshot(file_path):
+    snapshot, rows = read_snapshot(file_path)
+
+    # The snapshot is in the Solved or Not solved directory of its system
+    system_directory = os.path.dirname(os.path.dirname(file_path))
+    with open(os.path.join(system_directory, snapshot["physical_system"])) as infile:
+        physical_system = json.load(infile)
+
+    system = dict(
+        physical_system,
+        EntityStore=snapshot["EntityStore"],
+        DependencyStore=snapshot["DependencyStore"],
+    )
+    tasks = system["EntityStore"]
+    scheduler = MultiCoreScheduler()
+
+    systems = {}
+    for name, solution_rows in rows.items():
+        tasks_instances = [
+            {
+                "name": task["name"],
+                "type": "task",
+                "initialOffset": task["initialOffset"],
+                "value": [],
+            }
+            for task in tasks
+        ]
+
+        for task_index, instance_index, core_index, start_time, end_time in solution_rows:
+            task = tasks[task_index]
+            instance = scheduler.create_task_instance(task, instance_index)
+
+            if core_index != -1:
+                core = system["CoreStore"][core_index]
+                instance["executionTime"] = task["wcet"]
+                instance["currentCore"] = core
+                instance["executionIntervals"] = [
+                    {"core": core["name"], "endTime": end_time, "startTime": start_time}
+                ]
+
+            tasks_instances[task_index]["value"].append(instance)
+
+        systems[name] = dict(system, EntityInstancesStore=tasks_instances)
+
+    return systems
+
+
+# Files of a saved attempt in any of the formats, in the Solved and Not solved
+# directories
+def find_saved_files(config, counter, run):
+    directory = os.path.join("system_config", f"{config:02d}")
+    names = [
+        f"min_core_system{counter:03d}-{run}.json",
+        f"min_e2e_system{counter:03d}-{run}.json",
+        f"snapshot{counter:03d}-{run}.json.gz",
+        f"snapshot{counter:03d}-{run}.npz",
+    ]
+
+    file_paths = [
+        os.path.join(directory, subdir, name)
+        for subdir in ("Solved", "Not solved")
+        for name in names
+    ]
+
+    return [file_path for file_path in file_paths if os.path.exists(file_path)]
+
+
+# The LetSynchronise systems of a saved attempt, or None if it was not saved
+def load_saved_systems(config, counter, run):
+    for file_path in find_saved_files(config, counter, run):
+        if file_path.endswith(".json.gz") or file_path.endswith(".npz"):
+            return load_snapshot(file_path)
+
+    systems = {}
+    for file_path in find_saved_files(config, counter, run):
+        name = os.path.basename(file_path).split("_system")[0]
+        with open(file_path) as infile:
+            systems[name] = json.load(infile)
+
+    if len(systems) == 0:
+        return None
+
+    return systems
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Writes the LetSynchronise systems of a snapshot as JSON"
+    )
+    # Snapshot to convert
+    parser.add_argument("snapshot", type=str)
+    # Directory for the JSON files, next to the snapshot by default
+    parser.add_argument("-o", type=str)
+    args = parser.parse_args()
+
+    directory = args.o if args.o != None else os.path.dirname(args.snapshot)
+    suffix = os.path.basename(args.snapshot).split(".")[0][len("snapshot"):]
+
+    for name, system in load_snapshot(args.snapshot).items():
+        file_path = os.path.join(directory, f"{name}_system{suffix}.json")
+        with open(file_path, "w") as outfile:
+            json.dump(system, outfile, indent=4)
+        print("->", file_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,451 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pulp import constants
+
+from ilp.heuristic import HeuristicScheduler
+from ilp.model_builder import MatrixModelBuilder, ModelResult, PulpModelBuilder
+from ilp.solution_summary import SolutionSummary
+from ilp.solvers import (
+    INF_OR_UNBD,
+    INFEASIBLE,
+    NUMERIC,
+    OPTIMAL,
+    TIME_LIMIT,
+    SolveStats,
+)
+
+
+# Logic-based Benders decomposition. Both objectives only depend on which core each task
+# runs on, so the master problem assigns the tasks to cores and picks the delay of every
+# dependency from the devices of its two tasks. The instances on each core are then
+# sequenced in a subproblem of their own, and a set of tasks that does not fit on a core
+# is cut from every core it could be assigned to.
+class BendersScheduler:
+    def __init__(
+        self,
+        system,
+        solver="gurobi",
+        builder="pulp",
+        threads=None,
+        workers=1,
+        time_limit=5*60,
+    ):
+        self.solver = solver
+        self.builder = builder
+        self.threads = threads
+        self.workers = workers
+        self.time_limit = time_limit
+
+        # The heuristic places the instances of a core and calculates the delays
+        self.heuristic = HeuristicScheduler(system)
+        self.index = self.heuristic.index
+        self.cores = system["CoreStore"]
+        self.allowed_cores = [set(cores) for cores in self.heuristic.allowed_cores]
+
+        # Start times of the task sets that fit on a core, None for the ones that do not
+        self.core_results = {}
+        self.num_cuts = 0
+        self.iterations = 0
+
+        self.build_master()
+
+    def create_model_builder(self, name):
+        if self.builder == "pulp":
+            return PulpModelBuilder(name, self.solver, self.threads)
+        if self.builder == "matrix":
+            return MatrixModelBuilder(name, self.solver, self.threads)
+
+        raise ValueError(f"Unknown model builder: {self.builder}")
+
+    def build_master(self):
+        model = self.create_model_builder("Benders_Master")
+        self.master = model
+
+        tasks = range(len(self.index.tasks))
+
+        self.assigned_vars = model.add_variables(
+            "assigned",
+            (
+                (task_id, core_id)
+                for task_id in tasks
+                for core_id in self.allowed_cores[task_id]
+            ),
+            lowBound=0,
+            upBound=1,
+            cat="Binary",
+        )
+        self.core_used_vars = model.add_variables(
+            "core_used", range(len(self.cores)), lowBound=0, upBound=1, cat="Binary"
+        )
+        self.cores_used_var = model.add_variable("cores_used", lowBound=0, cat="Integer")
+
+        for task_id in tasks:
+            model.add_constraint(
+                [
+                    (self.assigned_vars[(task_id, core_id)], 1)
+                    for core_id in self.allowed_cores[task_id]
+                ],
+                "==",
+                1,
+            )
+            for core_id in self.allowed_cores[task_id]:
+                model.add_constraint(
+                    [
+                        (self.assigned_vars[(task_id, core_id)], 1),
+                        (self.core_used_vars[core_id], -1),
+                    ],
+                    "<=",
+                    0,
+                )
+
+        model.add_constraint(
+            [(self.cores_used_var, 1)]
+            + [(used, -1) for used in self.core_used_vars.values()],
+            "==",
+            0,
+        )
+
+        self.build_delays()
+
+    # One binary per dependency and pair of devices its tasks can be on, linked to the
+    # devices of the assigned cores. Device pairs without a source instance in time for
+    # some destination instance get no variable.
+    def build_delays(self):
+        model = self.master
+
+        self.e2e_infeasible = False
+        constant = 0
+        delay_terms = []
+
+        for dependency in self.heuristic.dependencies:
+            source, destination = dependency
+
+            # A task reads its own earlier instances on the same core
+            if source == destination:
+                delay = self.heuristic.get_dependency_delay(dependency, 0)[0]
+                if delay == float("inf"):
+                    self.e2e_infeasible = True
+                else:
+                    constant += delay
+                continue
+
+            source_devices = self.get_devices(source)
+            destination_devices = self.get_devices(destination)
+
+            pair_vars = {}
+            for device1 in source_devices:
+                for device2 in destination_devices:
+                    delay = self.heuristic.get_dependency_delay(
+                        dependency, self.index.device_delays[device1][device2]
+                    )[0]
+                    if delay == float("inf"):
+                        continue
+
+                    variable = model.add_variable(
+                        f"pair_{source}_{destination}_{device1}_{device2}",
+                        lowBound=0,
+                        upBound=1,
+                        cat="Binary",
+                    )
+                    pair_vars[(device1, device2)] = variable
+                    delay_terms.append((variable, -delay))
+
+            for device1, cores in source_devices.items():
+                model.add_constraint(
+                    [(pair_vars[pair], 1) for pair in pair_vars if pair[0] == device1]
+                    + [(self.assigned_vars[(source, core_id)], -1) for core_id in cores],
+                    "==",
+                    0,
+                    group="e2e",
+                )
+            for device2, cores in destination_devices.items():
+                model.add_constraint(
+                    [(pair_vars[pair], 1) for pair in pair_vars if pair[1] == device2]
+                    + [
+                        (self.assigned_vars[(destination, core_id)], -1)
+                        for core_id in cores
+                    ],
+                    "==",
+                    0,
+                    group="e2e",
+                )
+
+        self.total_delay_var = model.add_variable("total_delay", lowBound=0)
+        model.add_constraint(
+            [(self.total_delay_var, 1)] + delay_terms, "==", constant, group="e2e"
+        )
+
+    # The allowed cores of a task by device
+    def get_devices(self, task_id):
+        devices = {}
+        for core_id in sorted(self.allowed_cores[task_id]):
+            devices.setdefault(self.index.core_device[core_id], []).append(core_id)
+
+        return devices
+
+    def solve(self, method):
+        start_time = time.time()
+        solutionCpuTime = -time.process_time()
+
+        if method == "c":
+            self.master.set_group_enabled("e2e", False)
+            self.master.set_objective([(self.cores_used_var, 1)], "Minimise Core Usage")
+        elif method == "e2e":
+            self.master.set_group_enabled("e2e", True)
+            self.master.set_objective(
+                [(self.total_delay_var, 1)], "Minimise End-to-End Response Time"
+            )
+        else:
+            raise ValueError(f"Unknown method: {method}")
+
+        status = INFEASIBLE
+        master_result = None
+        assignment = None
+        start_times = None
+
+        if (method == "e2e" and self.e2e_infeasible) or any(
+            len(cores) == 0 for cores in self.allowed_cores
+        ):
+            status = INFEASIBLE
+        else:
+            while True:
+                remaining = self.time_limit - (time.time() - start_time)
+                if remaining <= 0:
+                    status = TIME_LIMIT
+                    break
+
+                self.iterations += 1
+                master_result = self.master.solve(remaining)
+                if master_result.stats.status != OPTIMAL:
+                    status = master_result.stats.status
+                    break
+
+                assignment = self.get_assignment()
+                status, start_times, conflicts = self.check_assignment(
+                    assignment, start_time
+                )
+                if status != None:
+                    break
+
+                for tasks in conflicts:
+                    self.add_cut(tasks)
+
+        solutionCpuTime += time.process_time()
+        runtime = time.time() - start_time
+
+        if status == OPTIMAL:
+            tasks_instances = self.heuristic.create_schedule(assignment, start_times)
+            summary = self.heuristic.create_summary(assignment)
+            if summary.total_delay == float("inf"):
+                summary = SolutionSummary(cores_used=summary.cores_used)
+            objective = summary.cores_used if method == "c" else summary.total_delay
+        else:
+            tasks_instances = [
+                dict(task, value=[x for x in task["value"] if x["instance"] != -1])
+                for task in self.heuristic.tasks_instances
+            ]
+            summary = SolutionSummary()
+            objective = None
+
+        lp_status = {
+            OPTIMAL: constants.LpStatusOptimal,
+            INFEASIBLE: constants.LpStatusInfeasible,
+            INF_OR_UNBD: constants.LpStatusInfeasible,
+        }.get(status, constants.LpStatusNotSolved)
+
+        result = ModelResult(
+            [],
+            objective,
+            lp_status,
+            constants.LpStatusToSolution[lp_status],
+            solutionCpuTime,
+            self.create_stats(status, objective, runtime, master_result),
+        )
+        result.summary = summary
+
+        return tasks_instances, result
+
+    # The model sizes are the ones of the last master problem
+    def create_stats(self, status, objective, runtime, master_result):
+        stats = SolveStats(
+            self.solver,
+            status,
+            objective=objective,
+            runtime=runtime,
+            gap=0.0 if status == OPTIMAL else None,
+        )
+        if master_result != None:
+            stats.num_constrs = master_result.stats.num_constrs
+            stats.num_vars = master_result.stats.num_vars
+            stats.num_int_vars = master_result.stats.num_int_vars
+            stats.num_bin_vars = master_result.stats.num_bin_vars
+
+        return stats
+
+    def get_assignment(self):
+        assignment = [None] * len(self.index.tasks)
+        for (task_id, core_id), variable in self.assigned_vars.items():
+            if variable.varValue != None and round(variable.varValue) == 1:
+                assignment[task_id] = core_id
+
+        return assignment
+
+    # Sequences every used core, in parallel threads with more than one worker. Returns
+    # OPTIMAL and the start times when all of them fit, TIME_LIMIT when a subproblem was
+    # not decided in time, and otherwise None and the smallest conflicting task sets
+    # found on the cores.
+    def check_assignment(self, assignment, start_time):
+        core_tasks = [
+            tasks for tasks in self.heuristic.get_core_tasks(assignment) if len(tasks) > 0
+        ]
+
+        def check(tasks):
+            status, start_times = self.check_tasks(tasks, start_time)
+            if status == INFEASIBLE:
+                return status, self.get_conflict(tasks, start_time)
+            return status, start_times
+
+        if self.workers > 1 and len(core_tasks) > 1:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                results = list(executor.map(check, core_tasks))
+        else:
+            results = [check(tasks) for tasks in core_tasks]
+
+        if any(status not in (OPTIMAL, INFEASIBLE) for status, _ in results):
+            return TIME_LIMIT, None, None
+
+        conflicts = [conflict for status, conflict in results if status == INFEASIBLE]
+        if len(conflicts) > 0:
+            return None, None, conflicts
+
+        start_times = {}
+        for _, core_start_times in results:
+            start_times.update(core_start_times)
+
+        return OPTIMAL, start_times, None
+
+    # Drops the tasks that the rest still conflicts without, the smallest first
+    def get_conflict(self, tasks, start_time):
+        conflict = set(tasks)
+        for task_id in sorted(
+            tasks,
+            key=lambda x: self.index.tasks[x]["wcet"] / self.index.tasks[x]["period"],
+        ):
+            if len(conflict) == 1:
+                break
+
+            status, _ = self.check_tasks(conflict - {task_id}, start_time)
+            if status == INFEASIBLE:
+                conflict.remove(task_id)
+
+        return frozenset(conflict)
+
+    # The tasks can not all be on the same core, whichever core it is
+    def add_cut(self, tasks):
+        for core_id in range(len(self.cores)):
+            if all(core_id in self.allowed_cores[task_id] for task_id in tasks):
+                self.master.add_constraint(
+                    [(self.assigned_vars[(task_id, core_id)], 1) for task_id in tasks],
+                    "<=",
+                    len(tasks) - 1,
+                )
+                self.num_cuts += 1
+
+    # The heuristic placement decides most task sets, the others are solved exactly
+    def check_tasks(self, tasks, start_time):
+        tasks = frozenset(tasks)
+        if tasks in self.core_results:
+            start_times = self.core_results[tasks]
+            return (OPTIMAL if start_times != None else INFEASIBLE), start_times
+
+        start_times = self.heuristic.schedule_core(tasks)
+        if start_times != None:
+            self.core_results[tasks] = start_times
+            return OPTIMAL, start_times
+
+        remaining = self.time_limit - (time.time() - start_time)
+        if remaining <= 0:
+            return TIME_LIMIT, None
+
+        status, start_times = self.sequence_core(tasks, remaining)
+        if status == OPTIMAL:
+            self.core_results[tasks] = start_times
+        elif status in (INFEASIBLE, INF_OR_UNBD):
+            status = INFEASIBLE
+            self.core_results[tasks] = None
+
+        return status, start_times
+
+    # Single core sequencing: instances of different tasks with overlapping LET windows
+    # run one after the other, in the order of a binary with big-Ms from the windows
+    def sequence_core(self, tasks, time_limit):
+        model = self.create_model_builder("Benders_Core")
+
+        jobs = sorted(job for task_id in tasks for job in self.heuristic.jobs[task_id])
+        if len(jobs) == 0:
+            return OPTIMAL, {}
+
+        start_vars = {}
+        for let_start, let_end, wcet, task_id, position in jobs:
+            start_vars[(task_id, position)] = model.add_variable(
+                f"start_{task_id}_{position}",
+                lowBound=let_start,
+                upBound=let_end - wcet,
+                cat="Integer",
+            )
+
+        for i, job1 in enumerate(jobs):
+            let_start1, let_end1, wcet1, task1, position1 = job1
+            for let_start2, let_end2, wcet2, task2, position2 in jobs[i + 1:]:
+                if let_start2 >= let_end1:
+                    break
+                if task1 == task2 or wcet1 == 0 or wcet2 == 0:
+                    continue
+
+                start1 = start_vars[(task1, position1)]
+                start2 = start_vars[(task2, position2)]
+                order = model.add_variable(
+                    f"order_{task1}_{position1}_{task2}_{position2}",
+                    lowBound=0,
+                    upBound=1,
+                    cat="Binary",
+                )
+
+                # order = 0: 1 runs before 2, order = 1: 2 runs before 1
+                model.add_constraint(
+                    [(start1, 1), (start2, -1), (order, -(let_end1 - let_start2))],
+                    "<=",
+                    -wcet1,
+                )
+                model.add_constraint(
+                    [(start2, 1), (start1, -1), (order, let_end2 - let_start1)],
+                    "<=",
+                    let_end2 - let_start1 - wcet2,
+                )
+
+        # Only feasibility matters
+        model.set_objective([(start_vars[(jobs[0][3], jobs[0][4])], 0)], "Sequence")
+        result = model.solve(time_limit)
+
+        if result.stats.status != OPTIMAL:
+            return result.stats.status, None
+
+        # The order binaries are only integral up to a tolerance, that the big-Ms can turn
+        # into overlaps. The instances are placed again in the order of the solution,
+        # the ones that overlap no other instance are not part of the solved problem.
+        def get_start_time(job):
+            value = start_vars[(job[3], job[4])].varValue
+            return value if value != None else job[0]
+
+        start_times = {}
+        current_time = 0
+        for let_start, let_end, wcet, task_id, position in sorted(jobs, key=get_start_time):
+            current_time = max(current_time, let_start)
+            if current_time + wcet > let_end:
+                return NUMERIC, None
+
+            start_times[(task_id, position)] = current_time
+            current_time += wcet
+
+        return OPTIMAL, start_times
@@ -0,0 +1,361 @@
+import bisect
+import heapq
+import time
+
+from ilp.multicore import MultiCoreScheduler
+from ilp.solution_summary import SolutionSummary
+from ilp.system_index import SystemIndex
+
+
+# Schedules a system without a solver. Tasks are assigned to cores first-fit, the
+# instances on each core are placed inside their LET windows by earliest deadline, and a
+# local search then frees cores ("c") or lowers the total delay ("e2e"). The schedules
+# have the shape of MultiCoreScheduler.update_schedule and can be used as a MIP start.
+class HeuristicScheduler:
+    def __init__(self, system, max_passes=20):
+        self.max_passes = max_passes
+
+        tasks = system["EntityStore"]
+        self.N = MultiCoreScheduler.calculate_largeN(tasks)
+        self.tasks_instances = MultiCoreScheduler().create_task_instances(
+            MultiCoreScheduler.calculate_makespan(tasks), tasks, self.N
+        )
+        self.index = SystemIndex(system, self.N, self.tasks_instances)
+        self.cores = system["CoreStore"]
+
+        self.allowed_cores = [
+            [
+                core_id
+                for core_id, core in enumerate(self.cores)
+                if self.is_allowed(task, core)
+            ]
+            for task in self.index.tasks
+        ]
+
+        # (letStartTime, letEndTime, wcet, task id, instance) of the instances of each task
+        self.jobs = [
+            [
+                (instance["letStartTime"], instance["letEndTime"], task["wcet"], task_id, i)
+                for i, instance in enumerate(self.index.instances[task_id])
+                if instance["instance"] != -1
+            ]
+            for task_id, task in enumerate(self.index.tasks)
+        ]
+
+        # (source, destination) task ids of the dependencies
+        self.dependencies = [
+            (source, task_id)
+            for task_id in range(len(self.index.tasks))
+            for source in self.index.depends_on[task_id]
+        ]
+        self.task_dependencies = [[] for _ in self.index.tasks]
+        for dependency in self.dependencies:
+            self.task_dependencies[dependency[0]].append(dependency)
+            if dependency[0] != dependency[1]:
+                self.task_dependencies[dependency[1]].append(dependency)
+
+        self.core_cache = {}
+        self.delay_cache = {}
+
+    def is_allowed(self, task, core):
+        if task["requiredCore"] != None:
+            return core["name"] == task["requiredCore"]
+        if task["requiredDevice"] != None:
+            return core["device"] == task["requiredDevice"]
+        return True
+
+    # Returns the schedule and its SolutionSummary, or (None, SolutionSummary()) when no
+    # feasible assignment was found
+    def solve(self, method):
+        assignment = self.assign_first_fit()
+        if assignment is None:
+            return None, SolutionSummary()
+
+        if method == "c":
+            self.reduce_cores(assignment)
+        elif method == "e2e":
+            self.reduce_delay(assignment)
+        else:
+            raise ValueError(f"Unknown method: {method}")
+
+        # Some instance can not read from any source instance, not even the negative one
+        summary = self.create_summary(assignment)
+        if summary.total_delay == float("inf"):
+            return None, SolutionSummary()
+
+        return self.create_schedule(assignment, self.get_start_times(assignment)), summary
+
+    # Largest utilisation first, each on the first core where its instances still fit
+    def assign_first_fit(self):
+        order = sorted(
+            range(len(self.index.tasks)),
+            key=lambda x: -self.index.tasks[x]["wcet"] / self.index.tasks[x]["period"],
+        )
+
+        assignment = [None] * len(self.index.tasks)
+        core_tasks = [frozenset() for _ in self.cores]
+        for task_id in order:
+            for core_id in self.allowed_cores[task_id]:
+                if self.fits(core_tasks[core_id] | {task_id}):
+                    assignment[task_id] = core_id
+                    core_tasks[core_id] = core_tasks[core_id] | {task_id}
+                    break
+            else:
+                return None
+
+        return assignment
+
+    # Empties the least loaded cores while all of their tasks fit on the other used cores
+    def reduce_cores(self, assignment):
+        improved = True
+        while improved:
+            improved = False
+            core_tasks = self.get_core_tasks(assignment)
+            used = sorted(
+                (core_id for core_id, tasks in enumerate(core_tasks) if len(tasks) > 0),
+                key=lambda x: sum(
+                    self.index.tasks[task_id]["wcet"] / self.index.tasks[task_id]["period"]
+                    for task_id in core_tasks[x]
+                ),
+            )
+
+            for core_id in used:
+                moved = self.move_tasks(core_tasks, core_id, used)
+                if moved != None:
+                    for task_id, target in moved.items():
+                        assignment[task_id] = target
+                    improved = True
+                    break
+
+    def move_tasks(self, core_tasks, core_id, used):
+        core_tasks = list(core_tasks)
+        moved = {}
+        for task_id in core_tasks[core_id]:
+            for target in used:
+                if target == core_id or target not in self.allowed_cores[task_id]:
+                    continue
+                if self.fits(core_tasks[target] | {task_id}):
+                    core_tasks[target] = core_tasks[target] | {task_id}
+                    moved[task_id] = target
+                    break
+            else:
+                return None
+
+        return moved
+
+    # Moves single tasks to the core that lowers the total delay the most, until no move
+    # improves it
+    def reduce_delay(self, assignment):
+        for _ in range(self.max_passes):
+            improved = False
+            core_tasks = self.get_core_tasks(assignment)
+
+            for task_id in range(len(self.index.tasks)):
+                if len(self.task_dependencies[task_id]) == 0:
+                    continue
+
+                current = assignment[task_id]
+                current_delay = self.get_task_delay(assignment, task_id)
+                best = None
+                for target in self.allowed_cores[task_id]:
+                    if target == current:
+                        continue
+
+                    assignment[task_id] = target
+                    delay = self.get_task_delay(assignment, task_id)
+                    assignment[task_id] = current
+
+                    if delay < current_delay and self.fits(core_tasks[target] | {task_id}):
+                        best = target
+                        current_delay = delay
+
+                if best != None:
+                    assignment[task_id] = best
+                    core_tasks[current] = core_tasks[current] - {task_id}
+                    core_tasks[best] = core_tasks[best] | {task_id}
+                    improved = True
+
+            if not improved:
+                break
+
+    def get_core_tasks(self, assignment):
+        core_tasks = [set() for _ in self.cores]
+        for task_id, core_id in enumerate(assignment):
+            core_tasks[core_id].add(task_id)
+
+        return [frozenset(tasks) for tasks in core_tasks]
+
+    def fits(self, tasks):
+        return self.schedule_core(tasks) != None
+
+    # Start time of each (task id, instance position) of the tasks on one core, or None if
+    # neither placement fits every instance into its LET window
+    def schedule_core(self, tasks):
+        tasks = frozenset(tasks)
+        if tasks not in self.core_cache:
+            jobs = sorted(job for task_id in tasks for job in self.jobs[task_id])
+            start_times = self.schedule_edf(jobs)
+            if start_times is None:
+                start_times = self.schedule_insertion(jobs)
+            self.core_cache[tasks] = start_times
+
+        return self.core_cache[tasks]
+
+    # Non-preemptive EDF, the core never idles while an instance is ready
+    def schedule_edf(self, jobs):
+        start_times = {}
+        ready = []
+        current_time = 0
+        i = 0
+        while i < len(jobs) or len(ready) > 0:
+            if len(ready) == 0 and current_time < jobs[i][0]:
+                current_time = jobs[i][0]
+            while i < len(jobs) and jobs[i][0] <= current_time:
+                let_start, let_end, wcet, task_id, position = jobs[i]
+                heapq.heappush(ready, (let_end, let_start, wcet, task_id, position))
+                i += 1
+
+            let_end, let_start, wcet, task_id, position = heapq.heappop(ready)
+            if current_time + wcet > let_end:
+                return None
+
+            start_times[(task_id, position)] = current_time
+            current_time += wcet
+
+        return start_times
+
+    # Earliest deadline first, each instance into the earliest gap of its LET window. Short
+    # windows that open while a long instance could run are kept free.
+    def schedule_insertion(self, jobs):
+        start_times = {}
+        # Sorted, disjoint (start, end) of the placed instances
+        busy = []
+        for let_start, let_end, wcet, task_id, position in sorted(jobs, key=lambda x: x[1]):
+            current_time = let_start
+            i = bisect.bisect_right(busy, (let_start, float("inf")))
+            if i > 0 and busy[i - 1][1] > current_time:
+                current_time = busy[i - 1][1]
+            while i < len(busy) and busy[i][0] < current_time + wcet:
+                current_time = max(current_time, busy[i][1])
+                i += 1
+
+            if current_time + wcet > let_end:
+                return None
+
+            start_times[(task_id, position)] = current_time
+            if wcet > 0:
+                busy.insert(i, (current_time, current_time + wcet))
+
+        return start_times
+
+    def get_task_delay(self, assignment, task_id):
+        return sum(
+            self.get_assigned_delay(assignment, dependency)[0]
+            for dependency in self.task_dependencies[task_id]
+        )
+
+    def get_assigned_delay(self, assignment, dependency):
+        source, destination = dependency
+        return self.get_dependency_delay(
+            dependency, self.index.core_delays[assignment[source]][assignment[destination]]
+        )
+
+    # Each instance reads from the latest source instance whose data arrives after the
+    # latency, the negative instance included. Returns the total delay and the chosen
+    # instance pairs.
+    def get_dependency_delay(self, dependency, latency):
+        source, destination = dependency
+
+        key = (dependency, latency)
+        if key not in self.delay_cache:
+            end_times = self.index.let_end_times[source]
+            source_instances = self.index.instances[source]
+            source_name = self.index.tasks[source]["name"]
+            destination_name = self.index.tasks[destination]["name"]
+
+            total_delay = 0
+            pairs = {}
+            for instance in self.index.instances[destination]:
+                if instance["instance"] == -1:
+                    continue
+
+                # The LET end times of a task are in instance order
+                position = (
+                    bisect.bisect_right(end_times, instance["letStartTime"] - latency) - 1
+                )
+                if position < 0:
+                    total_delay = float("inf")
+                    break
+
+                delay = instance["letStartTime"] - end_times[position]
+                total_delay += delay
+                pairs[
+                    (
+                        source_name,
+                        source_instances[position]["instance"],
+                        destination_name,
+                        instance["instance"],
+                    )
+                ] = delay
+
+            self.delay_cache[key] = (total_delay, pairs)
+
+        return self.delay_cache[key]
+
+    def get_start_times(self, assignment):
+        start_times = {}
+        for tasks in self.get_core_tasks(assignment):
+            if len(tasks) > 0:
+                start_times.update(self.schedule_core(tasks))
+
+        return start_times
+
+    # start_times holds the start time of each (task id, instance position)
+    def create_schedule(self, assignment, start_times):
+        tasks_instances = []
+        for task_id, task in enumerate(self.tasks_instances):
+            core = self.cores[assignment[task_id]]
+            wcet = self.index.tasks[task_id]["wcet"]
+
+            instances = []
+            for position, instance in enumerate(task["value"]):
+                if instance["instance"] == -1:
+                    continue
+
+                start_time = start_times[(task_id, position)]
+                instance = dict(instance)
+                instance["executionTime"] = wcet
+                instance["currentCore"] = core
+                instance["executionIntervals"] = [
+                    {
+                        "core": core["name"],
+                        "endTime": start_time + wcet,
+                        "startTime": start_time,
+                    }
+                ]
+                instances.append(instance)
+
+            tasks_instances.append(dict(task, value=instances))
+
+        return tasks_instances
+
+    def create_summary(self, assignment):
+        summary = SolutionSummary(cores_used=len(set(assignment)), total_delay=0)
+        for dependency in self.dependencies:
+            delay, pairs = self.get_assigned_delay(assignment, dependency)
+            summary.total_delay += delay
+            summary.dependencies.update(pairs)
+
+        return summary
+
+
+# The heuristic schedules of one system and the time it took
+class HeuristicResult:
+    def __init__(self, system):
+        start_time = time.time()
+
+        scheduler = HeuristicScheduler(system)
+        self.min_core_tasks_instances, self.min_core_summary = scheduler.solve("c")
+        self.min_e2e_tasks_instances, self.min_e2e_summary = scheduler.solve("e2e")
+
+        self.runtime = time.time() - start_time
@@ -0,0 +1,164 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# The phases of an attempt that the results have a column for, in the order they run
+PHASES = [
+    "generate",
+    "screen",
+    "heuristic",
+    "estimate",
+    "build",
+    "export",
+    "solve",
+    "schedule",
+    "save_system",
+    "metrics",
+]
+
+
+class Phase:
+    def __init__(self, recorder, name):
+        self.recorder = recorder
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.recorder.add(self.name, self.start, time.perf_counter())
+        return False
+
+
+class NullPhase:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_PHASE = NullPhase()
+
+
+# The total time of each phase and the counters of one attempt. With trace, every
+# phase is kept as an event as well. A disabled recorder hands out the same empty
+# phase, so the timed code only pays for the call.
+class Recorder:
+    def __init__(self, enabled=True, trace=False):
+        self.enabled = enabled
+        self.trace = trace
+        self.times = {}
+        self.counters = {}
+        self.events = []
+        # The Benders subproblems are solved in threads
+        self.lock = threading.Lock()
+
+    def phase(self, name):
+        if not self.enabled:
+            return NULL_PHASE
+        return Phase(self, name)
+
+    def add(self, name, start, end):
+        with self.lock:
+            self.times[name] = self.times.get(name, 0) + end - start
+            if self.trace:
+                self.events.append(
+                    (name, start, end, os.getpid(), threading.get_ident())
+                )
+
+    def count(self, name, value=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def get_time(self, name):
+        return self.times.get(name, None)
+
+    # The lock cannot be pickled, the recorder is sent to and from the worker processes
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+
+# Phases are recorded into the recorder of the attempt that is running, so the
+# scheduler and the model builders do not need to be passed one. Outside of an
+# attempt nothing is recorded.
+current = Recorder(enabled=False)
+
+
+def phase(name):
+    return current.phase(name)
+
+
+def count(name, value=1):
+    current.count(name, value)
+
+
+@contextmanager
+def recording(recorder):
+    global current
+    previous = current
+    current = recorder
+    try:
+        yield recorder
+    finally:
+        current = previous
+
+
+# Writes the phases of every attempt as Chrome trace events, which chrome://tracing and
+# Perfetto open. The JSON array format may be left without its closing bracket, so the
+# file can be read while the campaign runs and is appended to when it is continued.
+class TraceWriter:
+    def __init__(self, file_path):
+        new_file = not os.path.exists(file_path) or os.path.getsize(file_path) == 0
+        self.outfile = open(file_path, "a")
+        if new_file:
+            self.outfile.write("[\n")
+
+    def write(self, recorder, name, args=None):
+        if len(recorder.events) == 0:
+            return
+
+        events = []
+        for phase_name, start, end, pid, tid in recorder.events:
+            events.append(self.create_event(phase_name, start, end, pid, tid))
+
+        # The whole attempt on a track of its own, with the counters
+        start = min(event[1] for event in recorder.events)
+        end = max(event[2] for event in recorder.events)
+        events.append(
+            self.create_event(
+                name, start, end, os.getpid(), 0, dict(recorder.counters, **(args or {}))
+            )
+        )
+
+        for event in events:
+            self.outfile.write(json.dumps(event) + ",\n")
+        self.outfile.flush()
+
+    @staticmethod
+    def create_event(name, start, end, pid, tid, args=None):
+        event = {
+            "name": name,
+            "ph": "X",
+            "ts": start * 1e6,
+            "dur": (end - start) * 1e6,
+            "pid": pid,
+            "tid": tid,
+        }
+        if args:
+            event["args"] = args
+        return event
+
+    def close(self):
+        self.outfile.close()
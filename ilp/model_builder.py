@@ -0,0 +1,522 @@
+import time
+import numpy as np
+import scipy.sparse as sp
+from pulp import (
+    LpAffineExpression,
+    LpConstraint,
+    LpConstraintEQ,
+    LpConstraintGE,
+    LpConstraintLE,
+    LpElement,
+    LpMinimize,
+    LpProblem,
+    LpVariable,
+    constants,
+)
+
+from ilp.instrumentation import count, phase
+from ilp.solvers import (
+    INF_OR_UNBD,
+    INFEASIBLE,
+    INTERRUPTED,
+    ITERATION_LIMIT,
+    NODE_LIMIT,
+    NUMERIC,
+    OPTIMAL,
+    SOLUTION_LIMIT,
+    TIME_LIMIT,
+    UNBOUNDED,
+    check_solver,
+    create_pulp_solver,
+    get_gurobi_stats,
+    get_highs_stats,
+    get_pulp_stats,
+    import_solver_module,
+)
+
+# The matrix is kept with Gurobi's codes for the row senses and column types, whichever
+# solver it is passed to, so that gurobipy is only needed to solve with Gurobi
+LESS_EQUAL = "<"
+GREATER_EQUAL = ">"
+EQUAL = "="
+INTEGER = "I"
+CONTINUOUS = "C"
+INFINITY = 1e100
+# The start value of a column without one
+UNDEFINED = 1e101
+MINIMIZE = 1
+
+
+# The builders are persistent: after a solve the objective can be switched, groups of
+# constraints can be disabled or enabled again, and variables can be fixed through
+# their bounds, without rebuilding the model.
+class PulpModelBuilder:
+    senses = {"<=": LpConstraintLE, ">=": LpConstraintGE, "==": LpConstraintEQ}
+
+    def __init__(self, name, solver="gurobi", threads=None):
+        check_solver(solver)
+
+        self.name = name
+        self.solver = solver
+        self.threads = threads
+        self.prob = None
+
+        self.constraints = []
+        self.groups = []
+        self.disabled_groups = set()
+        self.original_bounds = {}
+        self.initial_values = {}
+
+        self.objective = None
+        self.objective_name = None
+
+    def add_variables(self, name, keys, lowBound=None, upBound=None, cat="Continuous"):
+        return LpVariable.dicts(name, keys, lowBound=lowBound, upBound=upBound, cat=cat)
+
+    def add_variable(self, name, lowBound=None, upBound=None, cat="Continuous"):
+        return LpVariable(name, lowBound=lowBound, upBound=upBound, cat=cat)
+
+    # terms is a list of (variable, coefficient), each variable at most once
+    def add_constraint(self, terms, sense, rhs, group=None):
+        self.constraints.append(
+            LpConstraint(LpAffineExpression(terms), sense=self.senses[sense], rhs=rhs)
+        )
+        self.groups.append(group)
+
+    def set_objective(self, terms, name):
+        self.objective = LpAffineExpression(terms)
+        self.objective_name = name
+
+    def set_group_enabled(self, group, enabled):
+        if enabled:
+            self.disabled_groups.discard(group)
+        else:
+            self.disabled_groups.add(group)
+
+    def fix_variable(self, variable, value):
+        if variable not in self.original_bounds:
+            self.original_bounds[variable] = (variable.lowBound, variable.upBound)
+
+        variable.bounds(value, value)
+
+    def reset_bounds(self):
+        for variable, (lowBound, upBound) in self.original_bounds.items():
+            variable.bounds(lowBound, upBound)
+
+        self.original_bounds = {}
+
+    # MIP start, kept until it is cleared
+    def set_initial_value(self, variable, value):
+        self.initial_values[variable] = value
+
+    def clear_initial_values(self):
+        self.initial_values = {}
+
+    def solve(self, time_limit):
+        # The expressions are reused, only the problem holding them is recreated so
+        # that disabled constraints and their variables are not exported
+        with phase("export"):
+            self.prob = LpProblem(self.name, LpMinimize)
+            for constraint, group in zip(self.constraints, self.groups):
+                if group not in self.disabled_groups:
+                    self.prob += constraint
+            self.prob += self.objective, self.objective_name
+
+            # Values of an earlier solve must not be mistaken for a solution
+            for variable in self.prob.variables():
+                variable.varValue = None
+            for variable, value in self.initial_values.items():
+                variable.setInitialValue(value)
+
+        count("solves")
+        self.prob.solve(
+            create_pulp_solver(
+                self.solver,
+                time_limit,
+                warm_start=len(self.initial_values) > 0,
+                threads=self.threads,
+            )
+        )
+
+        return ModelResult(
+            self.prob.variables(),
+            self.prob.objective.value(),
+            self.prob.status,
+            self.prob.sol_status,
+            self.prob.solutionCpuTime,
+            get_pulp_stats(self.solver, self.prob),
+        )
+
+
+class MatrixModelBuilder:
+    senses = {"<=": LESS_EQUAL, ">=": GREATER_EQUAL, "==": EQUAL}
+    # PuLP passes binaries to Gurobi as integers bounded by 0 and 1, do the same so
+    # that the model statistics stay comparable
+    var_types = {"Binary": INTEGER, "Integer": INTEGER, "Continuous": CONTINUOUS}
+
+    gurobi_status = {
+        OPTIMAL: constants.LpStatusOptimal,
+        INFEASIBLE: constants.LpStatusInfeasible,
+        INF_OR_UNBD: constants.LpStatusInfeasible,
+        UNBOUNDED: constants.LpStatusUnbounded,
+        ITERATION_LIMIT: constants.LpStatusNotSolved,
+        NODE_LIMIT: constants.LpStatusNotSolved,
+        TIME_LIMIT: constants.LpStatusNotSolved,
+        SOLUTION_LIMIT: constants.LpStatusNotSolved,
+        INTERRUPTED: constants.LpStatusNotSolved,
+        NUMERIC: constants.LpStatusNotSolved,
+    }
+
+    # Gurobi keeps its model between solves, HiGHS is passed the enabled rows each time
+    matrix_solvers = ["gurobi", "highs"]
+
+    def __init__(self, name, solver="gurobi", threads=None):
+        if solver not in self.matrix_solvers:
+            raise ValueError(f"The matrix builder does not support the solver: {solver}")
+        check_solver(solver)
+
+        self.name = name
+        self.solver = solver
+        self.threads = threads
+
+        # Columns
+        self.variables = []
+        self.lower_bounds = []
+        self.upper_bounds = []
+        self.types = []
+
+        # Rows, the matrix is kept in COO form until it is solved
+        self.row_indices = []
+        self.col_indices = []
+        self.values = []
+        self.row_senses = []
+        self.rhs = []
+        self.row_groups = []
+        self.disabled_groups = set()
+        self.original_bounds = {}
+        self.initial_values = {}
+
+        self.objective = []
+        self.objective_name = None
+
+        # Kept between solves
+        self.model = None
+        self.x = None
+        self.columns = None
+        self.group_constrs = None
+        self.group_rows = None
+
+    def add_variables(self, name, keys, lowBound=None, upBound=None, cat="Continuous"):
+        return {
+            key: self.add_variable(f"{name}_{key}", lowBound, upBound, cat)
+            for key in keys
+        }
+
+    def add_variable(self, name, lowBound=None, upBound=None, cat="Continuous"):
+        if cat == "Binary":
+            lowBound = 0
+            upBound = 1
+
+        variable = MatrixVariable(
+            name.translate(LpElement.trans), len(self.variables)
+        )
+
+        self.variables.append(variable)
+        self.lower_bounds.append(-INFINITY if lowBound is None else lowBound)
+        self.upper_bounds.append(INFINITY if upBound is None else upBound)
+        self.types.append(self.var_types[cat])
+
+        return variable
+
+    def add_constraint(self, terms, sense, rhs, group=None):
+        row = len(self.rhs)
+        for variable, coefficient in terms:
+            self.row_indices.append(row)
+            self.col_indices.append(variable.index)
+            self.values.append(coefficient)
+
+        self.row_senses.append(self.senses[sense])
+        self.rhs.append(rhs)
+        self.row_groups.append(group)
+
+        # Rows added after the model was passed to the solver need a rebuild
+        self.model = None
+
+    def set_objective(self, terms, name):
+        self.objective = terms
+        self.objective_name = name
+
+    def set_group_enabled(self, group, enabled):
+        if enabled:
+            self.disabled_groups.discard(group)
+        else:
+            self.disabled_groups.add(group)
+
+    def fix_variable(self, variable, value):
+        if variable.index not in self.original_bounds:
+            self.original_bounds[variable.index] = (
+                self.lower_bounds[variable.index],
+                self.upper_bounds[variable.index],
+            )
+
+        self.lower_bounds[variable.index] = value
+        self.upper_bounds[variable.index] = value
+
+    def reset_bounds(self):
+        for index, (lowBound, upBound) in self.original_bounds.items():
+            self.lower_bounds[index] = lowBound
+            self.upper_bounds[index] = upBound
+
+        self.original_bounds = {}
+
+    def set_initial_value(self, variable, value):
+        self.initial_values[variable.index] = value
+
+    def clear_initial_values(self):
+        self.initial_values = {}
+
+    def build_solver_model(self):
+        # Like PuLP, only pass the variables that appear in a constraint or the objective
+        objective_indices = [variable.index for variable, _ in self.objective]
+        used = np.zeros(len(self.variables), dtype=bool)
+        used[self.col_indices] = True
+        used[objective_indices] = True
+
+        self.columns = np.flatnonzero(used)
+        column_map = np.full(len(self.variables), -1)
+        column_map[self.columns] = np.arange(len(self.columns))
+
+        matrix = sp.csr_matrix(
+            (self.values, (np.array(self.row_indices), column_map[self.col_indices])),
+            shape=(len(self.rhs), len(self.columns)),
+        )
+        row_senses = np.array(self.row_senses)
+        rhs = np.array(self.rhs, dtype=float)
+
+        self.model = import_solver_module("gurobi").Model(self.name)
+        self.x = self.model.addMVar(
+            len(self.columns), vtype=np.array(self.types)[self.columns]
+        )
+
+        # Every group is added as its own block of rows, so that it can be removed
+        row_groups = np.array(self.row_groups, dtype=object)
+        self.group_rows = {}
+        self.group_constrs = {}
+        for group in set(self.row_groups):
+            rows = np.flatnonzero(row_groups == group)
+            self.group_rows[group] = (matrix[rows], row_senses[rows], rhs[rows])
+            self.group_constrs[group] = None
+
+    def solve(self, time_limit):
+        if self.solver == "highs":
+            return self.solve_highs(time_limit)
+
+        return self.solve_gurobi(time_limit)
+
+    def solve_gurobi(self, time_limit):
+        solutionCpuTime = -time.process_time()
+
+        with phase("export"):
+            objective_indices = [variable.index for variable, _ in self.objective]
+            if self.model is None or not np.isin(objective_indices, self.columns).all():
+                count("rebuilds")
+                self.build_solver_model()
+
+            for group, constrs in self.group_constrs.items():
+                enabled = group not in self.disabled_groups
+                if enabled and constrs is None:
+                    matrix, row_senses, rhs = self.group_rows[group]
+                    self.group_constrs[group] = self.model.addMConstr(
+                        matrix, self.x, row_senses, rhs
+                    )
+                elif not enabled and constrs is not None:
+                    self.model.remove(constrs)
+                    self.group_constrs[group] = None
+
+            self.x.lb = np.array(self.lower_bounds, dtype=float)[self.columns]
+            self.x.ub = np.array(self.upper_bounds, dtype=float)[self.columns]
+
+            column_map = {index: i for i, index in enumerate(self.columns)}
+            cost = np.zeros(len(self.columns))
+            for variable, coefficient in self.objective:
+                cost[column_map[variable.index]] += coefficient
+
+            start = np.full(len(self.columns), UNDEFINED)
+            for index, value in self.initial_values.items():
+                if index in column_map:
+                    start[column_map[index]] = value
+            self.x.Start = start
+
+            self.model.Params.TimeLimit = time_limit
+            if self.threads is not None:
+                self.model.Params.Threads = self.threads
+            self.model.setObjective(cost @ self.x, MINIMIZE)
+
+        count("solves")
+        with phase("solve"):
+            self.model.optimize()
+
+        for variable in self.variables:
+            variable.varValue = None
+
+        objective = None
+        if self.model.SolCount >= 1:
+            for index, value in zip(self.columns, self.x.X):
+                self.variables[index].varValue = value
+            objective = self.model.ObjVal
+
+        solutionCpuTime += time.process_time()
+
+        status = self.gurobi_status.get(self.model.Status, constants.LpStatusUndefined)
+
+        return ModelResult(
+            [self.variables[index] for index in self.columns],
+            objective,
+            status,
+            constants.LpStatusToSolution[status],
+            solutionCpuTime,
+            get_gurobi_stats(self.model),
+        )
+
+    def solve_highs(self, time_limit):
+        highspy = import_solver_module("highs")
+        solutionCpuTime = -time.process_time()
+
+        with phase("export"):
+            # Only the enabled rows and the variables they use are passed
+            rows = np.flatnonzero(
+                [group not in self.disabled_groups for group in self.row_groups]
+            )
+            matrix = sp.csr_matrix(
+                (self.values, (self.row_indices, self.col_indices)),
+                shape=(len(self.rhs), len(self.variables)),
+            )[rows]
+
+            used = np.zeros(len(self.variables), dtype=bool)
+            used[matrix.indices] = True
+            used[[variable.index for variable, _ in self.objective]] = True
+            columns = np.flatnonzero(used)
+            matrix = matrix[:, columns].tocsr()
+
+            row_senses = np.array(self.row_senses)[rows]
+            rhs = np.array(self.rhs, dtype=float)[rows]
+
+            lp = highspy.HighsLp()
+            lp.num_col_ = len(columns)
+            lp.num_row_ = len(rows)
+            lp.col_lower_ = np.array(self.lower_bounds, dtype=float)[columns]
+            lp.col_upper_ = np.array(self.upper_bounds, dtype=float)[columns]
+            lp.row_lower_ = np.where(
+                row_senses == LESS_EQUAL, -highspy.kHighsInf, rhs
+            )
+            lp.row_upper_ = np.where(
+                row_senses == GREATER_EQUAL, highspy.kHighsInf, rhs
+            )
+            lp.a_matrix_.format_ = highspy.MatrixFormat.kRowwise
+            lp.a_matrix_.start_ = matrix.indptr
+            lp.a_matrix_.index_ = matrix.indices
+            lp.a_matrix_.value_ = matrix.data
+
+            column_map = {index: i for i, index in enumerate(columns)}
+            cost = np.zeros(len(columns))
+            for variable, coefficient in self.objective:
+                cost[column_map[variable.index]] += coefficient
+            lp.col_cost_ = cost
+
+            types = np.array(self.types)[columns]
+            lp.integrality_ = [
+                highspy.HighsVarType.kInteger
+                if column_type == INTEGER
+                else highspy.HighsVarType.kContinuous
+                for column_type in types
+            ]
+
+            highs = highspy.Highs()
+            highs.passModel(lp)
+            highs.setOptionValue("time_limit", float(time_limit))
+            if self.threads is not None:
+                highs.setOptionValue("threads", self.threads)
+
+            start = [
+                (column_map[index], value)
+                for index, value in self.initial_values.items()
+                if index in column_map
+            ]
+            if len(start) > 0:
+                indices, values = zip(*start)
+                highs.setSolution(
+                    len(start),
+                    np.array(indices, dtype=np.int32),
+                    np.array(values, dtype=float),
+                )
+
+        count("solves")
+        with phase("solve"):
+            highs.run()
+
+        stats = get_highs_stats(highs, int(np.sum(types == INTEGER)))
+
+        for variable in self.variables:
+            variable.varValue = None
+
+        if stats.objective is not None:
+            for index, value in zip(columns, highs.getSolution().col_value):
+                self.variables[index].varValue = value
+
+        solutionCpuTime += time.process_time()
+
+        # The statistics use the Gurobi status codes
+        status = self.gurobi_status.get(stats.status, constants.LpStatusUndefined)
+
+        return ModelResult(
+            [self.variables[index] for index in columns],
+            stats.objective,
+            status,
+            constants.LpStatusToSolution[status],
+            solutionCpuTime,
+            stats,
+        )
+
+
+class MatrixVariable:
+    def __init__(self, name, index):
+        self.name = name
+        self.index = index
+        self.varValue = None
+
+
+class SolvedVariable:
+    def __init__(self, name, varValue):
+        self.name = name
+        self.varValue = varValue
+
+
+class SolvedObjective:
+    def __init__(self, value):
+        self._value = value
+
+    def value(self):
+        return self._value
+
+
+# Snapshot of a solve with the parts of LpProblem that update_schedule and Utilities
+# read, and the SolveStats of the backend. The variables of a persistent model are
+# overwritten by the next solve.
+class ModelResult:
+    def __init__(self, variables, objective, status, sol_status, solutionCpuTime, stats):
+        self._variables = [
+            SolvedVariable(variable.name, variable.varValue) for variable in variables
+        ]
+        self.objective = SolvedObjective(objective)
+        self.status = status
+        self.sol_status = sol_status
+        self.solutionCpuTime = solutionCpuTime
+        self.stats = stats
+        # Filled in by the scheduler
+        self.summary = None
+
+    def variables(self):
+        return self._variables
+
+    def variablesDict(self):
+        return {variable.name: variable for variable in self._variables}
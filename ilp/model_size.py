@@ -0,0 +1,312 @@
+import math
+
+import numpy as np
+from pulp import constants
+
+from ilp.model_builder import ModelResult
+from ilp.multicore import MultiCoreScheduler
+from ilp.periodic import PeriodicHorizon
+from ilp.solution_summary import SolutionSummary
+from ilp.solvers import OVER_BUDGET, SolveStats
+from ilp.system_index import SystemIndex
+
+# Families that only the E2E objective uses, the "e2e" constraint group of build_model
+E2E_VARIABLES = ["lambda", "bool_dep", "delay", "total_delay", "psi_task_device"]
+E2E_CONSTRAINTS = ["6a", "6b", "6c", "total_delay"]
+
+
+# The number of variables and constraints of each family that
+# MultiCoreScheduler.build_model creates for a system, counted from the task instances
+# without building the model. Takes the same options as build_model.
+class ModelSizeEstimate:
+    def __init__(
+        self,
+        system,
+        sparse_dependencies=False,
+        prune_overlaps=False,
+        formulation="full",
+        periodic=False,
+        **model_options,
+    ):
+        tasks = system["EntityStore"]
+        N = MultiCoreScheduler.calculate_largeN(tasks)
+
+        scheduler = MultiCoreScheduler()
+        scheduler.cores = system["CoreStore"]
+        scheduler.index = SystemIndex(system, N)
+
+        self.tasks_instances = scheduler.create_task_instances(
+            MultiCoreScheduler.calculate_makespan(tasks), tasks, N
+        )
+
+        tasks_instances = self.tasks_instances
+        if periodic:
+            horizon = PeriodicHorizon(
+                tasks,
+                self.tasks_instances,
+                MultiCoreScheduler.calculate_hyperperiod(tasks),
+                scheduler.get_periodic_start(tasks, N),
+            )
+            tasks_instances = horizon.model_instances
+
+            # The sweep over the wrapped instances without the pairs of two copies
+            wrapped = horizon.get_wrapped_instances()
+            copies = [
+                dict(
+                    task,
+                    value=[x for x in task["value"] if x["letStartTime"] >= horizon.end],
+                )
+                for task in wrapped
+            ]
+            num_task_pairs = self.count_overlapping_pairs(
+                wrapped
+            ) - self.count_overlapping_pairs(copies)
+        elif prune_overlaps:
+            num_task_pairs = self.count_overlapping_pairs(tasks_instances)
+        else:
+            num_real = [self.count_real_instances(task) for task in tasks_instances]
+            num_task_pairs = sum(num_real) ** 2 - sum(x**2 for x in num_real)
+
+        num_tasks = len(tasks_instances)
+        num_cores = len(scheduler.cores)
+        num_devices = len(scheduler.get_core_devices())
+        task_pairs = num_tasks * (num_tasks - 1)
+
+        num_instances = {task["name"]: len(task["value"]) for task in tasks_instances}
+        num_real = {
+            task["name"]: self.count_real_instances(task) for task in tasks_instances
+        }
+        dependencies = [
+            (depends_on, task["name"])
+            for task in tasks_instances
+            for depends_on in scheduler.index.get_task(task["name"])["dependsOn"]
+        ]
+
+        if sparse_dependencies:
+            num_dependency_pairs = sum(
+                num_instances[source] * num_real[destination]
+                for source, destination in dependencies
+            )
+            num_delay_pairs = num_dependency_pairs
+        else:
+            total_instances = sum(num_instances.values())
+            total_real = sum(num_real.values())
+            num_dependency_pairs = total_instances**2 - sum(
+                x**2 for x in num_instances.values()
+            )
+            num_delay_pairs = total_instances * total_real - sum(
+                num_instances[name] * num_real[name] for name in num_instances
+            )
+
+        num_required = sum(
+            (task["requiredCore"] != None) + (task["requiredDevice"] != None)
+            for task in scheduler.index.tasks
+        )
+
+        self.variables = {
+            "assigned": num_tasks * num_cores,
+            "start": sum(num_instances.values()),
+            "end": sum(num_instances.values()),
+            "psi_tasks": task_pairs,
+            "bool_task": num_task_pairs,
+            "u": num_cores,
+            "cores_used": 1,
+            "lambda": task_pairs,
+            "bool_dep": num_dependency_pairs,
+            "delay": num_dependency_pairs,
+            "total_delay": 1,
+        }
+        self.constraints = {
+            "1": num_tasks,
+            "required": num_required,
+            "2b-2d": 3 * sum(num_real.values()),
+            "3b": task_pairs,
+            "3c-3d": 2 * num_task_pairs,
+            "5": num_cores * (1 + num_tasks),
+            "6b": sum(
+                num_real[destination] * (num_instances[source] + 1)
+                for source, destination in dependencies
+            ),
+            "6c": 2 * num_delay_pairs,
+            "total_delay": 1,
+            "cores_used": 1,
+        }
+
+        if formulation == "full":
+            self.variables["psi_task_core"] = num_cores * num_cores * task_pairs
+            self.constraints["3a"] = 3 * num_cores * num_cores * task_pairs
+            self.constraints["6a"] = task_pairs
+        else:
+            device_pairs = num_devices * (num_devices - 1)
+            self.variables["psi_same_core"] = num_cores * task_pairs
+            self.variables["psi_task_device"] = len(dependencies) * device_pairs
+            self.constraints["3a"] = 3 * num_cores * task_pairs
+            self.constraints["6a"] = len(dependencies) * (3 * device_pairs + 1)
+
+    @staticmethod
+    def count_real_instances(task):
+        return sum(1 for instance in task["value"] if instance["instance"] != -1)
+
+    # The number of pairs MultiCoreScheduler.get_overlapping_instance_pairs returns. An
+    # instance is paired with every earlier one in LET start order whose window is still
+    # open, in both directions, unless they are of the same task.
+    @staticmethod
+    def count_overlapping_pairs(tasks_instances):
+        def count_open(starts, ends):
+            # Stable like the sweep, ties keep the order of the tasks
+            order = np.argsort(starts, kind="stable")
+            starts = starts[order]
+            ends = ends[order]
+
+            # Earlier instances minus the ones that have ended. Only windows of length 0
+            # can end at a start without coming before it in the order.
+            closed = np.searchsorted(np.sort(ends), starts, side="right")
+            empty = np.concatenate([[0], np.cumsum(ends == starts)])
+            not_earlier = (
+                empty[np.searchsorted(starts, starts, side="right")]
+                - empty[np.arange(len(starts))]
+            )
+
+            return int(np.sum(np.arange(len(starts)) - closed + not_earlier))
+
+        windows = [
+            [
+                (instance["letStartTime"], instance["letEndTime"])
+                for instance in task["value"]
+                if instance["instance"] != -1
+            ]
+            for task in tasks_instances
+        ]
+
+        all_windows = np.array(
+            [window for task_windows in windows for window in task_windows],
+            dtype=np.int64,
+        ).reshape(-1, 2)
+        num_pairs = count_open(all_windows[:, 0], all_windows[:, 1])
+        for task_windows in windows:
+            task_windows = np.array(task_windows, dtype=np.int64).reshape(-1, 2)
+            num_pairs -= count_open(task_windows[:, 0], task_windows[:, 1])
+
+        return 2 * num_pairs
+
+    def get_num_variables(self, method=None):
+        return sum(
+            count
+            for name, count in self.variables.items()
+            if method != "c" or name not in E2E_VARIABLES
+        )
+
+    def get_num_constraints(self, method=None):
+        return sum(
+            count
+            for name, count in self.constraints.items()
+            if method != "c" or name not in E2E_CONSTRAINTS
+        )
+
+    # The task instances without a schedule, in the shape of update_schedule
+    def get_unscheduled_instances(self):
+        return [
+            dict(task, value=[x for x in task["value"] if x["instance"] != -1])
+            for task in self.tasks_instances
+        ]
+
+
+# Least squares fit of the log solve time on the log number of variables and
+# constraints, per objective, from the rows of earlier results
+class SolveTimeModel:
+    columns = {
+        "e2e": ("e2e_num_vars", "e2e_num_constrs", "e2e_runtime", "e2e_status"),
+        "c": ("mc_num__vars", "mc_num_consts", "mc_runtime", "mc_status"),
+    }
+
+    def __init__(self, coefficients):
+        self.coefficients = coefficients
+
+    @classmethod
+    def from_rows(cls, rows, min_rows=5):
+        samples = {method: [] for method in cls.columns}
+        for row in rows:
+            for method, names in cls.columns.items():
+                values = [cls.parse(row.get(name, None)) for name in names]
+                if None in values or values[3] >= OVER_BUDGET or values[2] <= 0:
+                    continue
+                samples[method].append(values[:3])
+
+        coefficients = {}
+        for method, values in samples.items():
+            if len(values) < min_rows:
+                continue
+
+            values = np.array(values)
+            features = np.column_stack(
+                [np.ones(len(values)), np.log1p(values[:, 0]), np.log1p(values[:, 1])]
+            )
+            coefficients[method] = np.linalg.lstsq(
+                features, np.log(values[:, 2]), rcond=None
+            )[0]
+
+        return cls(coefficients)
+
+    @staticmethod
+    def parse(value):
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return None
+
+        return None if math.isnan(value) else value
+
+    # Predicted seconds of a solve, None without enough results to fit it on
+    def predict(self, estimate, method):
+        if method not in self.coefficients:
+            return None
+
+        features = np.array(
+            [
+                1,
+                np.log1p(estimate.get_num_variables(method)),
+                np.log1p(estimate.get_num_constraints(method)),
+            ]
+        )
+        return float(np.exp(features @ self.coefficients[method]))
+
+
+# Limits on the size of a model and on its predicted solve time, None for no limit
+class ModelBudget:
+    def __init__(self, max_constraints=None, max_solve_time=None, solve_time_model=None):
+        self.max_constraints = max_constraints
+        self.max_solve_time = max_solve_time
+        self.solve_time_model = solve_time_model
+
+    # Returns the reason the model is over the budget, or None
+    def check(self, estimate):
+        num_constraints = estimate.get_num_constraints()
+        if self.max_constraints != None and num_constraints > self.max_constraints:
+            return f"{num_constraints} constraints, more than {self.max_constraints}"
+
+        if self.max_solve_time != None and self.solve_time_model != None:
+            solve_times = [
+                self.solve_time_model.predict(estimate, method) for method in ("e2e", "c")
+            ]
+            if None not in solve_times and sum(solve_times) > self.max_solve_time:
+                return (
+                    f"predicted solve time of {sum(solve_times):.1f}s, more than "
+                    f"{self.max_solve_time}s"
+                )
+
+        return None
+
+
+# Stands in for the result of a solve whose model was over the budget
+def create_over_budget_result(solver, runtime):
+    result = ModelResult(
+        [],
+        None,
+        constants.LpStatusNotSolved,
+        constants.LpSolutionNoSolutionFound,
+        runtime,
+        SolveStats(solver, OVER_BUDGET, runtime=runtime),
+    )
+    result.summary = SolutionSummary()
+
+    return result
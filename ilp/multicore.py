@@ -1,6 +1,9 @@
 import math
-from pulp import GUROBI, LpProblem, LpMinimize, LpVariable, lpSum
-from gurobipy import GRB
+from ilp.instrumentation import phase
+from ilp.model_builder import MatrixModelBuilder, PulpModelBuilder
+from ilp.periodic import PeriodicHorizon
+from ilp.system_index import SystemIndex
+from ilp.solution_summary import SolutionSummary
 
 
 class MultiCoreScheduler:
@@ -8,34 +11,135 @@ class MultiCoreScheduler:
         self.devices = None
         self.cores = None
         self.network_delays = None
+        self.index = None
 
         self.task_data = None
         self.tasks_instances = None
+        self.periodic_horizon = None
 
+        self.model = None
         self.assigned_vars = None
         self.exec_start_vars = None
         self.exec_end_vars = None
+        self.cores_used_var = None
+        self.total_delay_var = None
+
+    def multicore_core_scheduler(
+        self,
+        system,
+        method,
+        fixed_timings=False,
+        sparse_dependencies=False,
+        prune_overlaps=False,
+        formulation="full",
+        big_m="global",
+        builder="pulp",
+        solver="gurobi",
+        threads=None,
+        initial_schedule=None,
+        periodic=False,
+        benders_workers=1,
+    ):
+        # The decomposition builds its own master and core problems
+        if method in ("benders-e2e", "benders-c"):
+            from ilp.benders import BendersScheduler
+
+            scheduler = BendersScheduler(
+                system, solver, builder, threads, workers=benders_workers
+            )
+            return scheduler.solve(method[len("benders-"):])
+
+        with phase("build"):
+            self.build_model(
+                system,
+                method == "e2e",
+                sparse_dependencies=sparse_dependencies,
+                prune_overlaps=prune_overlaps,
+                formulation=formulation,
+                big_m=big_m,
+                builder=builder,
+                solver=solver,
+                threads=threads,
+                periodic=periodic,
+            )
+
+        # If timings have been pre-determined, fix them here
+        if fixed_timings and "EntityInstancesStore" in system:
+            self.fix_schedule(system["EntityInstancesStore"], fix_cores=False)
+
+        # Start from an earlier or heuristic schedule
+        if initial_schedule is not None:
+            self.set_initial_schedule(initial_schedule)
+
+        return self.solve_model(method)
+
+    # Builds the model once. The E2E block is kept in the "e2e" constraint group so that
+    # the same model can be solved for both objectives by solve_model.
+    def build_model(
+        self,
+        system,
+        e2e=True,
+        sparse_dependencies=False,
+        prune_overlaps=False,
+        formulation="full",
+        big_m="global",
+        builder="pulp",
+        solver="gurobi",
+        threads=None,
+        periodic=False,
+    ):
+        if formulation not in ("full", "compact"):
+            raise ValueError(f"Unknown formulation: {formulation}")
+        if big_m not in ("global", "tight"):
+            raise ValueError(f"Unknown big-M strategy: {big_m}")
+
+        model = self.create_model_builder(
+            builder, "Multicore_Core_Scheduling", solver, threads
+        )
+        self.model = model
 
-    def multicore_core_scheduler(self, system, method, fixed_timings=False):
-        prob = LpProblem("Multicore_Core_Scheduling", LpMinimize)
+        # Variable families that only some formulations have
+        self.psi_task_core_vars = None
+        self.psi_same_core_vars = None
+        self.psi_task_device_vars = None
+        self.bool_dep_vars = None
+        self.delay_vars = None
 
         self.devices = system["DeviceStore"]
         self.cores = system["CoreStore"]
         self.network_delays = system["NetworkDelayStore"]
 
         tasks = system["EntityStore"]
-        dependencies = system["DependencyStore"]
-        self.task_data = self.format_tasks(tasks, dependencies)
 
         makespan = self.calculate_makespan(tasks)
 
         N = self.calculate_largeN(tasks)
 
+        # Integer-indexed tasks, cores and devices, and the precomputed delays
+        self.index = SystemIndex(system, N)
+        self.task_data = self.index.tasks
+
         self.tasks_instances = self.create_task_instances(makespan, tasks, N)
 
+        # Only the transient prefix and one hyperperiod are modelled, the later
+        # hyperperiods repeat it
+        self.periodic_horizon = None
+        if periodic:
+            hyperperiod = self.calculate_hyperperiod(tasks)
+            start = self.get_periodic_start(tasks, N)
+            if start + hyperperiod > makespan:
+                raise ValueError("The transient prefix does not fit into the makespan")
+
+            self.periodic_horizon = PeriodicHorizon(
+                tasks, self.tasks_instances, hyperperiod, start
+            )
+            self.tasks_instances = self.periodic_horizon.model_instances
+
+        self.index.set_instances(self.tasks_instances)
+
         # Variables
         # Variable for task instances, and their core assignment
-        self.assigned_vars = LpVariable.dicts(
+        self.assigned_vars = model.add_variables(
             "assigned",
             (
                 (task["name"], core["name"])
@@ -48,7 +152,7 @@ class MultiCoreScheduler:
         )
 
         # Variable for execution start time for each instance. (s_(i,j))
-        self.exec_start_vars = LpVariable.dicts(
+        self.exec_start_vars = model.add_variables(
             "start",
             (
                 (task["name"], instance["instance"])
@@ -60,7 +164,7 @@ class MultiCoreScheduler:
         )
 
         # Variable for execution end time for each instance. (e_(i,j))
-        self.exec_end_vars = LpVariable.dicts(
+        self.exec_end_vars = model.add_variables(
             "end",
             (
                 (task["name"], instance["instance"])
@@ -71,25 +175,43 @@ class MultiCoreScheduler:
             cat="Integer",
         )
 
-        # ψ_(x,k,y,l)^core
-        psi_task_core_vars = LpVariable.dicts(
-            "psi_task_core",
-            [
-                (task1["name"], core1["name"], task2["name"], core2["name"])
-                for core1 in self.cores
-                for core2 in self.cores
-                for task1 in self.tasks_instances
-                for task2 in self.tasks_instances
-                if task1 != task2
-            ],
-            lowBound=0,
-            upBound=1,
-            cat="Binary",
-        )
+        if formulation == "full":
+            # ψ_(x,k,y,l)^core
+            psi_task_core_vars = self.psi_task_core_vars = model.add_variables(
+                "psi_task_core",
+                [
+                    (task1["name"], core1["name"], task2["name"], core2["name"])
+                    for core1 in self.cores
+                    for core2 in self.cores
+                    for task1 in self.tasks_instances
+                    for task2 in self.tasks_instances
+                    if task1 != task2
+                ],
+                lowBound=0,
+                upBound=1,
+                cat="Binary",
+            )
+        else:
+            devices = self.get_core_devices()
+
+            # ψ_(x,y,k)^same, x and y are both on core k
+            psi_same_core_vars = self.psi_same_core_vars = model.add_variables(
+                "psi_same_core",
+                [
+                    (task1["name"], task2["name"], core["name"])
+                    for core in self.cores
+                    for task1 in self.tasks_instances
+                    for task2 in self.tasks_instances
+                    if task1 != task2
+                ],
+                lowBound=0,
+                upBound=1,
+                cat="Binary",
+            )
 
         # ψ_(x,y)^core
         # The matrices are symmetrical, which is why only the half of it is being considered for optimisation purposes.
-        psi_tasks_vars = LpVariable.dicts(
+        psi_tasks_vars = self.psi_tasks_vars = model.add_variables(
             "psi_tasks",
             [
                 (task1["name"], task2["name"])
@@ -102,16 +224,14 @@ class MultiCoreScheduler:
             cat="Binary",
         )
 
+        instance_pairs = self.get_instance_pairs(prune_overlaps)
+
         # b_(x,i,y,j)^task
-        bool_task_vars = LpVariable.dicts(
+        bool_task_vars = self.bool_task_vars = model.add_variables(
             "bool_task",
             [
-                (task1["name"], value1["instance"], task2["name"], value2["instance"])
-                for task1 in self.tasks_instances
-                for task2 in self.tasks_instances
-                if task1 != task2
-                for value1 in task1["value"]
-                for value2 in task2["value"]
+                (task1_name, instance1["instance"], task2_name, instance2["instance"])
+                for task1_name, instance1, task2_name, instance2 in instance_pairs
             ],
             lowBound=0,
             upBound=1,
@@ -119,13 +239,15 @@ class MultiCoreScheduler:
         )
 
         # Variable to track if a core is being used (u_j)
-        core_used_vars = LpVariable.dicts(
+        core_used_vars = self.core_used_vars = model.add_variables(
             "u", ((core["name"]) for core in self.cores), lowBound=0, upBound=1, cat="Binary"
         )
-        cores_used_var = LpVariable("cores_used", cat="Integer")
+        cores_used_var = model.add_variable("cores_used", cat="Integer")
+        self.cores_used_var = cores_used_var
+        self.total_delay_var = None
 
         # lambda_(x,y)
-        lambda_vars = LpVariable.dicts(
+        lambda_vars = self.lambda_vars = model.add_variables(
             "lambda",
             [
                 (task1["name"], task2["name"])
@@ -137,57 +259,63 @@ class MultiCoreScheduler:
             cat="Integer",
         )
 
-        if method == "e2e":
+        if e2e:
+            dependency_pairs = self.get_dependency_instance_pairs(sparse_dependencies)
+            dep_instances_pairs = [
+                (task1_name, instance1["instance"], task2_name, instance2["instance"])
+                for task1_name, instance1, task2_name, instance2 in dependency_pairs
+            ]
+
             # b_(x,i,y,j)^dep
-            bool_dep_vars = LpVariable.dicts(
+            bool_dep_vars = self.bool_dep_vars = model.add_variables(
                 "bool_dep",
-                [
-                    (
-                        task1["name"],
-                        value1["instance"],
-                        task2["name"],
-                        value2["instance"],
-                    )
-                    for task1 in self.tasks_instances
-                    for task2 in self.tasks_instances
-                    if task1 != task2
-                    for value1 in task1["value"]
-                    for value2 in task2["value"]
-                ],
+                dep_instances_pairs,
                 lowBound=0,
                 upBound=1,
                 cat="Binary",
             )
 
-            delay_vars = LpVariable.dicts(
+            delay_vars = self.delay_vars = model.add_variables(
                 "delay",
-                [
-                    (
-                        task1["name"],
-                        value1["instance"],
-                        task2["name"],
-                        value2["instance"],
-                    )
-                    for task1 in self.tasks_instances
-                    for task2 in self.tasks_instances
-                    if task1 != task2
-                    for value1 in task1["value"]
-                    for value2 in task2["value"]
-                ],
+                dep_instances_pairs,
                 lowBound=0,
                 cat="Integer",
             )
-            total_delay_var = LpVariable("total_delay", cat="Integer")
+            total_delay_var = model.add_variable("total_delay", cat="Integer")
+            self.total_delay_var = total_delay_var
+
+            if formulation == "compact":
+                # ψ_(x,d,y,e)^device, x is on device d and y on device e. Only the
+                # dependencies need it, and only for different devices since the delay
+                # on the same device is 0.
+                psi_task_device_vars = self.psi_task_device_vars = model.add_variables(
+                    "psi_task_device",
+                    [
+                        (depends_on, device1, task2["name"], device2)
+                        for task2 in self.tasks_instances
+                        for depends_on in self.get_task_data(task2["name"])["dependsOn"]
+                        for device1 in devices
+                        for device2 in devices
+                        if device1 != device2
+                    ],
+                    lowBound=0,
+                    upBound=1,
+                    cat="Binary",
+                )
 
         # Constraint
+        # Constraints are given as lists of (variable, coefficient) terms, moved to the
+        # left-hand side, so that the same formulation can be built by every builder.
+
         # 1. A task instance can have exactly one core assigned to it. (From C1 - C17)
         for task in self.tasks_instances:
-            prob += (
-                lpSum(
-                    self.assigned_vars[(task["name"], core["name"])]
+            model.add_constraint(
+                [
+                    (self.assigned_vars[(task["name"], core["name"])], 1)
                     for core in self.cores
-                )
-                == 1
+                ],
+                "==",
+                1,
             )
         
         # Restrict cores or devices if required
@@ -196,14 +324,20 @@ class MultiCoreScheduler:
             requiredDevice = self.get_task_data(task["name"])["requiredDevice"]
 
             if requiredCore != None:
-                prob += self.assigned_vars[(task["name"], requiredCore)] == 1
+                model.add_constraint(
+                    [(self.assigned_vars[(task["name"], requiredCore)], 1)], "==", 1
+                )
 
             if requiredDevice != None:
-                prob += lpSum(
-                    self.assigned_vars[(task["name"], core["name"])]
-                    for core in cores
-                    if core["device"] == requiredDevice
-                ) == 1
+                model.add_constraint(
+                    [
+                        (self.assigned_vars[(task["name"], core["name"])], 1)
+                        for core in self.cores
+                        if core["device"] == requiredDevice
+                    ],
+                    "==",
+                    1,
+                )
             
 
 
@@ -214,120 +348,230 @@ class MultiCoreScheduler:
             wcet = self.get_task_data(task["name"])["wcet"]
             for instance in filter(lambda x: x["instance"] != -1, task["value"]):
                 instance_name = (task["name"], instance["instance"])
-                prob += (
-                    self.exec_end_vars[instance_name]
-                    - self.exec_start_vars[instance_name]
-                    == wcet
-                )
-                prob += self.exec_start_vars[instance_name] >= instance["letStartTime"]
-                prob += self.exec_end_vars[instance_name] <= instance["letEndTime"]
-
-                # If timings have been pre-determined, constrain them here
-                if fixed_timings and "EntityInstancesStore" in system:
-                    task_value = next((x for x in system["EntityInstancesStore"] if x["name"] == task["name"]), None)
-                    if task_value != None:
-                        instance_value = next((x for x in task_value["value"] if x["instance"] == instance["instance"]), None)
-                        if instance_value != None:
-                            prob += self.exec_start_vars[instance_name] == instance_value["executionIntervals"][0]["startTime"]
-                            prob += self.exec_end_vars[instance_name] == instance_value["executionIntervals"][0]["endTime"]
-
-
-        # 3a. Execution intervals for the task instances on the same core should not overlap. (From C151 - C790)
-        for core1 in self.cores:
-            for core2 in self.cores:
+                start_var = self.exec_start_vars[instance_name]
+                end_var = self.exec_end_vars[instance_name]
+
+                model.add_constraint([(end_var, 1), (start_var, -1)], "==", wcet)
+                model.add_constraint([(start_var, 1)], ">=", instance["letStartTime"])
+                model.add_constraint([(end_var, 1)], "<=", instance["letEndTime"])
+
+
+        if formulation == "full":
+            # 3a. Execution intervals for the task instances on the same core should not overlap. (From C151 - C790)
+            for core1 in self.cores:
+                for core2 in self.cores:
+                    for task1 in self.tasks_instances:
+                        for task2 in self.tasks_instances:
+                            if task1 != task2:
+                                task_x = task1["name"], core1["name"]
+                                task_y = task2["name"], core2["name"]
+                                task_pair = task_x + task_y
+
+                                self.add_product_constraints(
+                                    model,
+                                    psi_task_core_vars[task_pair],
+                                    [(self.assigned_vars[task_x], 1)],
+                                    [(self.assigned_vars[task_y], 1)],
+                                )
+
+            # 3b. (From C701 - C950)
+            for task1 in self.tasks_instances:
+                for task2 in self.tasks_instances:
+                    if task1 != task2:
+                        task_pair = (task1["name"], task2["name"])
+
+                        model.add_constraint(
+                            [(psi_tasks_vars[task_pair], 1)]
+                            + [
+                                (
+                                    psi_task_core_vars[
+                                        task1["name"], core1["name"], task2["name"], core2["name"]
+                                    ],
+                                    -1,
+                                )
+                                for core1 in self.cores
+                                for core2 in self.cores
+                                if core1 != core2
+                            ],
+                            "==",
+                            0,
+                        )
+        else:
+            # 3a. x and y are on the same core k
+            for core in self.cores:
                 for task1 in self.tasks_instances:
                     for task2 in self.tasks_instances:
                         if task1 != task2:
-                            task_x = task1["name"], core1["name"]
-                            task_y = task2["name"], core2["name"]
-                            task_pair = task_x + task_y
-
-                            prob += (
-                                psi_task_core_vars[task_pair]
-                                <= self.assigned_vars[task_x]
+                            task_x = task1["name"], core["name"]
+                            task_y = task2["name"], core["name"]
+                            same_core = (task1["name"], task2["name"], core["name"])
+
+                            self.add_product_constraints(
+                                model,
+                                psi_same_core_vars[same_core],
+                                [(self.assigned_vars[task_x], 1)],
+                                [(self.assigned_vars[task_y], 1)],
                             )
-                            prob += (
-                                psi_task_core_vars[task_pair]
-                                <= self.assigned_vars[task_y]
-                            )
-                            prob += (
-                                psi_task_core_vars[task_pair]
-                                >= self.assigned_vars[task_x]
-                                + self.assigned_vars[task_y]
-                                - 1
-                            )
-
-        # 3b. (From C701 - C950)
-        for task1 in self.tasks_instances:
-            for task2 in self.tasks_instances:
-                if task1 != task2:
-                    task_pair = (task1["name"], task2["name"])
-
-                    prob += psi_tasks_vars[task_pair] == lpSum(
-                        psi_task_core_vars[
-                            task1["name"], core1["name"], task2["name"], core2["name"]
-                        ]
-                        for core1 in self.cores
-                        for core2 in self.cores
-                        if core1 != core2
-                    )
 
-        # 3c, 3d. (From C951 - C1110)
-        for task1 in self.tasks_instances:
-            for task2 in self.tasks_instances:
-                if task1 != task2:
-                    for instance1 in filter(
-                        lambda x: x["instance"] != -1, task1["value"]
-                    ):
-                        for instance2 in filter(
-                            lambda x: x["instance"] != -1, task2["value"]
-                        ):
-                            task_x = (task1["name"], instance1["instance"])
-                            task_y = (task2["name"], instance2["instance"])
-                            instances_pair = task_x + task_y
-                            task_pair = (task1["name"], task2["name"])
-
-                            prob += (
-                                self.exec_end_vars[task_x]
-                                - self.exec_start_vars[task_y]
-                                <= N * bool_task_vars[instances_pair]
-                                + N * psi_tasks_vars[task_pair]
-                            )
-                            prob += (
-                                self.exec_end_vars[task_y]
-                                - self.exec_start_vars[task_x]
-                                <= N
-                                - N * bool_task_vars[instances_pair]
-                                + N * psi_tasks_vars[task_pair]
-                            )
+            # 3b. x and y are on different cores
+            for task1 in self.tasks_instances:
+                for task2 in self.tasks_instances:
+                    if task1 != task2:
+                        task_pair = (task1["name"], task2["name"])
 
+                        model.add_constraint(
+                            [(psi_tasks_vars[task_pair], 1)]
+                            + [
+                                (
+                                    psi_same_core_vars[
+                                        (task1["name"], task2["name"], core["name"])
+                                    ],
+                                    1,
+                                )
+                                for core in self.cores
+                            ],
+                            "==",
+                            1,
+                        )
 
+        # 3c, 3d. (From C951 - C1110)
+        for task1_name, instance1, task2_name, instance2 in instance_pairs:
+            instances_pair = (
+                task1_name,
+                instance1["instance"],
+                task2_name,
+                instance2["instance"],
+            )
+            task_pair = (task1_name, task2_name)
+
+            # Copies in a later hyperperiod use the variables of their modelled instance
+            task_x, offset_x = self.get_instance_variable(task1_name, instance1["instance"])
+            task_y, offset_y = self.get_instance_variable(task2_name, instance2["instance"])
+
+            if big_m == "tight":
+                # Largest value the left-hand side can take inside the LET windows
+                M_xy = max(0, instance1["letEndTime"] - instance2["letStartTime"])
+                M_yx = max(0, instance2["letEndTime"] - instance1["letStartTime"])
+            else:
+                M_xy = N
+                M_yx = N
+
+            # e_x - s_y <= M * b + M * ψ
+            model.add_constraint(
+                [
+                    (self.exec_end_vars[task_x], 1),
+                    (self.exec_start_vars[task_y], -1),
+                    (bool_task_vars[instances_pair], -M_xy),
+                    (psi_tasks_vars[task_pair], -M_xy),
+                ],
+                "<=",
+                offset_y - offset_x,
+            )
+            # e_y - s_x <= M - M * b + M * ψ
+            model.add_constraint(
+                [
+                    (self.exec_end_vars[task_y], 1),
+                    (self.exec_start_vars[task_x], -1),
+                    (bool_task_vars[instances_pair], M_yx),
+                    (psi_tasks_vars[task_pair], -M_yx),
+                ],
+                "<=",
+                M_yx + offset_x - offset_y,
+            )
 
         # 5. If a task instance uses a core, the core is marked used
         for core in self.cores:
-            prob += core_used_vars[core["name"]] <= lpSum(self.assigned_vars[(task["name"], core["name"])] for task in self.tasks_instances)
+            model.add_constraint(
+                [(core_used_vars[core["name"]], 1)]
+                + [
+                    (self.assigned_vars[(task["name"], core["name"])], -1)
+                    for task in self.tasks_instances
+                ],
+                "<=",
+                0,
+            )
             for task in self.tasks_instances:
-                prob += core_used_vars[(core["name"])] >= self.assigned_vars[(task["name"], core["name"])]
+                model.add_constraint(
+                    [
+                        (core_used_vars[(core["name"])], 1),
+                        (self.assigned_vars[(task["name"], core["name"])], -1),
+                    ],
+                    ">=",
+                    0,
+                )
         
 
-        if method == "e2e":
+        if e2e:
             # 6a. Transmission latencies between two tasks
-            for task1 in self.tasks_instances:
+            if formulation == "full":
+                for task1 in self.tasks_instances:
+                    for task2 in self.tasks_instances:
+                        if task1 != task2:
+                            task_pair = (task1["name"], task2["name"])
+                            model.add_constraint(
+                                [(lambda_vars[task_pair], 1)]
+                                + [
+                                    (
+                                        psi_task_core_vars[
+                                            (task1["name"], core1["name"], task2["name"], core2["name"])
+                                        ],
+                                        -self.index.core_delays[k][l],
+                                    )
+                                    for k, core1 in enumerate(self.cores)
+                                    for l, core2 in enumerate(self.cores)
+                                ],
+                                "==",
+                                0,
+                                group="e2e",
+                            )
+            else:
+                # Only the latencies of the dependencies are used by 6b
                 for task2 in self.tasks_instances:
-                    if task1 != task2:
-                        task_pair = (task1["name"], task2["name"])
-                        prob += lambda_vars[task_pair] == lpSum(
-                            psi_task_core_vars[
-                                (task1["name"], core1["name"], task2["name"], core2["name"])
-                            ]
-                            * self.get_delay(core1, core2, N)
-                            for core1 in self.cores
-                            for core2 in self.cores
+                    for depends_on in self.get_task_data(task2["name"])["dependsOn"]:
+                        task_pair = (depends_on, task2["name"])
+
+                        for device1 in devices:
+                            for device2 in devices:
+                                if device1 != device2:
+                                    device_pair = (depends_on, device1, task2["name"], device2)
+                                    self.add_product_constraints(
+                                        model,
+                                        psi_task_device_vars[device_pair],
+                                        [
+                                            (self.assigned_vars[(depends_on, core["name"])], 1)
+                                            for core in self.cores
+                                            if core["device"] == device1
+                                        ],
+                                        [
+                                            (self.assigned_vars[(task2["name"], core["name"])], 1)
+                                            for core in self.cores
+                                            if core["device"] == device2
+                                        ],
+                                        group="e2e",
+                                    )
+
+                        model.add_constraint(
+                            [(lambda_vars[task_pair], 1)]
+                            + [
+                                (
+                                    psi_task_device_vars[(depends_on, device1, task2["name"], device2)],
+                                    -self.index.get_device_pair_delay(device1, device2),
+                                )
+                                for device1 in devices
+                                for device2 in devices
+                                if device1 != device2
+                            ],
+                            "==",
+                            0,
+                            group="e2e",
                         )
 
             # 6b. Constraints for task instance dependencies
             for task2 in self.tasks_instances:
                 for depends_on in self.get_task_data(task2["name"])["dependsOn"]:
+                    if big_m == "tight":
+                        max_delay = self.get_max_delay(depends_on, task2["name"], N)
+
                     for instance2 in filter(
                         lambda x: x["instance"] != -1, task2["value"],
                     ):
@@ -339,122 +583,378 @@ class MultiCoreScheduler:
                                 task2["name"],
                                 instance2["instance"],
                             )
-                            prob += (
-                                instance1["letEndTime"]
-                                + lambda_vars[dep_pair]
-                                - instance2["letStartTime"]
-                                <= N - N * bool_dep_vars[dep_instances_pair]
+
+                            if big_m == "tight":
+                                M = max(
+                                    0,
+                                    instance1["letEndTime"]
+                                    + max_delay
+                                    - instance2["letStartTime"],
+                                )
+                            else:
+                                M = N
+
+                            # LET_end_x + λ - LET_start_y <= M - M * b
+                            model.add_constraint(
+                                [
+                                    (lambda_vars[dep_pair], 1),
+                                    (bool_dep_vars[dep_instances_pair], M),
+                                ],
+                                "<=",
+                                M
+                                - instance1["letEndTime"]
+                                + instance2["letStartTime"],
+                                group="e2e",
                             )
 
-                        prob += (
-                            lpSum(
-                                bool_dep_vars[
-                                    (
-                                        depends_on,
-                                        instance1["instance"],
-                                        task2["name"],
-                                        instance2["instance"],
-                                    )
-                                ]
+                        model.add_constraint(
+                            [
+                                (
+                                    bool_dep_vars[
+                                        (
+                                            depends_on,
+                                            instance1["instance"],
+                                            task2["name"],
+                                            instance2["instance"],
+                                        )
+                                    ],
+                                    1,
+                                )
                                 for instance1 in self.get_instances(depends_on)
-                            )
-                            == 1
+                            ],
+                            "==",
+                            1,
+                            group="e2e",
                         )
             
             # 6c. Delay constraints
-            for task1 in self.tasks_instances:
-                for task2 in self.tasks_instances:
-                    if task1 != task2:
-                        for instance1 in task1["value"]:
-                            for instance2 in filter(
-                                lambda x: x["instance"] != -1, task2["value"]
-                            ):
-                                dep_instances_pair = (
-                                    task1["name"],
-                                    instance1["instance"],
-                                    task2["name"],
-                                    instance2["instance"],
-                                )
-                                prob += (
-                                    delay_vars[dep_instances_pair]
-                                    >= instance2["letStartTime"]
-                                    - instance1["letEndTime"]
-                                    - 2*N
-                                    + 2*N * bool_dep_vars[dep_instances_pair]
-                                )
-                                prob += (
-                                    delay_vars[dep_instances_pair]
-                                    <= instance2["letStartTime"]
-                                    - instance1["letEndTime"]
-                                    + 2*N
-                                    - 2*N * bool_dep_vars[dep_instances_pair]
-                                )
+            for task1_name, instance1, task2_name, instance2 in dependency_pairs:
+                if instance2["instance"] == -1:
+                    continue
+
+                dep_instances_pair = (
+                    task1_name,
+                    instance1["instance"],
+                    task2_name,
+                    instance2["instance"],
+                )
+
+                if big_m == "tight":
+                    # The delay only has to be able to reach 0 when not selected
+                    M = abs(instance2["letStartTime"] - instance1["letEndTime"])
+                else:
+                    M = 2*N
+
+                let_gap = instance2["letStartTime"] - instance1["letEndTime"]
+
+                # d >= LET_start_y - LET_end_x - M + M * b
+                model.add_constraint(
+                    [
+                        (delay_vars[dep_instances_pair], 1),
+                        (bool_dep_vars[dep_instances_pair], -M),
+                    ],
+                    ">=",
+                    let_gap - M,
+                    group="e2e",
+                )
+                # d <= LET_start_y - LET_end_x + M - M * b
+                model.add_constraint(
+                    [
+                        (delay_vars[dep_instances_pair], 1),
+                        (bool_dep_vars[dep_instances_pair], M),
+                    ],
+                    "<=",
+                    let_gap + M,
+                    group="e2e",
+                )
 
             # Set the total delay
-            prob += total_delay_var == lpSum(delay_vars)
+            total_delay_terms = [(total_delay_var, 1)]
+            for dep_instances_pair, delay in delay_vars.items():
+                weight, constant = self.get_delay_terms(dep_instances_pair)
+                total_delay_terms.append((delay, -weight))
+                if constant != 0:
+                    total_delay_terms.append((bool_dep_vars[dep_instances_pair], -constant))
+
+            model.add_constraint(total_delay_terms, "==", 0, group="e2e")
         
         # Set the number of used cores (total)
-        prob += cores_used_var == lpSum(core_used_vars)
+        model.add_constraint(
+            [(cores_used_var, 1)] + [(used, -1) for used in core_used_vars.values()],
+            "==",
+            0,
+        )
 
+    def solve_model(self, method):
         if method == "c":
-            prob += cores_used_var, "Minimise Core Usage"
+            self.model.set_group_enabled("e2e", False)
+            self.model.set_objective([(self.cores_used_var, 1)], "Minimise Core Usage")
         elif method == "e2e":
-            prob += total_delay_var, "Minimise End-to-End Response Time"
-        
-        prob.solve(GUROBI(timeLimit=5*60))
+            if self.total_delay_var is None:
+                raise ValueError("The model was built without the E2E block")
 
-        self.update_schedule()
+            self.model.set_group_enabled("e2e", True)
+            self.model.set_objective(
+                [(self.total_delay_var, 1)], "Minimise End-to-End Response Time"
+            )
+        else:
+            raise ValueError(f"Unknown method: {method}")
 
-        return self.tasks_instances, prob
+        prob = self.model.solve(5*60)
+        with phase("schedule"):
+            prob.summary = self.get_solution_summary(method)
+            tasks_instances = self.update_schedule()
 
-    def format_tasks(self, tasks, dependencies):
-        formatted_tasks = []
+        return tasks_instances, prob
 
-        for task in tasks:
-            source_tasks = self.get_source_tasks(task, dependencies)
-            core = task.get("core", None)
-            device = task.get("device", None)
+    # The delays are only part of the solve when the E2E block is enabled
+    def get_solution_summary(self, method):
+        summary = SolutionSummary()
+        if self.cores_used_var.varValue != None:
+            summary.cores_used = self.cores_used_var.varValue
 
-            data = {
-                "name": task["name"],
-                "offset": task["activationOffset"],
-                "duration": task["duration"],
-                "period": task["period"],
-                "wcet": task["wcet"],
-                "requiredCore": core,
-                "requiredDevice": device,
-                "dependsOn": source_tasks,
-            }
+        if method == "e2e":
+            if self.total_delay_var.varValue != None:
+                summary.total_delay = self.total_delay_var.varValue
+
+            for dep_instances_pair, var in self.bool_dep_vars.items():
+                if self.is_selected(var):
+                    delay = self.delay_vars[dep_instances_pair].varValue
+                    if self.periodic_horizon is None:
+                        summary.dependencies[dep_instances_pair] = delay
+                    else:
+                        summary.dependencies.update(
+                            self.periodic_horizon.unroll_dependency(dep_instances_pair, delay)
+                        )
+
+        return summary
+
+    # Fix core assignments and/or execution intervals of a solved schedule through
+    # the variable bounds, undone by unfix_schedule
+    def fix_schedule(self, tasks_instances, fix_cores=True, fix_timings=True):
+        for task in tasks_instances:
+            for instance in task["value"]:
+                if "executionIntervals" not in instance:
+                    continue
+
+                interval = instance["executionIntervals"][0]
+                instance_name = (task["name"], instance["instance"])
 
-            formatted_tasks.append(data)
+                if fix_timings and instance_name in self.exec_start_vars:
+                    self.model.fix_variable(
+                        self.exec_start_vars[instance_name], interval["startTime"]
+                    )
+                    self.model.fix_variable(
+                        self.exec_end_vars[instance_name], interval["endTime"]
+                    )
+
+                if fix_cores:
+                    for core in self.cores:
+                        self.model.fix_variable(
+                            self.assigned_vars[(task["name"], core["name"])],
+                            1 if core["name"] == interval["core"] else 0,
+                        )
+
+    def unfix_schedule(self):
+        self.model.reset_bounds()
+
+    # MIP start from the core assignments and execution intervals of a schedule, the
+    # other variables are derived from them. Replaces the previous MIP start.
+    def set_initial_schedule(self, tasks_instances):
+        self.model.clear_initial_values()
+
+        cores = {}
+        intervals = {}
+        for task in tasks_instances:
+            for instance in task["value"]:
+                if "executionIntervals" in instance:
+                    interval = instance["executionIntervals"][0]
+                    cores[task["name"]] = interval["core"]
+                    intervals[(task["name"], instance["instance"])] = interval
+
+        # Without a core for every task the schedule can not be used as a start
+        if any(task["name"] not in cores for task in self.tasks_instances):
+            return False
+
+        set_value = self.model.set_initial_value
+        devices = {
+            task_name: self.get_device_for_core(core) for task_name, core in cores.items()
+        }
+
+        for (task_name, core), var in self.assigned_vars.items():
+            set_value(var, 1 if cores[task_name] == core else 0)
+
+        for instance_name, interval in intervals.items():
+            if instance_name in self.exec_start_vars:
+                set_value(self.exec_start_vars[instance_name], round(interval["startTime"]))
+                set_value(self.exec_end_vars[instance_name], round(interval["endTime"]))
+
+        if self.psi_task_core_vars is not None:
+            for (task1, core1, task2, core2), var in self.psi_task_core_vars.items():
+                set_value(var, 1 if cores[task1] == core1 and cores[task2] == core2 else 0)
+
+        if self.psi_same_core_vars is not None:
+            for (task1, task2, core), var in self.psi_same_core_vars.items():
+                set_value(var, 1 if cores[task1] == core and cores[task2] == core else 0)
+
+        if self.psi_task_device_vars is not None:
+            for (task1, device1, task2, device2), var in self.psi_task_device_vars.items():
+                set_value(
+                    var, 1 if devices[task1] == device1 and devices[task2] == device2 else 0
+                )
+
+        for (task1, task2), var in self.psi_tasks_vars.items():
+            set_value(var, 1 if cores[task1] != cores[task2] else 0)
+
+        # b = 0 when x ends before y starts
+        for (task1, instance1, task2, instance2), var in self.bool_task_vars.items():
+            instance_x, offset_x = self.get_instance_variable(task1, instance1)
+            instance_y, offset_y = self.get_instance_variable(task2, instance2)
+            interval1 = intervals.get(instance_x, None)
+            interval2 = intervals.get(instance_y, None)
+            if interval1 != None and interval2 != None:
+                set_value(
+                    var,
+                    0
+                    if interval1["endTime"] + offset_x <= interval2["startTime"] + offset_y
+                    else 1,
+                )
+
+        for core in self.cores:
+            set_value(
+                self.core_used_vars[core["name"]], 1 if core["name"] in cores.values() else 0
+            )
+        set_value(self.cores_used_var, len(set(cores.values())))
+
+        for (task1, task2), var in self.lambda_vars.items():
+            set_value(var, self.index.get_core_delay(cores[task1], cores[task2]))
+
+        if self.bool_dep_vars is not None:
+            # Each instance reads from the latest source instance whose data arrives in time
+            delays = {}
+            for task2 in self.tasks_instances:
+                for depends_on in self.get_task_data(task2["name"])["dependsOn"]:
+                    latency = self.index.get_core_delay(cores[depends_on], cores[task2["name"]])
+
+                    for instance2 in filter(lambda x: x["instance"] != -1, task2["value"]):
+                        instance1 = max(
+                            (
+                                x
+                                for x in self.get_instances(depends_on)
+                                if x["letEndTime"] + latency <= instance2["letStartTime"]
+                            ),
+                            key=lambda x: x["letEndTime"],
+                            default=None,
+                        )
+                        if instance1 != None:
+                            dep_instances_pair = (
+                                depends_on,
+                                instance1["instance"],
+                                task2["name"],
+                                instance2["instance"],
+                            )
+                            delays[dep_instances_pair] = (
+                                instance2["letStartTime"] - instance1["letEndTime"]
+                            )
 
-        return formatted_tasks
+            for dep_instances_pair, var in self.bool_dep_vars.items():
+                set_value(var, 1 if dep_instances_pair in delays else 0)
+            for dep_instances_pair, var in self.delay_vars.items():
+                set_value(var, delays.get(dep_instances_pair, 0))
+            total_delay = 0
+            for dep_instances_pair, delay in delays.items():
+                weight, constant = self.get_delay_terms(dep_instances_pair)
+                total_delay += weight * delay + constant
+            set_value(self.total_delay_var, total_delay)
+
+        return True
+
+    def create_model_builder(self, builder, name, solver="gurobi", threads=None):
+        if builder == "pulp":
+            return PulpModelBuilder(name, solver, threads)
+        if builder == "matrix":
+            return MatrixModelBuilder(name, solver, threads)
+
+        raise ValueError(f"Unknown model builder: {builder}")
+
+    # ψ = product of two binary sums, each sum is at most 1
+    def add_product_constraints(self, model, product_var, terms1, terms2, group=None):
+        model.add_constraint(
+            [(product_var, 1)] + [(var, -coefficient) for var, coefficient in terms1],
+            "<=",
+            0,
+            group=group,
+        )
+        model.add_constraint(
+            [(product_var, 1)] + [(var, -coefficient) for var, coefficient in terms2],
+            "<=",
+            0,
+            group=group,
+        )
+        model.add_constraint(
+            [(product_var, 1)]
+            + [(var, -coefficient) for var, coefficient in terms1 + terms2],
+            ">=",
+            -1,
+            group=group,
+        )
 
+    # Returns a copy of the task instances with the solution of the last solve, the
+    # model's own instances are left untouched so that it can be solved again
     def update_schedule(self):
-        for task in self.tasks_instances:
-            task["value"] = [
-                instance for instance in task["value"] if instance["instance"] != -1
-            ]
+        tasks_instances = []
+
+        # A periodic model is unrolled to all instances of the makespan
+        schedule_instances = self.tasks_instances
+        if self.periodic_horizon is not None:
+            schedule_instances = self.periodic_horizon.tasks_instances
+
+        for task in schedule_instances:
+            current_core = next(
+                (
+                    core
+                    for core in self.cores
+                    if self.is_selected(self.assigned_vars[(task["name"], core["name"])])
+                ),
+                None,
+            )
+
+            instances = []
             for instance in task["value"]:
-                for core in self.cores:
-                    if self.assigned_vars[(task["name"], core["name"])].varValue == 1:
-                        start_time = self.exec_start_vars[
-                            (task["name"], instance["instance"])
-                        ].varValue
-                        end_time = self.exec_end_vars[
-                            (task["name"], instance["instance"])
-                        ].varValue
-
-                        execution_time = [
-                            {
-                                "core": core["name"],
-                                "endTime": end_time,
-                                "startTime": start_time,
-                            }
-                        ]
-                        instance["executionTime"] = self.get_task_data(task["name"])["wcet"]
-                        instance["currentCore"] = core
-                        instance["executionIntervals"] = execution_time
+                if instance["instance"] == -1:
+                    continue
+
+                instance = dict(instance)
+                if current_core != None:
+                    instance_name, offset = self.get_instance_variable(
+                        task["name"], instance["instance"]
+                    )
+                    start_time = self.exec_start_vars[instance_name].varValue
+                    end_time = self.exec_end_vars[instance_name].varValue
+                    if offset != 0 and start_time != None:
+                        start_time += offset
+                        end_time += offset
+
+                    execution_time = [
+                        {
+                            "core": current_core["name"],
+                            "endTime": end_time,
+                            "startTime": start_time,
+                        }
+                    ]
+                    instance["executionTime"] = self.get_task_data(task["name"])["wcet"]
+                    instance["currentCore"] = current_core
+                    instance["executionIntervals"] = execution_time
+
+                instances.append(instance)
+
+            tasks_instances.append(dict(task, value=instances))
+
+        return tasks_instances
+
+    @staticmethod
+    def is_selected(variable):
+        return variable.varValue != None and round(variable.varValue) == 1
 
     def create_task_instances(self, makespan, tasks, N):
         task_instances = []
@@ -505,59 +1005,163 @@ class MultiCoreScheduler:
         }
 
     def get_task_data(self, task_name):
-        return next(
-            (task for task in self.task_data if task["name"] == task_name)
-        )
+        return self.index.get_task(task_name)
 
     def get_device_for_core(self, core):
-        return next((c["device"] for c in self.cores if c["name"] == core), None)
+        return self.index.get_device_for_core(core)
 
     def get_device_delay(self, device_name, protocol):
-        for device in self.devices:
-            if device["name"] == device_name:
-                for delay in device["delays"]:
-                    if delay["protocol"] == protocol:
-                        return delay
-        
-        return None
+        return self.index.get_device_delay(device_name, protocol)
 
     def get_delay(self, source, dest, N):
-        if source["device"] == dest["device"]:
-            return 0
+        return self.index.get_core_delay(source["name"], dest["name"])
 
-        for link in self.network_delays:
-            if link["source"] == source["device"] and link["dest"] == dest["device"]:
+    def get_device_pair_delay(self, source_device, dest_device, N):
+        return self.index.get_device_pair_delay(source_device, dest_device)
 
-                comm_delay = (
-                    link["wcdt"]
-                    + self.get_device_delay(source["device"], "tcp")["wcdt"]
-                    + self.get_device_delay(dest["device"], "tcp")["wcdt"]
-                )
-                return comm_delay
+    def get_allowed_cores(self, task_name):
+        task = self.get_task_data(task_name)
+
+        if task["requiredCore"] != None:
+            return [core for core in self.cores if core["name"] == task["requiredCore"]]
+
+        if task["requiredDevice"] != None:
+            return [core for core in self.cores if core["device"] == task["requiredDevice"]]
 
-        return N
+        return self.cores
+
+    def get_max_delay(self, source_task, dest_task, N):
+        # Worst-case transmission latency lambda_(x,y) can take
+        return max(
+            self.index.get_core_delay(core1["name"], core2["name"])
+            for core1 in self.get_allowed_cores(source_task)
+            for core2 in self.get_allowed_cores(dest_task)
+        )
+
+    def get_core_devices(self):
+        devices = []
+        for core in self.cores:
+            if core["device"] not in devices:
+                devices.append(core["device"])
+
+        return devices
 
     def get_instances(self, task_name):
-        for task in self.tasks_instances:
-            if task["name"] == task_name:
-                return task["value"]
-        
-        return []
-
-    def get_source_tasks(self, task, dependencies):
-        source_tasks = []
-
-        if dependencies is not None:
-            for dependency in filter(
-                lambda x: x["source"]["task"] != "__system"
-                and x["destination"]["task"] != "__system",
-                dependencies,
-            ):
-                if dependency["destination"]["task"] == task["name"]:
-                    source_tasks.append(dependency["source"]["task"])
-
-        return source_tasks
-    
+        return self.index.get_instances(task_name)
+
+    def get_instance_pairs(self, prune_overlaps):
+        # The instances at the end of the hyperperiod can overlap the copies of the ones at
+        # its start, which only the sweep finds
+        if self.periodic_horizon is not None:
+            return [
+                pair
+                for pair in self.get_overlapping_instance_pairs(
+                    self.periodic_horizon.get_wrapped_instances()
+                )
+                if self.periodic_horizon.is_modelled(pair[0], pair[1]["instance"])
+                or self.periodic_horizon.is_modelled(pair[2], pair[3]["instance"])
+            ]
+
+        if prune_overlaps:
+            return self.get_overlapping_instance_pairs(self.tasks_instances)
+
+        return [
+            (task1["name"], instance1, task2["name"], instance2)
+            for task1 in self.tasks_instances
+            for task2 in self.tasks_instances
+            if task1 != task2
+            for instance1 in task1["value"]
+            if instance1["instance"] != -1
+            for instance2 in task2["value"]
+            if instance2["instance"] != -1
+        ]
+
+    def get_overlapping_instance_pairs(self, tasks_instances):
+        # Sort-and-sweep over the LET windows. Two instances can only collide on a core
+        # if their windows overlap, otherwise their order is already fixed.
+        windows = sorted(
+            (
+                (task["name"], instance)
+                for task in tasks_instances
+                for instance in task["value"]
+                if instance["instance"] != -1
+            ),
+            key=lambda x: x[1]["letStartTime"],
+        )
+
+        pairs = []
+        active = []
+        for task_name, instance in windows:
+            active = [
+                x for x in active if x[1]["letEndTime"] > instance["letStartTime"]
+            ]
+            for active_name, active_instance in active:
+                if active_name != task_name:
+                    pairs.append((active_name, active_instance, task_name, instance))
+                    pairs.append((task_name, instance, active_name, active_instance))
+
+            active.append((task_name, instance))
+
+        return pairs
+
+    def get_instance_variable(self, task_name, instance):
+        if self.periodic_horizon is None:
+            return (task_name, instance), 0
+
+        return self.periodic_horizon.get_variable(task_name, instance)
+
+    # Weight of the delay of a dependency instance pair in the total delay and the
+    # constant added when the pair is selected
+    def get_delay_terms(self, dep_instances_pair):
+        if self.periodic_horizon is None:
+            return 1, 0
+
+        return self.periodic_horizon.get_delay_terms(dep_instances_pair)
+
+    # The periodic model starts once every task has been released and every dependency
+    # with a finite latency can read from a released source instance
+    def get_periodic_start(self, tasks, N):
+        first_instances = {
+            task["name"]: self.create_task_instance(task, 0) for task in tasks
+        }
+
+        start = max(instance["letStartTime"] for instance in first_instances.values())
+        for task in tasks:
+            for depends_on in self.get_task_data(task["name"])["dependsOn"]:
+                latencies = [
+                    self.index.get_core_delay(core1["name"], core2["name"])
+                    for core1 in self.get_allowed_cores(depends_on)
+                    for core2 in self.get_allowed_cores(task["name"])
+                ]
+                latencies = [latency for latency in latencies if latency < N]
+                if len(latencies) > 0:
+                    start = max(
+                        start, first_instances[depends_on]["letEndTime"] + max(latencies)
+                    )
+
+        return start
+
+    def get_dependency_instance_pairs(self, sparse):
+        # Only the (dependsOn, task) pairs are constrained by 6b, every other pair of
+        # instances ends up with a delay of 0 and does not change the objective.
+        if sparse:
+            return [
+                (depends_on, instance1, task2["name"], instance2)
+                for task2 in self.tasks_instances
+                for depends_on in self.get_task_data(task2["name"])["dependsOn"]
+                for instance1 in self.get_instances(depends_on)
+                for instance2 in task2["value"]
+                if instance2["instance"] != -1
+            ]
+
+        return [
+            (task1["name"], instance1, task2["name"], instance2)
+            for task1 in self.tasks_instances
+            for task2 in self.tasks_instances
+            if task1 != task2
+            for instance1 in task1["value"]
+            for instance2 in task2["value"]
+        ]
 
     @staticmethod
     def calculate_hyperperiod(task_set):
@@ -0,0 +1,110 @@
+# A schedule that repeats every hyperperiod. The instances whose LET window starts in
+# [start, start + hyperperiod) stand for their copies in the later hyperperiods, the
+# ones that start before are the transient prefix and are modelled on their own.
+class PeriodicHorizon:
+    def __init__(self, tasks, tasks_instances, hyperperiod, start):
+        self.hyperperiod = hyperperiod
+        self.start = start
+        self.end = start + hyperperiod
+
+        # All instances, the schedule is unrolled to them after the solve
+        self.tasks_instances = tasks_instances
+        # Instance numbers between two copies
+        self.strides = {task["name"]: hyperperiod // task["period"] for task in tasks}
+
+        # The modelled instance and the number of hyperperiods of every instance
+        self.sources = {}
+        # Number of instances each modelled instance stands for
+        self.copies = {}
+
+        self.model_instances = []
+        for task in tasks_instances:
+            stride = self.strides[task["name"]]
+
+            instances = []
+            for instance in task["value"]:
+                number = instance["instance"]
+                shift = 0
+                if number != -1 and instance["letStartTime"] >= self.end:
+                    shift = (instance["letStartTime"] - start) // hyperperiod
+                    number -= shift * stride
+                else:
+                    instances.append(instance)
+
+                self.sources[(task["name"], instance["instance"])] = (number, shift)
+                self.copies[(task["name"], number)] = (
+                    self.copies.get((task["name"], number), 0) + 1
+                )
+
+            self.model_instances.append(dict(task, value=instances))
+
+    def is_repeated(self, instance):
+        return instance["instance"] != -1 and instance["letStartTime"] >= self.start
+
+    # The modelled instances and the copies of the repeated ones one hyperperiod later,
+    # which the instances at the end of the window can overlap
+    def get_wrapped_instances(self):
+        tasks_instances = []
+        for task in self.model_instances:
+            stride = self.strides[task["name"]]
+
+            instances = list(task["value"])
+            for instance in task["value"]:
+                if not self.is_repeated(instance):
+                    continue
+
+                copy = dict(instance)
+                copy["instance"] = instance["instance"] + stride
+                for name in ("periodStartTime", "periodEndTime", "letStartTime", "letEndTime"):
+                    copy[name] = instance[name] + self.hyperperiod
+                instances.append(copy)
+
+                self.sources.setdefault(
+                    (task["name"], copy["instance"]), (instance["instance"], 1)
+                )
+
+            tasks_instances.append(dict(task, value=instances))
+
+        return tasks_instances
+
+    def is_modelled(self, task_name, instance):
+        return self.sources[(task_name, instance)][1] == 0
+
+    # The variables of an instance are the ones of its modelled instance, shifted in time
+    def get_variable(self, task_name, instance):
+        number, shift = self.sources[(task_name, instance)]
+        return (task_name, number), shift * self.hyperperiod
+
+    def get_copies(self, task_name, instance):
+        return self.copies.get((task_name, instance), 1)
+
+    # Weight of the delay of a dependency instance pair and the constant added when it is
+    # selected. Each copy of the destination reads from the copy of the same source
+    # instance, except for the negative instance which does not repeat, so those copies
+    # are a hyperperiod later each.
+    def get_delay_terms(self, dep_instances_pair):
+        task1_name, instance1, task2_name, instance2 = dep_instances_pair
+        copies = self.get_copies(task2_name, instance2)
+        if instance1 == -1:
+            return copies, self.hyperperiod * copies * (copies - 1) // 2
+
+        return copies, 0
+
+    # The dependency instance pairs of all copies of a selected pair, with their delays
+    def unroll_dependency(self, dep_instances_pair, delay):
+        task1_name, instance1, task2_name, instance2 = dep_instances_pair
+
+        dependencies = {}
+        for shift in range(self.get_copies(task2_name, instance2)):
+            copy_delay = delay
+            if instance1 == -1:
+                source = (task1_name, -1)
+                if delay != None:
+                    copy_delay = delay + shift * self.hyperperiod
+            else:
+                source = (task1_name, instance1 + shift * self.strides[task1_name])
+
+            destination = (task2_name, instance2 + shift * self.strides[task2_name])
+            dependencies[source + destination] = copy_delay
+
+        return dependencies
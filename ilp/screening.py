@@ -0,0 +1,267 @@
+import bisect
+import time
+
+from pulp import constants
+
+from ilp.model_builder import ModelResult
+from ilp.multicore import MultiCoreScheduler
+from ilp.solution_summary import SolutionSummary
+from ilp.solvers import SCREENED_INFEASIBLE, SolveStats
+from ilp.system_index import SystemIndex
+
+
+# Necessary conditions for a schedule, checked on the instances of create_task_instances
+# before any model is built. A failed check proves that the solver would report the
+# model infeasible.
+class FeasibilityScreen:
+    def __init__(self, system):
+        self.start_time = time.time()
+
+        tasks = system["EntityStore"]
+        self.hyperperiod = MultiCoreScheduler.calculate_hyperperiod(tasks)
+        self.hyperoffset = MultiCoreScheduler.calculate_hyperoffset(tasks)
+        self.N = MultiCoreScheduler.calculate_largeN(tasks)
+
+        self.tasks_instances = MultiCoreScheduler().create_task_instances(
+            MultiCoreScheduler.calculate_makespan(tasks), tasks, self.N
+        )
+        self.index = SystemIndex(system, self.N, self.tasks_instances)
+        self.cores = system["CoreStore"]
+
+    # Core allocation: every instance fits its LET window and no interval between LET
+    # boundaries has more demand than its cores can execute
+    def check_windows(self):
+        for task in self.index.tasks:
+            if task["wcet"] > task["duration"]:
+                return f"{task['name']} has a WCET longer than its LET duration"
+
+        # (letStartTime, letEndTime, task id, wcet) of every instance
+        instances = sorted(
+            (
+                (instance["letStartTime"], instance["letEndTime"], task_id, task["wcet"])
+                for task_id, task in enumerate(self.index.tasks)
+                for instance in self.index.instances[task_id]
+                if instance["instance"] != -1
+            ),
+            key=lambda x: x[1],
+        )
+        if len(instances) == 0:
+            return None
+
+        # Intervals that start after the first hyperperiod repeat earlier ones
+        max_duration = max(task["duration"] for task in self.index.tasks)
+        start_times = sorted(
+            {
+                start_time
+                for start_time, _, _, _ in instances
+                if start_time <= self.hyperoffset + self.hyperperiod
+            }
+        )
+
+        for t1 in start_times:
+            reason = self.check_interval_demand(instances, t1, self.hyperperiod + max_duration)
+            if reason != None:
+                return reason
+
+        # Tasks that can not share a core need a core each
+        clique = max_clique(self.get_core_conflicts())
+        if len(clique) > len(self.cores):
+            names = ", ".join(self.index.tasks[task_id]["name"] for task_id in clique)
+            return f"{names} can not share cores"
+
+        return None
+
+    # Pairs of tasks with two instances that do not fit into the union of their LET
+    # windows, they can never be on the same core. Returns the conflicting task ids of
+    # each task.
+    def get_core_conflicts(self):
+        conflicts = [set() for _ in self.index.tasks]
+
+        for x, task_x in enumerate(self.index.tasks):
+            for y in range(x + 1, len(self.index.tasks)):
+                task_y = self.index.tasks[y]
+                wcet = task_x["wcet"] + task_y["wcet"]
+                start_times_y = self.index.let_start_times[y]
+                end_times_y = self.index.let_end_times[y]
+
+                for instance in self.index.instances[x]:
+                    # Conflicts repeat every hyperperiod
+                    if instance["letStartTime"] > self.hyperoffset + self.hyperperiod:
+                        break
+                    if instance["instance"] == -1:
+                        continue
+
+                    # Only instances whose windows overlap can conflict, the windows of
+                    # a task are ordered
+                    i = bisect.bisect_right(end_times_y, instance["letStartTime"])
+                    conflict = False
+                    while i < len(start_times_y) and start_times_y[i] < instance["letEndTime"]:
+                        union = max(instance["letEndTime"], end_times_y[i]) - min(
+                            instance["letStartTime"], start_times_y[i]
+                        )
+                        if start_times_y[i] >= 0 and wcet > union:
+                            conflict = True
+                            break
+                        i += 1
+
+                    if conflict:
+                        conflicts[x].add(y)
+                        conflicts[y].add(x)
+                        break
+
+        return conflicts
+
+    # Sweeps the intervals [t1, t2] over the LET end times t2. Instances of one task may
+    # overlap each other, so only instances with disjoint LET windows add to its demand.
+    def check_interval_demand(self, instances, t1, max_length):
+        demand = 0
+        task_demands = [0] * len(self.index.tasks)
+        last_end_times = [None] * len(self.index.tasks)
+
+        critical_ratio = 0
+        critical_interval = None
+
+        for start_time, end_time, task_id, wcet in instances:
+            if end_time - t1 > max_length:
+                break
+            if start_time < t1:
+                continue
+            if last_end_times[task_id] != None and start_time < last_end_times[task_id]:
+                continue
+
+            last_end_times[task_id] = end_time
+            demand += wcet
+            task_demands[task_id] += wcet
+
+            length = end_time - t1
+            if demand > len(self.cores) * length:
+                return f"a demand of {demand} in [{t1}, {end_time}] exceeds the cores"
+
+            if demand / length > critical_ratio:
+                critical_ratio = demand / length
+                critical_interval = (end_time, list(task_demands))
+
+        # Each task runs on one core, so the demands of the tasks are packed into cores
+        if critical_interval != None:
+            end_time, demands = critical_interval
+            num_cores = bin_packing_lower_bound(demands, end_time - t1)
+            if num_cores > len(self.cores):
+                return f"the tasks need at least {num_cores} cores in [{t1}, {end_time}]"
+
+        return None
+
+    # Delays: every instance must be able to read from some source instance, at least from
+    # the negative one, after the smallest latency between the allowed cores
+    def check_dependencies(self):
+        for task_id, task in enumerate(self.index.tasks):
+            first_start_time = min(
+                (
+                    instance["letStartTime"]
+                    for instance in self.index.instances[task_id]
+                    if instance["instance"] != -1
+                ),
+                default=None,
+            )
+            if first_start_time is None:
+                continue
+
+            for depends_on in self.index.depends_on[task_id]:
+                source = self.index.tasks[depends_on]
+                min_delay = min(
+                    (
+                        self.index.core_delays[self.index.core_ids[core1["name"]]][
+                            self.index.core_ids[core2["name"]]
+                        ]
+                        for core1 in self.get_allowed_cores(source)
+                        for core2 in self.get_allowed_cores(task)
+                    ),
+                    default=None,
+                )
+                if min_delay is None:
+                    return f"{source['name']} or {task['name']} has no allowed core"
+
+                if -self.N + source["duration"] + min_delay > first_start_time:
+                    return f"{task['name']} can not read from {source['name']} within largeN"
+
+        return None
+
+    def get_allowed_cores(self, task):
+        if task["requiredCore"] != None:
+            return [core for core in self.cores if core["name"] == task["requiredCore"]]
+
+        if task["requiredDevice"] != None:
+            return [core for core in self.cores if core["device"] == task["requiredDevice"]]
+
+        return self.cores
+
+    # The task instances without a schedule, in the shape of update_schedule
+    def get_unscheduled_instances(self):
+        return [
+            dict(task, value=[x for x in task["value"] if x["instance"] != -1])
+            for task in self.tasks_instances
+        ]
+
+    # Stands in for the result of a solve that was not run
+    def create_result(self, solver):
+        runtime = time.time() - self.start_time
+
+        result = ModelResult(
+            [],
+            None,
+            constants.LpStatusInfeasible,
+            constants.LpSolutionInfeasible,
+            runtime,
+            SolveStats(solver, SCREENED_INFEASIBLE, runtime=runtime),
+        )
+        result.summary = SolutionSummary()
+
+        return result
+
+
+# Largest set of tasks that all conflict with each other, Bron-Kerbosch with pivoting
+def max_clique(neighbours):
+    best = []
+
+    def expand(clique, candidates, excluded):
+        nonlocal best
+        if len(candidates) == 0 and len(excluded) == 0:
+            if len(clique) > len(best):
+                best = clique
+            return
+        if len(clique) + len(candidates) <= len(best):
+            return
+
+        pivot = max(candidates | excluded, key=lambda x: len(neighbours[x] & candidates))
+        for vertex in list(candidates - neighbours[pivot]):
+            expand(
+                clique + [vertex],
+                candidates & neighbours[vertex],
+                excluded & neighbours[vertex],
+            )
+            candidates = candidates - {vertex}
+            excluded = excluded | {vertex}
+
+    expand([], set(range(len(neighbours))), set())
+
+    return best
+
+
+# Martello and Toth's L2 bound on the number of bins of the given capacity
+def bin_packing_lower_bound(sizes, capacity):
+    sizes = [size for size in sizes if size > 0]
+    if len(sizes) == 0:
+        return 0
+
+    bound = -(-sum(sizes) // capacity)
+    for k in {0} | {size for size in sizes if 2 * size <= capacity}:
+        large = [size for size in sizes if size > capacity - k]
+        medium = [size for size in sizes if capacity - k >= size and 2 * size > capacity]
+        small = [size for size in sizes if 2 * size <= capacity and size >= k]
+
+        free_space = len(medium) * capacity - sum(medium)
+        bound = max(
+            bound,
+            len(large) + len(medium) + max(0, -(-(sum(small) - free_space) // capacity)),
+        )
+
+    return bound
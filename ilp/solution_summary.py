@@ -0,0 +1,28 @@
+# Metrics of one solve, read from the scheduler's variables. dependencies holds the
+# chosen (task1, instance1, task2, instance2) pairs with their delays, instance -1 is
+# the negative instance. Missing values are -1, like in the results.
+class SolutionSummary:
+    def __init__(self, cores_used=-1, total_delay=-1, dependencies=None):
+        self.cores_used = cores_used
+        self.total_delay = total_delay
+        self.dependencies = dependencies if dependencies != None else {}
+
+    # Dependencies that read from the negative instance
+    def get_bottom_dependencies(self):
+        return sum(
+            1
+            for task1, instance1, task2, instance2 in self.dependencies
+            if instance1 == -1 or instance2 == -1
+        )
+
+    def get_average_delay(self):
+        delays = [
+            delay
+            for (task1, instance1, task2, instance2), delay in self.dependencies.items()
+            if instance1 != -1 and instance2 != -1 and delay != None
+        ]
+
+        if len(delays) > 0:
+            return sum(delays) / len(delays)
+
+        return -1
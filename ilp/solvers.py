@@ -0,0 +1,238 @@
+import importlib
+
+import numpy as np
+from pulp import GUROBI, HiGHS, PULP_CBC_CMD, constants
+
+from ilp.instrumentation import phase
+
+
+SOLVERS = ["gurobi", "highs", "cbc"]
+
+# Statuses of every backend are reported with the Gurobi status codes, which the
+# results have always used
+LOADED = 1
+OPTIMAL = 2
+INFEASIBLE = 3
+INF_OR_UNBD = 4
+UNBOUNDED = 5
+ITERATION_LIMIT = 7
+NODE_LIMIT = 8
+TIME_LIMIT = 9
+SOLUTION_LIMIT = 10
+INTERRUPTED = 11
+NUMERIC = 12
+USER_OBJ_LIMIT = 15
+MEM_LIMIT = 17
+# Not a Gurobi code, the screening proved the model infeasible and it was not solved
+SCREENED_INFEASIBLE = 100
+# Not a Gurobi code either, the model was over the budget and was not built
+OVER_BUDGET = 101
+# Nor is this, the system was saved but its result was lost, and the continued
+# campaign skipped it
+SKIPPED = 102
+
+# The Python module each backend needs, imported only when the backend is used so that
+# any of them can be run without the others installed
+solver_modules = {"gurobi": "gurobipy", "highs": "highspy"}
+
+# By the names of the HighsModelStatus values
+highs_status = {
+    "kOptimal": OPTIMAL,
+    "kInfeasible": INFEASIBLE,
+    "kUnboundedOrInfeasible": INF_OR_UNBD,
+    "kUnbounded": UNBOUNDED,
+    "kObjectiveBound": USER_OBJ_LIMIT,
+    "kObjectiveTarget": USER_OBJ_LIMIT,
+    "kTimeLimit": TIME_LIMIT,
+    "kIterationLimit": ITERATION_LIMIT,
+    "kInterrupt": INTERRUPTED,
+    "kHighsInterrupt": INTERRUPTED,
+    "kMemoryLimit": MEM_LIMIT,
+    "kSolveError": NUMERIC,
+}
+
+# CBC is only given a time limit, so a run without a solution stopped on it
+cbc_status = {
+    constants.LpSolutionOptimal: OPTIMAL,
+    constants.LpSolutionIntegerFeasible: TIME_LIMIT,
+    constants.LpSolutionNoSolutionFound: TIME_LIMIT,
+    constants.LpSolutionInfeasible: INFEASIBLE,
+    constants.LpSolutionUnbounded: UNBOUNDED,
+}
+
+
+# The statistics of a solve, the same for every backend. Values a backend does not
+# report are None.
+class SolveStats:
+    def __init__(
+        self,
+        solver,
+        status,
+        objective=None,
+        runtime=None,
+        num_constrs=None,
+        num_vars=None,
+        num_int_vars=None,
+        num_bin_vars=None,
+        work=None,
+        mem_used=None,
+        max_mem_used=None,
+        gap=None,
+    ):
+        self.solver = solver
+        self.status = status
+        self.objective = objective
+        self.runtime = runtime
+        self.num_constrs = num_constrs
+        self.num_vars = num_vars
+        self.num_int_vars = num_int_vars
+        self.num_bin_vars = num_bin_vars
+        self.work = work
+        self.mem_used = mem_used
+        self.max_mem_used = max_mem_used
+        self.gap = gap
+
+    def is_optimal(self):
+        return self.status == OPTIMAL
+
+
+# Times the export of the problem to the solver apart from the solve itself
+class PhaseTimedSolver:
+    def buildSolverModel(self, lp):
+        with phase("export"):
+            return super().buildSolverModel(lp)
+
+    def callSolver(self, lp, *args, **kwargs):
+        with phase("solve"):
+            return super().callSolver(lp, *args, **kwargs)
+
+
+class TimedGUROBI(PhaseTimedSolver, GUROBI):
+    pass
+
+
+# CBC is run from the command line, writing its input is part of the solve
+class TimedCBC(PULP_CBC_CMD):
+    def actualSolve(self, lp, *args, **kwargs):
+        with phase("solve"):
+            return super().actualSolve(lp, *args, **kwargs)
+
+
+# PuLP's HiGHS interface has no MIP start, pass the initial values before the run
+class WarmStartHiGHS(PhaseTimedSolver, HiGHS):
+    def __init__(self, warmStart=False, **kwargs):
+        super().__init__(**kwargs)
+        self.warmStart = warmStart
+
+    def callSolver(self, lp):
+        if self.warmStart:
+            start = [
+                (variable.index, variable.varValue)
+                for variable in lp.variables()
+                if variable.varValue is not None
+            ]
+            if len(start) > 0:
+                indices, values = zip(*start)
+                lp.solverModel.setSolution(
+                    len(start),
+                    np.array(indices, dtype=np.int32),
+                    np.array(values, dtype=float),
+                )
+
+        super().callSolver(lp)
+
+
+def check_solver(solver):
+    if solver not in SOLVERS:
+        raise ValueError(f"Unknown solver: {solver}")
+
+    if solver in solver_modules:
+        import_solver_module(solver)
+
+
+def import_solver_module(solver):
+    try:
+        return importlib.import_module(solver_modules[solver])
+    except ImportError:
+        raise ImportError(
+            f"The {solver} solver needs {solver_modules[solver]}, which is not installed"
+        ) from None
+
+
+# threads=None leaves the number of threads to the solver
+def create_pulp_solver(solver, time_limit, warm_start=False, threads=None):
+    check_solver(solver)
+
+    if solver == "gurobi":
+        if threads is None:
+            return TimedGUROBI(timeLimit=time_limit, warmStart=warm_start)
+        return TimedGUROBI(timeLimit=time_limit, warmStart=warm_start, Threads=threads)
+    if solver == "highs":
+        return WarmStartHiGHS(timeLimit=time_limit, warmStart=warm_start, threads=threads)
+
+    return TimedCBC(timeLimit=time_limit, warmStart=warm_start, threads=threads)
+
+
+def get_pulp_stats(solver, prob):
+    if solver == "gurobi":
+        return get_gurobi_stats(prob.solverModel)
+
+    # Binaries are passed as integers bounded by 0 and 1, as PuLP does for Gurobi
+    num_int_vars = sum(
+        variable.cat == constants.LpInteger for variable in prob.variables()
+    )
+
+    if solver == "highs":
+        return get_highs_stats(prob.solverModel, num_int_vars)
+
+    status = cbc_status.get(prob.sol_status, LOADED)
+    return SolveStats(
+        solver,
+        status,
+        objective=prob.objective.value(),
+        runtime=prob.solutionTime,
+        num_constrs=prob.numConstraints(),
+        num_vars=prob.numVariables(),
+        num_int_vars=num_int_vars,
+        num_bin_vars=0,
+        gap=0.0 if status == OPTIMAL else None,
+    )
+
+
+def get_gurobi_stats(model):
+    has_solution = model.SolCount > 0
+
+    return SolveStats(
+        "gurobi",
+        model.Status,
+        objective=model.ObjVal if has_solution else None,
+        runtime=model.Runtime,
+        num_constrs=model.NumConstrs,
+        num_vars=model.NumVars,
+        num_int_vars=model.NumIntVars,
+        num_bin_vars=model.NumBinVars,
+        work=model.Work,
+        mem_used=model.MemUsed,
+        max_mem_used=model.MaxMemUsed,
+        gap=model.MIPGap if has_solution and model.IsMIP else None,
+    )
+
+
+def get_highs_stats(highs, num_int_vars):
+    highspy = import_solver_module("highs")
+    info = highs.getInfo()
+    has_solution = (
+        info.primal_solution_status == highspy.SolutionStatus.kSolutionStatusFeasible
+    )
+
+    return SolveStats(
+        "highs",
+        highs_status.get(highs.getModelStatus().name, LOADED),
+        objective=info.objective_function_value if has_solution else None,
+        runtime=highs.getRunTime(),
+        num_constrs=highs.getNumRow(),
+        num_vars=highs.getNumCol(),
+        num_int_vars=num_int_vars,
+        num_bin_vars=0,
+        gap=info.mip_gap if has_solution else None,
+    )
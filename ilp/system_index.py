@@ -0,0 +1,117 @@
+from random_generators.physical_system import PhysicalSystem
+
+
+class SystemIndex:
+    def __init__(self, system, N=None, tasks_instances=None):
+        self.cores = system["CoreStore"]
+        self.devices = system["DeviceStore"]
+
+        # Integer ids for cores and devices
+        self.core_ids = {core["name"]: i for i, core in enumerate(self.cores)}
+        self.device_ids = {device["name"]: i for i, device in enumerate(self.devices)}
+        self.core_device = [self.device_ids[core["device"]] for core in self.cores]
+
+        self.protocol_delays = [
+            {delay["protocol"]: delay for delay in device["delays"]}
+            for device in self.devices
+        ]
+
+        # Worst-case delay between each pair of devices, and each pair of cores
+        physical_system = PhysicalSystem.from_json(system)
+        self.device_delays = physical_system.get_device_delays(N).tolist()
+        self.core_delays = physical_system.get_core_delays(N).tolist()
+
+        # Integer ids for tasks
+        self.tasks = self.format_tasks(
+            system["EntityStore"], system.get("DependencyStore", None)
+        )
+        self.task_ids = {task["name"]: i for i, task in enumerate(self.tasks)}
+        self.depends_on = [
+            [self.task_ids[name] for name in task["dependsOn"] if name in self.task_ids]
+            for task in self.tasks
+        ]
+
+        self.instances = None
+        self.let_start_times = None
+        self.let_end_times = None
+        if tasks_instances is not None:
+            self.set_instances(tasks_instances)
+
+    def format_tasks(self, tasks, dependencies):
+        source_tasks = {task["name"]: [] for task in tasks}
+
+        if dependencies is not None:
+            for dependency in filter(
+                lambda x: x["source"]["task"] != "__system"
+                and x["destination"]["task"] != "__system",
+                dependencies,
+            ):
+                destination = dependency["destination"]["task"]
+                if destination in source_tasks:
+                    source_tasks[destination].append(dependency["source"]["task"])
+
+        formatted_tasks = []
+        for task in tasks:
+            formatted_tasks.append(
+                {
+                    "name": task["name"],
+                    "offset": task["activationOffset"],
+                    "duration": task["duration"],
+                    "period": task["period"],
+                    "wcet": task["wcet"],
+                    "requiredCore": task.get("core", None),
+                    "requiredDevice": task.get("device", None),
+                    "dependsOn": source_tasks[task["name"]],
+                }
+            )
+
+        return formatted_tasks
+
+    # Per-task instance lists and arrays of their LET windows, in task id order
+    def set_instances(self, tasks_instances):
+        instances = {task["name"]: task["value"] for task in tasks_instances}
+
+        self.instances = [instances.get(task["name"], []) for task in self.tasks]
+        self.let_start_times = [
+            [instance["letStartTime"] for instance in task_instances]
+            for task_instances in self.instances
+        ]
+        self.let_end_times = [
+            [instance["letEndTime"] for instance in task_instances]
+            for task_instances in self.instances
+        ]
+
+    def get_task(self, task_name):
+        return self.tasks[self.task_ids[task_name]]
+
+    def get_instances(self, task_name):
+        task_id = self.task_ids.get(task_name, None)
+        if task_id is None or self.instances is None:
+            return []
+
+        return self.instances[task_id]
+
+    def get_num_instances(self):
+        return sum(len(task_instances) for task_instances in self.instances)
+
+    def get_device_for_core(self, core_name):
+        core_id = self.core_ids.get(core_name, None)
+        if core_id is None:
+            return None
+
+        return self.devices[self.core_device[core_id]]["name"]
+
+    def get_device_delay(self, device_name, protocol):
+        device_id = self.device_ids.get(device_name, None)
+        if device_id is None:
+            return None
+
+        return self.protocol_delays[device_id].get(protocol, None)
+
+    def get_core_delay(self, source_core, dest_core):
+        return self.core_delays[self.core_ids[source_core]][self.core_ids[dest_core]]
+
+    def get_device_pair_delay(self, source_device, dest_device):
+        return self.device_delays[self.device_ids[source_device]][
+            self.device_ids[dest_device]
+        ]
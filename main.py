@@ -2,26 +2,38 @@ import os
 import json
 import argparse
 from utilities import Utilities
-from ilp.multicore import MultiCoreScheduler
-from random_generators.task_set_generator import TaskSetGenerator
-from random_generators.system_config_generator import SystemConfigGenerator
-from random_generators.dependency_set_generator import DependencySetGenerator
-import copy
+from ilp.instrumentation import Recorder, TraceWriter, recording
+from ilp.model_size import ModelBudget, SolveTimeModel
+from ilp.solvers import SOLVERS
+from benchmark.corpus import (
+    DEPENDENCY_TOPOLOGIES,
+    attempt_seed,
+    generate_attempt,
+    generate_physical_system_arrays,
+    generate_physical_systems,
+    new_campaign_seed,
+)
+from benchmark.replay import replay_attempt
+from benchmark.results import RESULTS_FORMATS, create_results_sink
+from benchmark.snapshot import SNAPSHOT_FORMATS
+from benchmark.campaign import (
+    CampaignState,
+    get_recorded_counter,
+    handle_unrecorded_systems,
+    is_recorded_successful,
+    read_recorded_results,
+)
+from benchmark.runner import ParallelRunner, solve_attempt
 
 
 def main():
-    utilities = Utilities()
     parser = argparse.ArgumentParser()
-    task_generator = TaskSetGenerator()
-    ilp_multicore = MultiCoreScheduler()
-    sys_config_generator = SystemConfigGenerator()
-    dependency_generator = DependencySetGenerator()
 
-    # CPU Utilisation
+    # Total CPU utilisation of each task set, drawn with UUniFast when given
     parser.add_argument("-u", type=float)
     # Number of tasks to generate
     parser.add_argument("-t", type=int)
-    # Number of dependencies to generate
+    # Number of dependencies to generate, 2 * (tasks - 1) by default
     parser.add_argument("-d", type=int)
     # Maximum initial offset value
     parser.add_argument("-o", type=float)
@@ -40,6 +52,79 @@ def main():
     parser.add_argument("-p", type=float)
     # Maximum WCDT for network delay
     parser.add_argument("-n", type=float)
+    # Generate this many physical systems with the array generator instead of using the
+    # files in physical_system, they are exported to system_config
+    parser.add_argument("--physical-systems", type=int)
+    # Largest core speedup of the generated physical systems
+    parser.add_argument("--max-speedup", type=float, default=1)
+    # Probability that a generated device has a link to another device
+    parser.add_argument("--link-probability", type=float, default=1.0)
+
+    # Only create dependency variables for the task pairs that have a dependency
+    parser.add_argument("--sparse-deps", action="store_true")
+    # Only add non-overlap constraints for instances with overlapping LET windows
+    parser.add_argument("--prune-overlaps", action="store_true")
+    # Core formulation, "compact" scales linearly in the number of cores
+    parser.add_argument("--formulation", type=str, default="full", choices=["full", "compact"])
+    # Big-M values, "tight" derives them per constraint from the LET windows
+    parser.add_argument("--big-m", type=str, default="global", choices=["global", "tight"])
+    # Model the transient prefix and one hyperperiod, whose schedule repeats, instead of
+    # the whole makespan
+    parser.add_argument("--periodic", action="store_true")
+    # Model builder, "matrix" assembles sparse arrays instead of PuLP expressions
+    parser.add_argument("--builder", type=str, default="pulp", choices=["pulp", "matrix"])
+    # Shape of the dependency graph, "pairs" draws any pairs of tasks like the first
+    # campaigns and the others are drawn without rejection
+    parser.add_argument(
+        "--dependency-topology", type=str, default="pairs", choices=DEPENDENCY_TOPOLOGIES
+    )
+    # Start each solve from the schedule of the previous one
+    parser.add_argument("--warm-start", action="store_true")
+    # MIP solver, the matrix builder supports gurobi and highs
+    parser.add_argument("--solver", type=str, default="gurobi", choices=SOLVERS)
+    # Number of attempts to solve in parallel, each in its own process
+    parser.add_argument("--jobs", type=int, default=1)
+    # Solver threads per attempt, shared out between the jobs by default
+    parser.add_argument("--threads", type=int)
+    # Campaign seed, every attempt is generated from a seed derived from it
+    parser.add_argument("--seed", type=int)
+    # Regenerate and solve one saved result again, given as physical system and index
+    parser.add_argument("--replay", nargs=2, metavar=("SYSTEM", "INDEX"))
+    # Start a new campaign instead of continuing the one in campaign_state.json
+    parser.add_argument("--new-campaign", action="store_true")
+    # Saved systems without results are solved again when continuing, or recorded as
+    # skipped and their attempts passed over
+    parser.add_argument(
+        "--unrecorded", type=str, default="resolve", choices=["resolve", "skip"]
+    )
+    # Solve every attempt, also the ones that the screening proves infeasible
+    parser.add_argument("--no-screening", action="store_true")
+    # Also schedule every attempt with the heuristic, whose schedules are the warm starts
+    parser.add_argument("--heuristic", action="store_true")
+    # Solve with a logic-based Benders decomposition: a core assignment master problem
+    # and a sequencing problem per core
+    parser.add_argument("--benders", action="store_true")
+    # Number of threads that sequence the cores of the decomposition at the same time
+    parser.add_argument("--benders-workers", type=int, default=1)
+    # Skip the attempts whose model would have more constraints than this
+    parser.add_argument("--max-constraints", type=int)
+    # Skip the attempts whose solves are predicted to take longer than this many seconds,
+    # fitted on the results that are already saved
+    parser.add_argument("--max-solve-time", type=float)
+    # What to do with an attempt over the budget, "benders" solves it with the
+    # decomposition instead of the full model
+    parser.add_argument("--over-budget", type=str, default="skip", choices=["skip", "benders"])
+    # Format of the results, every physical system keeps its own CSV file by default
+    parser.add_argument("--results", type=str, default="csv", choices=RESULTS_FORMATS)
+    # Number of results to keep before writing them out
+    parser.add_argument("--flush-rows", type=int, default=100)
+    # Format of the saved systems, "compact" and "binary" store the physical system once
+    # and only the core, start and end of each instance per solution
+    parser.add_argument("--snapshots", type=str, default="json", choices=SNAPSHOT_FORMATS)
+    # Do not time the phases of each attempt, their columns in the results stay empty
+    parser.add_argument("--no-instrumentation", action="store_true")
+    # Also write the phases of every attempt to this file as Chrome trace events
+    parser.add_argument("--trace", type=str)
 
     args = parser.parse_args()
     del parser
@@ -49,6 +134,21 @@ def main():
     if not os.path.exists("results"):
         os.makedirs("results")
 
+    results_sink = create_results_sink(args.results, flush_rows=args.flush_rows)
+    trace = None
+    if args.trace != None:
+        trace = TraceWriter(args.trace)
+    try:
+        run_campaign(args, results_sink, trace)
+    finally:
+        results_sink.close()
+        if trace != None:
+            trace.close()
+
+
+def run_campaign(args, results_sink, trace=None):
+    utilities = Utilities(results_sink, args.snapshots)
+
     task_set = None
     dependencies = None
 
@@ -56,6 +156,8 @@ def main():
     if args.t == None:
         args.t = 1
 
+    # args.u is overwritten with the utilisation of each generated task set
+    target_utilisation = args.u
     if args.u == None:
         args.u = 0
 
@@ -90,11 +192,41 @@ def main():
     else:
         args.n = utilities.MsToNs(args.n)
 
+    # Continue the saved campaign, if there is one
+    state = CampaignState()
+    resumed = not args.new_campaign and state.load()
+    if resumed:
+        if args.seed != None and args.seed != state.seed:
+            raise ValueError(
+                f"The saved campaign has the seed {state.seed}, use --new-campaign"
+            )
+        args.seed = state.seed
+    elif args.seed == None:
+        args.seed = new_campaign_seed()
+
     physical_sys1 = "physical_system/physical_system-01.json"
     physical_sys2 = "physical_system/physical_system-02.json"
-    if not os.path.exists(physical_sys1) and not os.path.exists(physical_sys2):
-        sys_configs = sys_config_generator.generate_sys_config(
-            args.c, args.dev, args.p, args.n
+    if args.physical_systems != None:
+        sys_configs = []
+        for i, physical_system in enumerate(
+            generate_physical_system_arrays(
+                args.seed,
+                args.physical_systems,
+                args.c,
+                args.dev,
+                args.p,
+                args.n,
+                args.max_speedup,
+                args.link_probability,
+            )
+        ):
+            physical_system.save(
+                os.path.join("system_config", f"physical_system-{i + 1:02d}.json")
+            )
+            sys_configs.append(physical_system.to_json())
+    elif not os.path.exists(physical_sys1) and not os.path.exists(physical_sys2):
+        sys_configs = generate_physical_systems(
+            args.seed, 2, args.c, args.dev, args.p, args.n
         )
     else:
         sys_configs = utilities.extract_physical_systems(physical_sys1, physical_sys2)
@@ -105,72 +237,208 @@ def main():
     #     system, "e2e"
     # )
 
+    model_options = {
+        "sparse_dependencies": args.sparse_deps,
+        "prune_overlaps": args.prune_overlaps,
+        "formulation": args.formulation,
+        "big_m": args.big_m,
+        "periodic": args.periodic,
+        "builder": args.builder,
+        "solver": args.solver,
+        "threads": args.threads,
+        "benders_workers": args.benders_workers,
+    }
+
+    budget = None
+    if args.max_constraints != None or args.max_solve_time != None:
+        solve_time_model = None
+        if args.max_solve_time != None:
+            solve_time_model = SolveTimeModel.from_rows(
+                row
+                for config in range(len(sys_configs))
+                for row in results_sink.read_rows(config + 1)
+            )
+        budget = ModelBudget(args.max_constraints, args.max_solve_time, solve_time_model)
+
+    if args.replay != None:
+        replay_attempt(
+            results_sink,
+            sys_configs,
+            int(args.replay[0]),
+            args.replay[1],
+            model_options,
+            args.o,
+            args.e,
+            args.du,
+            warm_start=args.warm_start,
+            screening=not args.no_screening,
+            heuristic=args.heuristic,
+            decomposition=args.benders,
+            budget=budget,
+            over_budget=args.over_budget,
+            utilisation=target_utilisation,
+            num_dependencies=args.d,
+            dependency_topology=args.dependency_topology,
+        )
+        return
+
+    print("Campaign seed:", args.seed)
+
+    # The values that the corpus and the results depend on
+    parameters = dict(
+        model_options,
+        warm_start=args.warm_start,
+        screening=not args.no_screening,
+        heuristic=args.heuristic,
+        decomposition=args.benders,
+        max_constraints=args.max_constraints,
+        max_solve_time=args.max_solve_time,
+        over_budget=args.over_budget,
+        utilisation=target_utilisation,
+        num_dependencies=args.d,
+        dependency_topology=args.dependency_topology,
+        max_init_offset=args.o,
+        max_wcet=args.e,
+        max_duration=args.du,
+        num_cores=args.c,
+        num_devices=args.dev,
+        max_protocol_delay=args.p,
+        max_network_delay=args.n,
+        physical_systems=args.physical_systems,
+        max_speedup=args.max_speedup,
+        link_probability=args.link_probability,
+    )
+    del parameters["threads"]
+    del parameters["benders_workers"]
+
+    if resumed:
+        state.check_parameters(parameters)
+        args.t = state.get_resume_num_tasks()
+        print("Continuing the campaign from", args.t, "tasks")
+        handle_unrecorded_systems(results_sink, len(sys_configs), args.unrecorded)
+    else:
+        state.start(args.seed, parameters, args.t)
+
+    # The state is saved with the results, so it never counts results that were lost
+    results_sink.add_flush_listener(state.save)
+
+    if args.jobs > 1:
+        runner = ParallelRunner(
+            sys_configs,
+            model_options,
+            args.jobs,
+            args.o,
+            args.e,
+            args.du,
+            args.seed,
+            warm_start=args.warm_start,
+            screening=not args.no_screening,
+            heuristic=args.heuristic,
+            decomposition=args.benders,
+            budget=budget,
+            over_budget=args.over_budget,
+            utilisation=target_utilisation,
+            num_dependencies=args.d,
+            dependency_topology=args.dependency_topology,
+            instrumentation=not args.no_instrumentation,
+            trace=trace,
+            state=state,
+            results_sink=results_sink,
+            snapshot_format=args.snapshots,
+        )
+        runner.run(args.t)
+        return
+
+    recorded = [
+        read_recorded_results(results_sink, i + 1) for i in range(len(sys_configs))
+    ]
+
     while True:
         # Run the ILP multiple times to see if there are any outliers
         print("Benchmarking for", args.t, "tasks")
+        state.open_task_count(args.t, len(sys_configs))
+        results_sink.flush()
         for i in range(len(sys_configs)):
+            stream = state.get_stream(args.t, i + 1)
+            if stream["finished"]:
+                continue
+
             print("-> Benchmarking for physical system", i)
-            solvable_count = 0
-            run = 1
+            solvable_count = stream["solvable_count"]
+            run = stream["next_run"]
+            attempt = stream["next_attempt"]
             # it needs to be 10 solvable
-            counter = 1
+            counter = stream["counter"]
             while solvable_count < 10:
                 print("   -> Attempt #" + str(run))
-                print("      -> Generating tasks")
-                task_set = task_generator.generate_with_task_limit(
-                    args.t, args.o, args.e, args.du
-                )
+                print("      -> Generating tasks and dependencies")
+                seed = attempt_seed(args.seed, i + 1, args.t, attempt)
+                attempt += 1
+                recorder = Recorder(not args.no_instrumentation, trace != None)
+                with recorder.phase("generate"):
+                    generated = generate_attempt(
+                        sys_configs[i],
+                        args.t,
+                        seed,
+                        args.o,
+                        args.e,
+                        args.du,
+                        target_utilisation,
+                        args.d,
+                        args.dependency_topology,
+                    )
 
                 # If the utilisation is gt number of cores, break the loop
-                args.u = utilities.calculate_utilisation(task_set)
-                if args.u > len(sys_configs[i]["CoreStore"]):
+                if generated == None:
                     print("      -> Utilisation too high! Skipping")
                     continue
 
-                print("      -> Generating dependencies")
-                # args.d = args.t * (args.t - 1) / 2
-                args.d = 2 * (args.t-1)
-                dependencies = dependency_generator.generate_dependencies(
-                    args.d, task_set
-                )
-                system = utilities.prepare_system(
-                    sys_configs[i], task_set, dependencies
-                )
-
-                print("      -> Scheduling for E2E")
-                min_e2e_tasks_instances, min_e2e_result = (
-                    ilp_multicore.multicore_core_scheduler(system, "e2e")
-                )
-
-                print("      -> Scheduling for MC")
-                # For MC we first want to do the allocation
-                min_core_tasks_instances, min_core_result = (
-                    ilp_multicore.multicore_core_scheduler(system, "c")
-                )
+                system, args.u = generated
+
+                # Written just before the campaign stopped
+                if str(seed) in recorded[i]:
+                    row = recorded[i][str(seed)]
+                    print("      -> Already recorded as", row["index"])
+                    counter = get_recorded_counter(row)
+                    if is_recorded_successful(row):
+                        solvable_count += 1
+
+                    run += 1
+                    state.update_stream(
+                        args.t,
+                        i + 1,
+                        solvable_count=solvable_count,
+                        next_attempt=attempt,
+                        next_run=run,
+                        counter=counter,
+                        finished=solvable_count >= 10,
+                    )
+                    continue
 
-                # And if it was successful, calculate the delays
-                min_core_result_e2e = min_core_result
-                if min_core_result.solverModel.Status == 2:
-                    # Then create a copy of this with the cores fixed
-                    system_copy = copy.deepcopy(system)
-                    for task in system_copy["EntityStore"]:
-                        for solved_task in min_core_tasks_instances:
-                            if solved_task["name"] == task["name"]:
-                                task["core"] = solved_task["value"][0]["currentCore"]["name"]
-                                break
-
-                    system_copy["EntityInstancesStore"] = min_core_tasks_instances
-
-                    # And then run for E2E to get delays
-                    print("      -> Calculating MC delays")
-                    _, min_core_result_e2e = (
-                        ilp_multicore.multicore_core_scheduler(system_copy, "e2e", True)
+                with recording(recorder):
+                    (
+                        min_e2e_tasks_instances,
+                        min_e2e_result,
+                        min_core_tasks_instances,
+                        min_core_result,
+                        min_core_result_e2e,
+                        heuristic_result,
+                    ) = solve_attempt(
+                        system,
+                        model_options,
+                        args.warm_start,
+                        verbose=True,
+                        screening=not args.no_screening,
+                        heuristic=args.heuristic,
+                        decomposition=args.benders,
+                        budget=budget,
+                        over_budget=args.over_budget,
                     )
 
                 print(
-                    "      -> GUROBI solution statuses:",
-                    min_e2e_result.solverModel.Status,
-                    min_core_result.solverModel.Status,
+                    "      -> Solver solution statuses:",
+                    min_e2e_result.stats.status,
+                    min_core_result.stats.status,
                 )
                 # print(
                 #     "      -> PuLP solution statuses:",
@@ -180,21 +448,23 @@ def main():
 
                 successful = False
                 # if min_core_result.sol_status == 1 and min_e2e_result.sol_status == 1:
-                if min_core_result.solverModel.Status == 2 and min_e2e_result.solverModel.Status == 2:
+                if min_core_result.stats.is_optimal() and min_e2e_result.stats.is_optimal():
                     successful = True
                     solvable_count += 1
                     print("      -> Solvable Count:", solvable_count)
 
                 print("      -> Saving system")
-                counter, min_e2e_system, min_core_system = utilities.save_system(
-                    system,
-                    min_e2e_tasks_instances,
-                    min_core_tasks_instances,
-                    run,
-                    i + 1,
-                    counter,
-                    successful
-                )
+                with recorder.phase("save_system"):
+                    counter, min_e2e_system, min_core_system = utilities.save_system(
+                        system,
+                        min_e2e_tasks_instances,
+                        min_core_tasks_instances,
+                        run,
+                        i + 1,
+                        counter,
+                        successful,
+                        seed,
+                    )
 
                 print("      -> Saving results")
                 utilities.save_result(
@@ -206,9 +476,28 @@ def main():
                     args.u,
                     run,
                     i + 1,
+                    seed,
+                    heuristic_result,
+                    recorder,
                 )
 
+                if trace != None:
+                    trace.write(
+                        recorder,
+                        f"attempt {counter}-{run}",
+                        {"config": i + 1, "num_tasks": args.t, "seed": seed},
+                    )
+
                 run += 1
+                state.update_stream(
+                    args.t,
+                    i + 1,
+                    solvable_count=solvable_count,
+                    next_attempt=attempt,
+                    next_run=run,
+                    counter=counter,
+                    finished=solvable_count >= 10,
+                )
 
         args.t += 1
 
@@ -1,20 +1,31 @@
 import random
 
+import numpy as np
+
+# Shapes of the dependency graphs generate_topology draws from. "random" allows any
+# pair of tasks, so cycles, the others are acyclic.
+TOPOLOGIES = ["random", "dag", "chains", "fork-join", "layered"]
+
 
 class DependencySetGenerator:
-    def __init__(self):
-        pass
+    def __init__(self, rng=random):
+        self.rng = rng
 
     def generate_dependencies(self, num_dependencies, task_set):
+        if num_dependencies > self.get_max_dependencies("random", len(task_set)):
+            raise ValueError(
+                f"{len(task_set)} tasks have fewer than {num_dependencies} dependencies"
+            )
+
         dependencies = []
         seen = set()
 
         while len(dependencies) < num_dependencies:
-            source_index = random.randint(0, len(task_set) - 1)
+            source_index = self.rng.randint(0, len(task_set) - 1)
             dest_index = source_index
 
             while source_index == dest_index:
-                dest_index = random.randint(0, len(task_set) - 1)
+                dest_index = self.rng.randint(0, len(task_set) - 1)
 
             key = (source_index, dest_index)
 
@@ -26,6 +37,97 @@ class DependencySetGenerator:
 
         return dependencies
 
+    # Draws num_dependencies different dependencies of the topology without rejection.
+    # The tasks take their places in the topology in a random order.
+    def generate_topology(self, num_dependencies, task_set, topology, num_layers=3):
+        num_tasks = len(task_set)
+        max_dependencies = self.get_max_dependencies(topology, num_tasks, num_layers)
+        if num_dependencies > max_dependencies:
+            raise ValueError(
+                f"{num_tasks} tasks have only {max_dependencies} dependencies in the "
+                f"{topology} topology, not {num_dependencies}"
+            )
+
+        generator = np.random.default_rng(self.rng.getrandbits(64))
+        order = generator.permutation(num_tasks)
+
+        if topology == "random":
+            # Pair k is (k // (t - 1), k % (t - 1)), skipping the diagonal
+            pairs = generator.choice(max_dependencies, num_dependencies, replace=False)
+            sources = pairs // max(1, num_tasks - 1)
+            destinations = pairs % max(1, num_tasks - 1)
+            destinations += destinations >= sources
+        elif topology == "dag":
+            # Pair k is (i, j) with i < j in the order, numbered by j first
+            pairs = generator.choice(max_dependencies, num_dependencies, replace=False)
+            destinations = np.floor((1 + np.sqrt(1 + 8 * pairs)) / 2).astype(np.int64)
+            destinations -= destinations * (destinations - 1) // 2 > pairs
+            destinations += (destinations + 1) * destinations // 2 <= pairs
+            sources = order[pairs - destinations * (destinations - 1) // 2]
+            destinations = order[destinations]
+        elif topology == "chains":
+            # t - d chains cover all tasks with exactly d links
+            links = np.sort(
+                generator.choice(max_dependencies, num_dependencies, replace=False)
+            )
+            sources = order[links]
+            destinations = order[links + 1]
+        else:
+            sources, destinations = self.get_topology_edges(topology, order, num_layers)
+            edges = generator.choice(len(sources), num_dependencies, replace=False)
+            sources = sources[edges]
+            destinations = destinations[edges]
+
+        return [
+            self.format_dependency(int(source_index), int(dest_index), task_set)
+            for source_index, dest_index in zip(sources, destinations)
+        ]
+
+    def get_max_dependencies(self, topology, num_tasks, num_layers=3):
+        if topology == "random":
+            return num_tasks * (num_tasks - 1)
+        if topology == "dag":
+            return num_tasks * (num_tasks - 1) // 2
+        if topology == "chains":
+            return max(0, num_tasks - 1)
+        if topology == "fork-join":
+            return 2 * (num_tasks - 2) if num_tasks > 2 else max(0, num_tasks - 1)
+        if topology == "layered":
+            sizes = [len(layer) for layer in self.get_layers(range(num_tasks), num_layers)]
+            return sum(sizes[k] * sizes[k + 1] for k in range(len(sizes) - 1))
+
+        raise ValueError(f"Unknown dependency topology: {topology}")
+
+    # All (source, destination) task indices of a fork-join or layered topology
+    def get_topology_edges(self, topology, order, num_layers):
+        if topology == "fork-join":
+            # The first task forks to every task in between, which join in the last task
+            if len(order) < 3:
+                return order[:-1], order[1:]
+
+            middle = order[1:-1]
+            return (
+                np.concatenate([np.full(len(middle), order[0]), middle]),
+                np.concatenate([middle, np.full(len(middle), order[-1])]),
+            )
+
+        # Cause-effect chains, every task of a layer can read from the layer before it
+        layers = self.get_layers(order, num_layers)
+        sources = []
+        destinations = []
+        for layer1, layer2 in zip(layers, layers[1:]):
+            sources.append(np.repeat(layer1, len(layer2)))
+            destinations.append(np.tile(layer2, len(layer1)))
+
+        if len(sources) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+        return np.concatenate(sources), np.concatenate(destinations)
+
+    def get_layers(self, order, num_layers):
+        order = np.asarray(order, dtype=np.int64)
+        return np.array_split(order, max(1, min(num_layers, len(order))))
+
     def format_dependency(self, source_index, dest_index, task_set):
         return {
             "name": f"t{source_index + 1}-t{dest_index + 1}",
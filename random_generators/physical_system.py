@@ -0,0 +1,152 @@
+import json
+
+import numpy as np
+
+
+# A physical system as arrays: the device and speedup of each core, the TCP delay of
+# each device and a device x device matrix of network delays, -1 where there is no link
+class PhysicalSystem:
+    def __init__(
+        self,
+        core_devices,
+        core_speedups,
+        device_speedups,
+        protocol_delays,
+        network_delays,
+        core_names=None,
+        device_names=None,
+    ):
+        self.core_devices = np.asarray(core_devices, dtype=np.int64)
+        self.core_speedups = np.asarray(core_speedups, dtype=np.float64)
+        self.device_speedups = np.asarray(device_speedups, dtype=np.float64)
+        self.protocol_delays = np.asarray(protocol_delays, dtype=np.int64)
+        self.network_delays = np.asarray(network_delays, dtype=np.int64)
+
+        if core_names is None:
+            core_names = [f"c{i + 1}" for i in range(len(self.core_devices))]
+        if device_names is None:
+            device_names = [f"d{i + 1}" for i in range(len(self.protocol_delays))]
+        self.core_names = list(core_names)
+        self.device_names = list(device_names)
+
+    @classmethod
+    def from_json(cls, system):
+        device_ids = {device["name"]: i for i, device in enumerate(system["DeviceStore"])}
+
+        protocol_delays = np.full(len(device_ids), -1, dtype=np.int64)
+        for i, device in enumerate(system["DeviceStore"]):
+            for delay in device["delays"]:
+                if delay["protocol"] == "tcp":
+                    protocol_delays[i] = delay["wcdt"]
+
+        network_delays = np.full((len(device_ids), len(device_ids)), -1, dtype=np.int64)
+        for link in system["NetworkDelayStore"]:
+            network_delays[device_ids[link["source"]], device_ids[link["dest"]]] = link[
+                "wcdt"
+            ]
+
+        return cls(
+            [device_ids[core["device"]] for core in system["CoreStore"]],
+            [core.get("speedup", 1) for core in system["CoreStore"]],
+            # The devices have been saved with a misspelt key
+            [
+                device.get("speedup", device.get("sppedup", 1))
+                for device in system["DeviceStore"]
+            ],
+            protocol_delays,
+            network_delays,
+            [core["name"] for core in system["CoreStore"]],
+            [device["name"] for device in system["DeviceStore"]],
+        )
+
+    @classmethod
+    def load(cls, file_path):
+        with open(file_path) as infile:
+            return cls.from_json(json.load(infile))
+
+    def save(self, file_path):
+        with open(file_path, "w") as outfile:
+            json.dump(self.to_json(), outfile)
+
+    def get_num_cores(self):
+        return len(self.core_devices)
+
+    def get_num_devices(self):
+        return len(self.protocol_delays)
+
+    # Worst-case delay between each pair of devices, the ones SystemIndex uses: 0 on the
+    # same device and N between devices without a link
+    def get_device_delays(self, N):
+        delays = (
+            self.network_delays
+            + self.protocol_delays[:, np.newaxis]
+            + self.protocol_delays[np.newaxis, :]
+        )
+        delays = np.where(self.network_delays >= 0, delays, N)
+        np.fill_diagonal(delays, 0)
+
+        return delays
+
+    def get_core_delays(self, N):
+        return self.get_device_delays(N)[np.ix_(self.core_devices, self.core_devices)]
+
+    # The CoreStore, DeviceStore and NetworkDelayStore of the LetSynchronise format
+    def to_json(self):
+        devices = []
+        for i in range(self.get_num_devices()):
+            delays = []
+            if self.protocol_delays[i] >= 0:
+                wcdt = int(self.protocol_delays[i])
+                delays.append(
+                    {
+                        "protocol": "tcp",
+                        "acdt": wcdt,
+                        "bcdt": wcdt,
+                        "wcdt": wcdt,
+                        "distribution": "Normal",
+                    }
+                )
+
+            devices.append(
+                {
+                    "name": self.device_names[i],
+                    "sppedup": self.get_speedup(self.device_speedups[i]),
+                    "delays": delays,
+                }
+            )
+
+        cores = [
+            {
+                "name": self.core_names[i],
+                "speedup": self.get_speedup(self.core_speedups[i]),
+                "device": self.device_names[self.core_devices[i]],
+            }
+            for i in range(self.get_num_cores())
+        ]
+
+        network_delays = []
+        for source, dest in zip(*np.nonzero(self.network_delays >= 0)):
+            wcdt = int(self.network_delays[source, dest])
+            source = self.device_names[source]
+            dest = self.device_names[dest]
+            network_delays.append(
+                {
+                    "name": f"{source}-to-{dest}",
+                    "source": source,
+                    "dest": dest,
+                    "acdt": wcdt,
+                    "bcdt": wcdt,
+                    "wcdt": wcdt,
+                    "distribution": "Normal",
+                }
+            )
+
+        return {
+            "CoreStore": cores,
+            "DeviceStore": devices,
+            "NetworkDelayStore": network_delays,
+        }
+
+    @staticmethod
+    def get_speedup(speedup):
+        return int(speedup) if speedup == int(speedup) else float(speedup)
@@ -1,9 +1,13 @@
 import random
 
+import numpy as np
+
+from random_generators.physical_system import PhysicalSystem
+
 
 class SystemConfigGenerator:
-    def __init__(self):
-        pass
+    def __init__(self, rng=random):
+        self.rng = rng
 
     def generate_sys_config(self, num_cores, num_devs, max_prot, max_net):
         cores = []
@@ -30,8 +34,50 @@ class SystemConfigGenerator:
         }
 
 
+    # Draws a physical system as arrays, for topologies with many devices and cores. Each
+    # device gets a core before the others are spread at random, the core speedups are
+    # between 1 and max_speedup and each ordered pair of devices is linked with
+    # link_probability.
+    def generate_physical_system(
+        self,
+        num_cores,
+        num_devs,
+        max_prot,
+        max_net,
+        max_speedup=1,
+        link_probability=1.0,
+    ):
+        generator = np.random.default_rng(self.rng.getrandbits(64))
+
+        core_devices = np.sort(
+            np.concatenate(
+                [
+                    np.arange(min(num_cores, num_devs)),
+                    generator.integers(0, num_devs, max(0, num_cores - num_devs)),
+                ]
+            )
+        )
+        core_speedups = np.ones(num_cores)
+        if max_speedup > 1:
+            core_speedups = np.round(generator.uniform(1, max_speedup, num_cores), 2)
+
+        protocol_delays = generator.integers(0, int(max_prot), num_devs, endpoint=True)
+        network_delays = generator.integers(
+            0, int(max_net), (num_devs, num_devs), endpoint=True
+        )
+        network_delays[generator.random((num_devs, num_devs)) >= link_probability] = -1
+        np.fill_diagonal(network_delays, -1)
+
+        return PhysicalSystem(
+            core_devices,
+            core_speedups,
+            np.ones(num_devs),
+            protocol_delays,
+            network_delays,
+        )
+
     def generate_device(self, index, max_prot):
-        wcdt = random.randint(0, max_prot)
+        wcdt = self.rng.randint(0, max_prot)
 
         return {
             "name": f"d{index + 1}",
@@ -48,7 +94,7 @@ class SystemConfigGenerator:
         }
 
     def generate_core(self, index, devices):
-        dev_index = random.randint(0, len(devices) - 1)
+        dev_index = self.rng.randint(0, len(devices) - 1)
 
         return {
             "name": f"c{index + 1}",
@@ -57,10 +103,10 @@ class SystemConfigGenerator:
         }
     
     def generate_net_delay(self, source, dest, max_net):
-        wcdt = random.randint(0, max_net)
+        wcdt = self.rng.randint(0, max_net)
 
         return {
-            "name": f'{source['name']}-to-{dest['name']}',
+            "name": f"{source['name']}-to-{dest['name']}",
             "source": source['name'],
             "dest": dest['name'],
             "acdt": wcdt,
@@ -1,9 +1,25 @@
 import random
 
+import numpy as np
+
 
 class TaskSetGenerator:
-    def __init__(self):
-        pass
+    periods = [
+        1000000,
+        2000000,
+        5000000,
+        10000000,
+        20000000,
+        # 50000000,
+        # 100000000,
+        # 200000000,
+        # 500000000,
+        # 1000000000,
+    ]
+
+    # rng is the random number generator to use, a random.Random for a seeded corpus
+    def __init__(self, rng=random):
+        self.rng = rng
 
     def generate_with_task_limit(
         self, num_tasks, max_init_offset, max_wcet, max_duration
@@ -15,45 +31,101 @@ class TaskSetGenerator:
         return tasks
 
     def generate_with_utilisation_limit(
-        self, utilisation, max_init_offset, max_wcet, max_duration
+        self, utilisation, num_tasks, max_init_offset, max_wcet, max_duration
     ):
-        tasks = []
-        current_utilisation = 0
-        counter = 1
+        return self.generate_task_sets(
+            1, num_tasks, utilisation, max_init_offset, max_wcet, max_duration
+        )[0]
 
-        while current_utilisation < utilisation:
-            task = self.generate_task(counter, max_init_offset, max_wcet, max_duration)
-            tasks.append(task)
+    # Task sets whose utilisations add up to utilisation, up to the rounding of the WCETs
+    # to integers. The utilisations are drawn with UUniFast for whole batches of sets, and
+    # the sets in which a task would need a WCET above its period, max_duration or
+    # max_wcet are discarded.
+    def generate_task_sets(
+        self,
+        num_sets,
+        num_tasks,
+        utilisation,
+        max_init_offset,
+        max_wcet,
+        max_duration,
+        batch_size=1000,
+        max_batches=100,
+    ):
+        generator = np.random.default_rng(self.rng.getrandbits(64))
+        periods = np.array(self.periods, dtype=np.int64)
 
-            current_utilisation += task["wcet"] / task["period"]
-            counter += 1
+        task_sets = []
+        for _ in range(max_batches):
+            period = generator.choice(periods, size=(batch_size, num_tasks))
+            wcet = np.rint(
+                self.uunifast(generator, batch_size, num_tasks, utilisation) * period
+            ).astype(np.int64)
 
-        return tasks
+            max_task_duration = np.minimum(period, int(max_duration))
+            valid = np.all(wcet <= np.minimum(max_task_duration, int(max_wcet)), axis=1)
+            period = period[valid][: num_sets - len(task_sets)]
+            wcet = wcet[valid][: num_sets - len(task_sets)]
+            max_task_duration = max_task_duration[valid][: num_sets - len(task_sets)]
+
+            duration = generator.integers(
+                np.maximum(wcet, 1), max_task_duration, endpoint=True
+            )
+            initial_offset = generator.integers(
+                0, int(max_init_offset), size=period.shape, endpoint=True
+            )
+
+            for i in range(len(period)):
+                task_sets.append(
+                    [
+                        self.format_task(
+                            j,
+                            int(period[i, j]),
+                            int(duration[i, j]),
+                            int(initial_offset[i, j]),
+                            int(wcet[i, j]),
+                        )
+                        for j in range(num_tasks)
+                    ]
+                )
+
+            if len(task_sets) == num_sets:
+                return task_sets
+
+        raise ValueError(
+            f"Only {len(task_sets)} of {num_sets} task sets with {num_tasks} tasks reach a "
+            f"utilisation of {utilisation} with these WCET and duration limits"
+        )
+
+    # The utilisation left after each task is a uniformly distributed share of the one
+    # before it, the last task takes the rest
+    @staticmethod
+    def uunifast(generator, num_sets, num_tasks, utilisation):
+        exponents = 1 / np.arange(num_tasks - 1, 0, -1)
+        remaining = utilisation * np.cumprod(
+            generator.random((num_sets, num_tasks - 1)) ** exponents, axis=1
+        )
+        remaining = np.hstack(
+            [
+                np.full((num_sets, 1), float(utilisation)),
+                remaining,
+                np.zeros((num_sets, 1)),
+            ]
+        )
+
+        return remaining[:, :-1] - remaining[:, 1:]
 
     def generate_task(self, index, max_init_offset, max_wcet, max_duration):
-        periods = [
-            1000000,
-            2000000,
-            5000000,
-            10000000,
-            20000000,
-            # 50000000,
-            # 100000000,
-            # 200000000,
-            # 500000000,
-            # 1000000000,
-        ]
-
-        period = periods[random.randint(0, len(periods) - 1)]
+        period = self.periods[self.rng.randint(0, len(self.periods) - 1)]
         if max_duration > period:
             max_duration = period
-        duration = random.randint(1, max_duration)
+        duration = self.rng.randint(1, max_duration)
 
-        initial_offset = random.randint(0, max_init_offset)
+        initial_offset = self.rng.randint(0, max_init_offset)
 
         if max_wcet > duration:
             max_wcet = duration
-        wcet = random.randint(0, max_wcet)
+        wcet = self.rng.randint(0, max_wcet)
 
         return self.format_task(index, period, duration, initial_offset, wcet)
 
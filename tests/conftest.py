@@ -0,0 +1,17 @@
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The packages are imported from the root of the repository, like main.py does
+sys.path.insert(0, ROOT)
+
+
+# The physical system with three cores on two devices that the tests generate systems on
+@pytest.fixture
+def sys_config():
+    with open(os.path.join(ROOT, "physical_system", "physical_system-01.json")) as file:
+        return json.load(file)
@@ -0,0 +1,89 @@
+import os
+
+from utilities import Utilities
+from benchmark.campaign import (
+    find_unrecorded_systems,
+    handle_unrecorded_systems,
+    is_recorded_successful,
+    read_recorded_results,
+)
+from benchmark.results import CsvResultsSink
+from benchmark.run_index import RunIndex
+
+SYSTEM = {
+    "CoreStore": [],
+    "DeviceStore": [],
+    "NetworkDelayStore": [],
+    "EntityStore": [{"name": "t1"}, {"name": "t2"}],
+    "DependencyStore": [],
+}
+
+
+# Saves a system like the campaign does, without writing its result
+def save_unrecorded_system(run, seed):
+    utilities = Utilities(CsvResultsSink(flush_rows=1))
+    counter, _, _ = utilities.save_system(SYSTEM, [], [], run, 1, 1, False, seed)
+    for run_index in utilities.run_indices.values():
+        run_index.close()
+
+    return counter
+
+
+def get_saved_runs():
+    run_index = RunIndex(1)
+    runs = [(counter, run) for counter, run, _, _ in run_index.get_runs()]
+    run_index.close()
+
+    return runs
+
+
+def test_skip_records_the_unrecorded_systems(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("results")
+    counter = save_unrecorded_system(1, 1234)
+
+    results_sink = CsvResultsSink()
+    handle_unrecorded_systems(results_sink, 1, "skip")
+
+    # The attempt is passed over like a recorded one, under the saved counter and run
+    row = read_recorded_results(results_sink, 1)["1234"]
+    assert row["index"] == f"{counter}-1"
+    assert row["num_tasks"] == "2"
+    assert not is_recorded_successful(row)
+    assert get_saved_runs() == [(counter, 1)]
+
+    # Nothing is left to handle when the campaign is continued again
+    run_index = RunIndex(1)
+    assert find_unrecorded_systems(results_sink, run_index) == []
+    run_index.close()
+    results_sink.close()
+
+
+def test_resolve_removes_the_unrecorded_systems(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("results")
+    save_unrecorded_system(1, 1234)
+
+    results_sink = CsvResultsSink()
+    handle_unrecorded_systems(results_sink, 1, "resolve")
+
+    assert read_recorded_results(results_sink, 1) == {}
+    assert get_saved_runs() == []
+    results_sink.close()
+
+
+# Runs imported from the markers of a directory saved before the index have no seed
+def test_skip_solves_systems_without_a_seed_again(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("results")
+    os.makedirs("system_config/01")
+    with open("system_config/01/system001-1.txt", "w") as outfile:
+        outfile.write("Not solved")
+
+    results_sink = CsvResultsSink()
+    handle_unrecorded_systems(results_sink, 1, "skip")
+
+    assert read_recorded_results(results_sink, 1) == {}
+    assert get_saved_runs() == []
+    assert not os.path.exists("system_config/01/system001-1.txt")
+    results_sink.close()
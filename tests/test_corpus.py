@@ -0,0 +1,22 @@
+from benchmark.corpus import attempt_seed, generate_attempt
+
+
+def generate(sys_config, campaign_seed, attempt):
+    seed = attempt_seed(campaign_seed, 1, 4, attempt)
+    return generate_attempt(sys_config, 4, seed, 2000000, 1000000, 8000000)
+
+
+# An attempt is generated again from the campaign seed and its index alone
+def test_attempt_is_reproducible(sys_config):
+    assert attempt_seed(1234, 1, 4, 0) == attempt_seed(1234, 1, 4, 0)
+    assert generate(sys_config, 1234, 0) == generate(sys_config, 1234, 0)
+
+
+def test_attempts_differ(sys_config):
+    seeds = {attempt_seed(1234, 1, 4, attempt) for attempt in range(5)}
+    assert len(seeds) == 5
+
+    systems = [generate(sys_config, 1234, attempt) for attempt in range(5)]
+    for i, system in enumerate(systems):
+        for other in systems[i + 1:]:
+            assert system[0]["EntityStore"] != other[0]["EntityStore"]
@@ -0,0 +1,35 @@
+import pytest
+
+from benchmark.corpus import generate_attempt
+from ilp.heuristic import HeuristicResult
+from ilp.multicore import MultiCoreScheduler
+from ilp.solvers import OPTIMAL
+
+
+# The heuristic schedules are feasible for the model, which gives them the same value
+@pytest.mark.parametrize("seed", range(5))
+def test_heuristic_schedules_are_feasible(sys_config, seed):
+    system, _ = generate_attempt(sys_config, 3, seed, 2000000, 1000000, 8000000)
+    heuristic_result = HeuristicResult(system)
+
+    for method, tasks_instances, objective in (
+        (
+            "c",
+            heuristic_result.min_core_tasks_instances,
+            heuristic_result.min_core_summary.cores_used,
+        ),
+        (
+            "e2e",
+            heuristic_result.min_e2e_tasks_instances,
+            heuristic_result.min_e2e_summary.total_delay,
+        ),
+    ):
+        assert tasks_instances != None
+
+        scheduler = MultiCoreScheduler()
+        scheduler.build_model(system, solver="highs")
+        scheduler.fix_schedule(tasks_instances)
+        _, result = scheduler.solve_model(method)
+
+        assert result.stats.status == OPTIMAL
+        assert result.objective.value() == objective
@@ -0,0 +1,68 @@
+import pytest
+
+from benchmark.corpus import generate_attempt
+from ilp.multicore import MultiCoreScheduler
+
+# Options that only change how the model is written, not its solutions
+OPTIONS = [
+    {"sparse_dependencies": True},
+    {"prune_overlaps": True},
+    {"formulation": "compact"},
+    {"big_m": "tight"},
+]
+
+
+def generate_system(sys_config, num_tasks, seed):
+    system, _ = generate_attempt(sys_config, num_tasks, seed, 2000000, 1000000, 8000000)
+    return system
+
+
+def solve(system, method, **model_options):
+    _, result = MultiCoreScheduler().multicore_core_scheduler(
+        system, method, solver="highs", **model_options
+    )
+    return result.stats.status, result.objective.value()
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("method", ["e2e", "c"])
+@pytest.mark.parametrize("options", OPTIONS)
+def test_options_keep_the_optimum(sys_config, seed, method, options):
+    system = generate_system(sys_config, 3, seed)
+
+    assert solve(system, method, **options) == solve(system, method)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_periodic_schedule_repeats(sys_config, seed):
+    system = generate_system(sys_config, 3, seed)
+    scheduler = MultiCoreScheduler()
+    scheduler.build_model(system, solver="highs", periodic=True)
+    tasks_instances, _ = scheduler.solve_model("e2e")
+    horizon = scheduler.periodic_horizon
+
+    # Every instance after the modelled hyperperiod runs like the one a hyperperiod before
+    num_repeated = 0
+    for task in tasks_instances:
+        instances = {instance["instance"]: instance for instance in task["value"]}
+        for instance in task["value"]:
+            if instance["instance"] == -1 or instance["letStartTime"] < horizon.end:
+                continue
+
+            previous = instances[instance["instance"] - horizon.strides[task["name"]]]
+            interval = instance["executionIntervals"][0]
+            previous_interval = previous["executionIntervals"][0]
+            assert interval["core"] == previous_interval["core"]
+            assert (
+                interval["startTime"] - previous_interval["startTime"] == horizon.hyperperiod
+            )
+            num_repeated += 1
+
+    assert num_repeated > 0
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_periodic_keeps_the_optimum(sys_config, seed):
+    system = generate_system(sys_config, 3, seed)
+
+    assert solve(system, "e2e", periodic=True) == solve(system, "e2e")
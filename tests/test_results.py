@@ -0,0 +1,34 @@
+import pytest
+
+from benchmark.results import RESULTS_FORMATS, ResultsSink, create_results_sink
+
+FIELDNAMES = ["index", "num_tasks", "seed"]
+
+
+def create_row(run):
+    return {"index": f"1-{run}", "num_tasks": 3, "seed": 1000 + run}
+
+
+# A run that is killed never closes its sink, the flushed rows must still be readable
+@pytest.mark.parametrize("results_format", RESULTS_FORMATS)
+def test_rows_are_read_back_from_an_abandoned_sink(tmp_path, results_format):
+    results_sink = create_results_sink(results_format, str(tmp_path), flush_rows=2)
+    for run in range(1, 6):
+        results_sink.add_row(1, FIELDNAMES, create_row(run))
+
+    # The fifth row was never flushed
+    reader = create_results_sink(results_format, str(tmp_path))
+    rows = reader.read_rows(1)
+    assert [row["index"] for row in rows] == [f"1-{run}" for run in range(1, 5)]
+    assert rows[0]["num_tasks"] == "3"
+    assert rows[0]["seed"] == "1001"
+    assert reader.read_rows(2) == []
+
+
+def test_a_sink_without_its_writes_cannot_be_created(tmp_path):
+    class ReadOnlySink(ResultsSink):
+        def read_rows(self, config):
+            return []
+
+    with pytest.raises(TypeError):
+        ReadOnlySink(str(tmp_path))
@@ -0,0 +1,39 @@
+import pytest
+
+from benchmark.corpus import generate_attempt
+from ilp.multicore import MultiCoreScheduler
+from ilp.screening import FeasibilityScreen
+from ilp.solvers import INFEASIBLE, OPTIMAL
+
+
+# Systems on a single core with almost all of its utilisation, some of which do not fit
+@pytest.mark.parametrize("utilisation", [0.9, 0.98])
+def test_screen_only_rejects_infeasible_systems(sys_config, utilisation):
+    sys_config["CoreStore"] = sys_config["CoreStore"][:1]
+
+    num_rejected = 0
+    for seed in range(3):
+        system, _ = generate_attempt(
+            sys_config, 3, seed, 2000000, 1000000, 8000000, utilisation=utilisation
+        )
+        screen = FeasibilityScreen(system)
+        window_reason = screen.check_windows()
+        dependency_reason = screen.check_dependencies()
+
+        for method in ("c", "e2e"):
+            _, result = MultiCoreScheduler().multicore_core_scheduler(
+                system, method, solver="highs"
+            )
+            assert result.stats.status in (OPTIMAL, INFEASIBLE)
+
+            # A rejected system is infeasible, so a solved one is never rejected
+            rejected = window_reason != None or (
+                method == "e2e" and dependency_reason != None
+            )
+            if rejected:
+                assert result.stats.status == INFEASIBLE
+
+        if window_reason != None:
+            num_rejected += 1
+
+    assert num_rejected > 0
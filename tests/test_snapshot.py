@@ -0,0 +1,31 @@
+import json
+
+import pytest
+
+from utilities import Utilities
+from benchmark.corpus import generate_attempt
+from benchmark.snapshot import load_saved_systems
+from ilp.heuristic import HeuristicResult
+from ilp.screening import FeasibilityScreen
+
+
+# A scheduled and an unscheduled solution come back as the JSON files would hold them
+@pytest.mark.parametrize("snapshot_format", ["compact", "binary"])
+def test_snapshot_loads_the_saved_systems(
+    sys_config, tmp_path, monkeypatch, snapshot_format
+):
+    monkeypatch.chdir(tmp_path)
+    system, _ = generate_attempt(sys_config, 3, 0, 2000000, 1000000, 8000000)
+    min_e2e_tasks_instances = HeuristicResult(system).min_e2e_tasks_instances
+    min_core_tasks_instances = FeasibilityScreen(system).get_unscheduled_instances()
+
+    utilities = Utilities(snapshot_format=snapshot_format)
+    counter, min_e2e_system, min_core_system = utilities.save_system(
+        system, min_e2e_tasks_instances, min_core_tasks_instances, 1, 1, 1, True, 1234
+    )
+    for run_index in utilities.run_indices.values():
+        run_index.close()
+
+    systems = load_saved_systems(1, counter, 1)
+    assert systems["min_e2e"] == json.loads(json.dumps(min_e2e_system))
+    assert systems["min_core"] == json.loads(json.dumps(min_core_system))
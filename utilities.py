@@ -1,14 +1,88 @@
 import os
-import csv
 import json
-import copy
 
+from ilp.instrumentation import PHASES, Recorder
 from ilp.multicore import MultiCoreScheduler
+from ilp.solvers import SKIPPED
+from ilp.system_index import SystemIndex
+from benchmark.results import CsvResultsSink
+from benchmark.run_index import RunIndex
+from benchmark.snapshot import get_snapshot_path, save_physical_system, save_snapshot
 
 
 class Utilities:
-    def __init__(self):
-        pass
+    # Columns of the results
+    result_fieldnames = [
+        # Generic fields
+        "index",
+        "num_tasks",
+        "num_instances",
+        "num_task_dependencies",
+        "num_instance_dependencies",
+        "hyperperiod",
+        "hyperoffset",
+        "makespan",
+        "largeN",
+        "utilisation",
+
+        # ILP results
+        "e2e_core_count",
+        "mc_core_count",
+        "e2e_total_delay",
+        "mc_total_delay",
+        "e2e_bottom_dependencies",
+        "mc_bottom_dependencies",
+        "e2e_average_delay",
+        "mc_average_delay",
+        "e2e_objective",
+        "mc_objective",
+        "e2e_sol_time",
+        "mc_sol_time",
+        "e2e_sol_status",
+        "mc_sol_status",
+
+        # Solver results
+        "e2e_num_constrs",
+        "mc_num_consts",
+        "e2e_num_vars",
+        "mc_num__vars",
+        "e2e_num_int_vars",
+        "mc_num_int_vars",
+        "e2e_num_bin_vars",
+        "mc_num_bin_vars",
+        "e2e_runtime",
+        "mc_runtime",
+        "e2e_work",
+        "mc_work",
+        "e2e_mem_used",
+        "mc_mem_used",
+        "e2e_max_mem_used",
+        "mc_max_mem_used",
+        "e2e_status",
+        "mc_status",
+        "solver",
+        "e2e_gap",
+        "mc_gap",
+        "seed",
+
+        # Heuristic results
+        "heuristic_e2e_core_count",
+        "heuristic_mc_core_count",
+        "heuristic_e2e_total_delay",
+        "heuristic_mc_total_delay",
+        "heuristic_runtime",
+    ]
+    # Seconds spent in each phase of the attempt, empty without instrumentation
+    result_fieldnames += [f"phase_{name}" for name in PHASES]
+
+    # Without a results sink every result is written to its CSV file straight away.
+    # Systems are saved as LetSynchronise JSON, or as "compact" or "binary" snapshots.
+    def __init__(self, results_sink=None, snapshot_format="json"):
+        if results_sink is None:
+            results_sink = CsvResultsSink(flush_rows=1)
+        self.results_sink = results_sink
+        self.snapshot_format = snapshot_format
+        self.run_indices = {}
 
     def MsToNs(ms):
         return ms * 1000000
@@ -46,17 +120,14 @@ class Utilities:
         run,
         config,
         counter,
-        successful
+        successful,
+        seed,
     ):
-        min_e2e_system = copy.deepcopy(system)
-        min_core_system = copy.deepcopy(system)
-
-        min_e2e_system["EntityInstancesStore"] = min_e2e_task_instances
-        min_core_system["EntityInstancesStore"] = min_core_tasks_instances
+        # The schedules are copies already, the rest of the system is shared
+        min_e2e_system = dict(system, EntityInstancesStore=min_e2e_task_instances)
+        min_core_system = dict(system, EntityInstancesStore=min_core_tasks_instances)
 
         directory = "system_config"
-        generic_filename = "system"
-        generic_extension = ".txt"
         min_e2e_base_filename = "min_e2e_system"
         min_core_base_filename = "min_core_system"
         extension = ".json"
@@ -65,47 +136,61 @@ class Utilities:
         if successful:
             subdir = "Solved"
 
-        # First find the counter value to use
-        while True:
-            file_path = os.path.join(
-                directory,
-                f"{config:02d}",
-                f"{generic_filename}{counter:03d}-{run}{generic_extension}"
-            )
-
-            if not os.path.exists(file_path):
-                break
+        # First reserve the counter value to use
+        if config not in self.run_indices:
+            self.run_indices[config] = RunIndex(config, directory)
+        run_index = self.run_indices[config]
+        counter = run_index.reserve_run(counter, run, successful, seed)
 
-            counter += 1
+        if self.snapshot_format != "json":
+            physical_system = save_physical_system(
+                os.path.join(directory, f"{config:02d}"), system
+            )
+            file_path = get_snapshot_path(
+                os.path.join(directory, f"{config:02d}", subdir),
+                counter,
+                run,
+                self.snapshot_format,
+            )
+            save_snapshot(
+                file_path,
+                physical_system,
+                system,
+                {
+                    "min_e2e": min_e2e_task_instances,
+                    "min_core": min_core_tasks_instances,
+                },
+                self.snapshot_format,
+            )
+            run_index.set_files(counter, run, [file_path])
 
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        with open(file_path, "w") as outfile:
-            outfile.write(subdir)
-        
+            return counter, min_e2e_system, min_core_system
 
         # Now write the MC output
-        file_path = os.path.join(
+        min_core_file_path = os.path.join(
             directory,
             f"{config:02d}",
             subdir,
             f"{min_core_base_filename}{counter:03d}-{run}{extension}",
         )
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        with open(file_path, "w") as outfile:
+        os.makedirs(os.path.dirname(min_core_file_path), exist_ok=True)
+        with open(min_core_file_path, "w") as outfile:
             json.dump(min_core_system, outfile, indent=4)
 
 
         # And now the E2E output
-        file_path = os.path.join(
+        min_e2e_file_path = os.path.join(
             directory,
             f"{config:02d}",
             subdir,
             f"{min_e2e_base_filename}{counter:03d}-{run}{extension}",
         )
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        with open(file_path, "w") as outfile:
+        os.makedirs(os.path.dirname(min_e2e_file_path), exist_ok=True)
+        with open(min_e2e_file_path, "w") as outfile:
             json.dump(min_e2e_system, outfile, indent=4)
 
+        run_index.set_files(counter, run, [min_core_file_path, min_e2e_file_path])
+
         return counter, min_e2e_system, min_core_system
 
     def save_result(
@@ -118,174 +203,117 @@ class Utilities:
         utilisation,
         run,
         config,
+        seed=None,
+        heuristic_result=None,
+        recorder=None,
     ):
-        fieldnames = [
-            # Generic fields
-            "index",
-            "num_tasks",
-            "num_instances",
-            "num_task_dependencies",
-            "num_instance_dependencies",
-            "hyperperiod",
-            "hyperoffset",
-            "makespan",
-            "largeN",
-            "utilisation",
-
-            # ILP results
-            "e2e_core_count",
-            "mc_core_count",
-            "e2e_total_delay",
-            "mc_total_delay",
-            "e2e_bottom_dependencies",
-            "mc_bottom_dependencies",
-            "e2e_average_delay",
-            "mc_average_delay",
-            "e2e_objective",
-            "mc_objective",
-            "e2e_sol_time",
-            "mc_sol_time",
-            "e2e_sol_status",
-            "mc_sol_status",
-
-            # Gurobi-specific results
-            "e2e_num_constrs",
-            "mc_num_consts",
-            "e2e_num_vars",
-            "mc_num__vars",
-            "e2e_num_int_vars",
-            "mc_num_int_vars",
-            "e2e_num_bin_vars",
-            "mc_num_bin_vars",
-            "e2e_runtime",
-            "mc_runtime",
-            "e2e_work",
-            "mc_work",
-            "e2e_mem_used",
-            "mc_mem_used",
-            "e2e_max_mem_used",
-            "mc_max_mem_used",
-            "e2e_status",
-            "mc_status",
-        ]
-
-        task_set = min_e2e_system["EntityStore"]
-        num_tasks = len(task_set)
-
-        num_tasks_instances = 0
-        for task in min_e2e_system["EntityInstancesStore"]:
-            num_tasks_instances += len(task["value"])
-        
-        dependency_set = min_e2e_system["DependencyStore"]
-        num_task_dependencies = len(dependency_set)
-        
-        num_instance_dependencies = 0
-        for dependency in dependency_set:
-            task = next((x for x in min_e2e_system["EntityInstancesStore"] if x["name"] == dependency["destination"]["task"]), None)
-            if task != None:
-                num_instance_dependencies += len(task["value"])
-
-        base_path = "results"
-        file_path = f"{base_path}/physical_system{config:02d}_results.csv"
-        write_header = not os.path.exists(file_path)
-
-        with open(file_path, "a", newline="") as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-
-            if write_header:
-                writer.writeheader()
-
-            writer.writerow(
-                {
-                    # Generic fields
-                    "index": f"{counter}-{run}",
-                    "num_tasks": num_tasks,
-                    "num_instances": num_tasks_instances,
-                    "num_task_dependencies": num_task_dependencies,
-                    "num_instance_dependencies": num_instance_dependencies,
-                    "utilisation": utilisation,
-                    "hyperperiod": MultiCoreScheduler.calculate_hyperperiod(task_set),
-                    "hyperoffset": MultiCoreScheduler.calculate_hyperoffset(task_set),
-                    "makespan": MultiCoreScheduler.calculate_makespan(task_set),
-                    "largeN": MultiCoreScheduler.calculate_largeN(task_set),
-
-                    # ILP results
-                    "e2e_core_count": self.get_num_used_cores(min_e2e_result),
-                    "mc_core_count": self.get_num_used_cores(min_core_result),
-                    "e2e_total_delay": self.get_total_delay(min_e2e_result),
-                    "mc_total_delay": self.get_total_delay(min_core_result_e2e),
-                    "e2e_bottom_dependencies": self.get_bottom_dependencies(min_e2e_result),
-                    "mc_bottom_dependencies": self.get_bottom_dependencies(min_core_result_e2e),
-                    "e2e_average_delay": self.get_average_delay(min_e2e_result),
-                    "mc_average_delay": self.get_average_delay(min_core_result_e2e),
-                    "e2e_objective": min_e2e_result.objective.value(),
-                    "mc_objective": min_core_result.objective.value(),
-                    "e2e_sol_time": min_e2e_result.solutionCpuTime,
-                    "mc_sol_time": min_core_result.solutionCpuTime,
-                    "e2e_sol_status": min_e2e_result.sol_status,
-                    "mc_sol_status": min_core_result.sol_status,
-
-                    # Gurobi-specific results
-                    "e2e_num_constrs": min_e2e_result.solverModel.NumConstrs,
-                    "mc_num_consts": min_core_result.solverModel.NumConstrs,
-                    "e2e_num_vars": min_e2e_result.solverModel.NumVars,
-                    "mc_num__vars": min_core_result.solverModel.NumVars,
-                    "e2e_num_int_vars": min_e2e_result.solverModel.NumIntVars,
-                    "mc_num_int_vars": min_core_result.solverModel.NumIntVars,
-                    "e2e_num_bin_vars": min_e2e_result.solverModel.NumBinVars,
-                    "mc_num_bin_vars": min_core_result.solverModel.NumBinVars,
-                    "e2e_runtime": min_e2e_result.solverModel.Runtime,
-                    "mc_runtime": min_core_result.solverModel.Runtime,
-                    "e2e_work": min_e2e_result.solverModel.Work,
-                    "mc_work": min_core_result.solverModel.Work,
-                    "e2e_mem_used": min_e2e_result.solverModel.MemUsed,
-                    "mc_mem_used": min_core_result.solverModel.MemUsed,
-                    "e2e_max_mem_used": min_e2e_result.solverModel.MaxMemUsed,
-                    "mc_max_mem_used": min_core_result.solverModel.MaxMemUsed,
-                    "e2e_status": min_e2e_result.solverModel.Status,
-                    "mc_status": min_core_result.solverModel.Status,
-                }
-            )
-    
-    @staticmethod
-    def get_num_used_cores(result):
-        for v in result.variables():
-            if "cores_used" in v.name and v.varValue != None:
-                return v.varValue
-    
-        return -1
-    
-    @staticmethod
-    def get_total_delay(result):
-        for v in result.variables():
-            if "total_delay" in v.name and v.varValue != None:
-                return v.varValue
-    
-        return -1
-
-    @staticmethod
-    def get_bottom_dependencies(result):
-        bottom_dependencies = 0
-        for v in result.variables():
-            if "bool_dep" in v.name and "__1" in v.name and v.varValue == 1.0:
-                bottom_dependencies += 1
-    
-        return bottom_dependencies
-
-    @staticmethod
-    def get_average_delay(result):
-        sum = 0
-        count = 0
-        vars = result.variablesDict()
-        for v in result.variables():
-            if "bool_dep" in v.name and "__1" not in v.name and v.varValue == 1.0:
-                v_delay = vars[v.name.replace("bool_dep", "delay")]
-                if v_delay != None:
-                    sum += v_delay.varValue
-                    count += 1
-        
-        if count > 0:
-            return sum / count
-        
-        return -1
+        if recorder is None:
+            recorder = Recorder(enabled=False)
 
+        with recorder.phase("metrics"):
+            task_set = min_e2e_system["EntityStore"]
+            num_tasks = len(task_set)
+
+            index = SystemIndex(
+                min_e2e_system, tasks_instances=min_e2e_system["EntityInstancesStore"]
+            )
+            num_tasks_instances = index.get_num_instances()
+
+            dependency_set = min_e2e_system["DependencyStore"]
+            num_task_dependencies = len(dependency_set)
+
+            num_instance_dependencies = 0
+            for dependency in dependency_set:
+                num_instance_dependencies += len(
+                    index.get_instances(dependency["destination"]["task"])
+                )
+
+            # The columns stay empty when the heuristic was not run
+            heuristic_values = [None] * 5
+            if heuristic_result != None:
+                heuristic_values = [
+                    heuristic_result.min_e2e_summary.cores_used,
+                    heuristic_result.min_core_summary.cores_used,
+                    heuristic_result.min_e2e_summary.total_delay,
+                    heuristic_result.min_core_summary.total_delay,
+                    heuristic_result.runtime,
+                ]
+
+            row = {
+                # Generic fields
+                "index": f"{counter}-{run}",
+                "num_tasks": num_tasks,
+                "num_instances": num_tasks_instances,
+                "num_task_dependencies": num_task_dependencies,
+                "num_instance_dependencies": num_instance_dependencies,
+                "utilisation": utilisation,
+                "hyperperiod": MultiCoreScheduler.calculate_hyperperiod(task_set),
+                "hyperoffset": MultiCoreScheduler.calculate_hyperoffset(task_set),
+                "makespan": MultiCoreScheduler.calculate_makespan(task_set),
+                "largeN": MultiCoreScheduler.calculate_largeN(task_set),
+
+                # ILP results
+                "e2e_core_count": min_e2e_result.summary.cores_used,
+                "mc_core_count": min_core_result.summary.cores_used,
+                "e2e_total_delay": min_e2e_result.summary.total_delay,
+                "mc_total_delay": min_core_result_e2e.summary.total_delay,
+                "e2e_bottom_dependencies": min_e2e_result.summary.get_bottom_dependencies(),
+                "mc_bottom_dependencies": min_core_result_e2e.summary.get_bottom_dependencies(),
+                "e2e_average_delay": min_e2e_result.summary.get_average_delay(),
+                "mc_average_delay": min_core_result_e2e.summary.get_average_delay(),
+                "e2e_objective": min_e2e_result.objective.value(),
+                "mc_objective": min_core_result.objective.value(),
+                "e2e_sol_time": min_e2e_result.solutionCpuTime,
+                "mc_sol_time": min_core_result.solutionCpuTime,
+                "e2e_sol_status": min_e2e_result.sol_status,
+                "mc_sol_status": min_core_result.sol_status,
+
+                # Solver results
+                "e2e_num_constrs": min_e2e_result.stats.num_constrs,
+                "mc_num_consts": min_core_result.stats.num_constrs,
+                "e2e_num_vars": min_e2e_result.stats.num_vars,
+                "mc_num__vars": min_core_result.stats.num_vars,
+                "e2e_num_int_vars": min_e2e_result.stats.num_int_vars,
+                "mc_num_int_vars": min_core_result.stats.num_int_vars,
+                "e2e_num_bin_vars": min_e2e_result.stats.num_bin_vars,
+                "mc_num_bin_vars": min_core_result.stats.num_bin_vars,
+                "e2e_runtime": min_e2e_result.stats.runtime,
+                "mc_runtime": min_core_result.stats.runtime,
+                "e2e_work": min_e2e_result.stats.work,
+                "mc_work": min_core_result.stats.work,
+                "e2e_mem_used": min_e2e_result.stats.mem_used,
+                "mc_mem_used": min_core_result.stats.mem_used,
+                "e2e_max_mem_used": min_e2e_result.stats.max_mem_used,
+                "mc_max_mem_used": min_core_result.stats.max_mem_used,
+                "e2e_status": min_e2e_result.stats.status,
+                "mc_status": min_core_result.stats.status,
+                "solver": min_e2e_result.stats.solver,
+                "e2e_gap": min_e2e_result.stats.gap,
+                "mc_gap": min_core_result.stats.gap,
+                "seed": seed,
+
+                # Heuristic results
+                "heuristic_e2e_core_count": heuristic_values[0],
+                "heuristic_mc_core_count": heuristic_values[1],
+                "heuristic_e2e_total_delay": heuristic_values[2],
+                "heuristic_mc_total_delay": heuristic_values[3],
+                "heuristic_runtime": heuristic_values[4],
+            }
+
+        row.update({f"phase_{name}": recorder.get_time(name) for name in PHASES})
+        self.results_sink.add_row(config, self.result_fieldnames, row)
+
+    # A saved system whose result was lost, recorded so that a continued campaign does
+    # not solve its attempt again. Only the statuses say why the other columns are empty.
+    def save_skipped_result(self, counter, run, config, seed, num_tasks=None):
+        row = {name: None for name in self.result_fieldnames}
+        row.update(
+            {
+                "index": f"{counter}-{run}",
+                "num_tasks": num_tasks,
+                "e2e_status": SKIPPED,
+                "mc_status": SKIPPED,
+                "seed": seed,
+            }
+        )
+        self.results_sink.add_row(config, self.result_fieldnames, row)